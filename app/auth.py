@@ -24,116 +24,17 @@ async_engine = engine
 async_session_maker = AsyncSessionLocal
 
 async def create_db_and_tables():
-    logger.info("Creating database tables...")
+    """
+    Opprett/oppdater databaseskjemaet via den versjonerte migrasjonsloggen.
+    På en database som allerede er oppdatert koster dette én spørring.
+    """
+    from .migrations import run_migrations
+
+    logger.info("Checking database schema...")
     try:
-        async with async_engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables created successfully")
-        
-        # Add missing columns to existing tables (migration)
-        # This handles adding new columns to the User table without requiring a separate migration script
-        from sqlalchemy import text
-        async with AsyncSessionLocal() as db:
-            try:
-                # Check if privacy columns exist in user table
-                check_query = text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = :table_name 
-                    AND column_name IN ('privacy_accepted', 'privacy_accepted_date')
-                """)
-                result = await db.execute(check_query, {"table_name": "user"})
-                existing_columns = [row[0] for row in result.fetchall()]
-                
-                # Add privacy_accepted column if missing
-                if 'privacy_accepted' not in existing_columns:
-                    logger.info("Adding privacy_accepted column to user table...")
-                    alter_query1 = text('ALTER TABLE "user" ADD COLUMN privacy_accepted BOOLEAN NOT NULL DEFAULT FALSE')
-                    await db.execute(alter_query1)
-                    await db.commit()
-                    logger.info("✅ Added privacy_accepted column")
-                
-                # Add privacy_accepted_date column if missing
-                if 'privacy_accepted_date' not in existing_columns:
-                    logger.info("Adding privacy_accepted_date column to user table...")
-                    alter_query2 = text('ALTER TABLE "user" ADD COLUMN privacy_accepted_date TIMESTAMP NULL')
-                    await db.execute(alter_query2)
-                    await db.commit()
-                    logger.info("✅ Added privacy_accepted_date column")
-                    
-            except Exception as migration_error:
-                # Don't fail startup if migration fails (might be permission issues or columns already exist)
-                # Log the error but continue
-                logger.warning(f"Could not add privacy columns (may already exist): {migration_error}")
-                await db.rollback()
-
-            # Migrate bookings table: rename user_id to created_by if needed
-            try:
-                check_booking_query = text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'bookings'
-                """)
-                result = await db.execute(check_booking_query)
-                booking_columns = {row[0] for row in result.fetchall()}
-                
-                if 'user_id' in booking_columns and 'created_by' not in booking_columns:
-                    logger.info("Migrating bookings table: renaming user_id to created_by...")
-                    # Rename column (PostgreSQL syntax)
-                    alter_booking_query = text('ALTER TABLE bookings RENAME COLUMN user_id TO created_by')
-                    await db.execute(alter_booking_query)
-                    await db.commit()
-                    logger.info("✅ Migrated bookings.user_id to created_by")
-                
-                # Add updated_at column if missing
-                if 'updated_at' not in booking_columns:
-                    logger.info("Adding updated_at column to bookings table...")
-                    alter_updated_query = text('ALTER TABLE bookings ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
-                    await db.execute(alter_updated_query)
-                    await db.commit()
-                    logger.info("✅ Added updated_at column to bookings")
-                    
-            except Exception as booking_migration_error:
-                logger.warning(f"Could not migrate bookings table (may already be migrated): {booking_migration_error}")
-                await db.rollback()
-
-        # Seed default subscription plans (tilgang1/tilgang2) if missing
-        try:
-            from sqlalchemy import select
-            from .models import SubscriptionPlan
-
-            async with AsyncSessionLocal() as db:
-                existing = await db.execute(select(SubscriptionPlan.code))
-                existing_codes = {row[0] for row in existing.fetchall()}
-
-                defaults = [
-                    SubscriptionPlan(
-                        code="tilgang1",
-                        name="Tilgang 1 (1 år)",
-                        duration_months=12,
-                        default_hours_per_week=2,
-                        is_active=True,
-                    ),
-                    SubscriptionPlan(
-                        code="tilgang2",
-                        name="Tilgang 2 (6 måneder)",
-                        duration_months=6,
-                        default_hours_per_week=2,
-                        is_active=True,
-                    ),
-                ]
-
-                to_add = [p for p in defaults if p.code not in existing_codes]
-                if to_add:
-                    logger.info(f"Seeding subscription plans: {[p.code for p in to_add]}")
-                    db.add_all(to_add)
-                    await db.commit()
-                    logger.info("✅ Seeded subscription plans")
-        except Exception as seed_error:
-            logger.warning(f"Could not seed subscription plans: {seed_error}")
-                
+        await run_migrations(async_engine)
     except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+        logger.error(f"Error migrating database: {e}")
         raise
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
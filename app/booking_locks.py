@@ -0,0 +1,156 @@
+"""
+Serialisering av skriving til bookinger per hall og uke.
+
+Mellom "er tiden ledig / er kvoten brukt opp?" og commit kan en annen forespørsel
+for samme tidsrom slippe gjennom. Koordinatoren låser derfor nøklene en endring
+berører før sjekkene kjøres:
+
+- ("hall", hall_id, ISO-uke) for hver uke bookingen dekker, før og etter endringen
+- ("user", user_id, ISO-uke) for ukekvoten ved nye bookinger
+
+Nøklene fordeles på BOOKING_LOCK_SHARDS asyncio.Lock-er (crc32), og tas alltid i
+sortert rekkefølge, så to forespørsler kan ikke vente på hverandre i ring. Bookinger
+i andre haller og uker går parallelt.
+
+På PostgreSQL tas i tillegg pg_advisory_xact_lock per nøkkel i samme transaksjon
+som sjekk og commit (BOOKING_ADVISORY_LOCKS), slik at flere workere også
+serialiseres. Låsene slippes ved commit/rollback.
+
+Ventetid telles i stats() (GET /api/admin/booking-locks).
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, List, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+LockKey = Tuple[str, str, str]
+
+_SLOW_WAIT_SECONDS = 1.0
+
+
+def _weeks(start_time: datetime, end_time: datetime) -> List[str]:
+    """ISO-ukene [start_time, end_time) berører, f.eks. ["2030-W27"]."""
+    last = max(start_time, end_time - timedelta(microseconds=1))
+    weeks, day = [], start_time.date()
+    while True:
+        year, week, _ = day.isocalendar()
+        key = f"{year}-W{week:02d}"
+        if key not in weeks:
+            weeks.append(key)
+        if day >= last.date():
+            return weeks
+        day = min(day + timedelta(days=7), last.date())
+
+
+def hall_keys(hall_id: str, start_time: datetime, end_time: datetime) -> Set[LockKey]:
+    return {("hall", str(hall_id), week) for week in _weeks(start_time, end_time)}
+
+
+def user_keys(user_id: str, start_time: datetime, end_time: datetime) -> Set[LockKey]:
+    return {("user", str(user_id), week) for week in _weeks(start_time, end_time)}
+
+
+def _advisory_id(key: LockKey) -> int:
+    # 64-bit signert heltall, som pg_advisory_xact_lock(bigint) forventer
+    return int.from_bytes(hashlib.sha1("|".join(key).encode()).digest()[:8], "big", signed=True)
+
+
+class BookingWriteCoordinator:
+    def __init__(self, shards: int = 64):
+        self._locks = [asyncio.Lock() for _ in range(max(1, shards))]
+        self._acquisitions = 0
+        self._contended = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._in_flight = 0
+
+    def _shard(self, key: LockKey) -> int:
+        return zlib.crc32("|".join(key).encode()) % len(self._locks)
+
+    def _record_wait(self, waited: float, contended: bool):
+        self._acquisitions += 1
+        self._contended += int(contended)
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        if waited >= _SLOW_WAIT_SECONDS:
+            logger.warning(f"🐢 Waited {waited:.2f}s for booking write lock")
+
+    def _timed_out(self):
+        self._timeouts += 1
+        raise HTTPException(status_code=503, detail="Mange samtidige bookinger akkurat nå, prøv igjen")
+
+    @asynccontextmanager
+    async def hold(self, db: AsyncSession, keys: Iterable[LockKey]):
+        """Hold låsene for `keys` rundt sjekk + commit av en booking-endring."""
+        keys = sorted(set(keys))
+        shards = sorted({self._shard(key) for key in keys})
+        timeout = settings.BOOKING_LOCK_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+        started = time.perf_counter()
+        contended = any(self._locks[i].locked() for i in shards)
+        acquired: List[asyncio.Lock] = []
+        try:
+            for i in shards:
+                lock = self._locks[i]
+                try:
+                    async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+                        await lock.acquire()
+                except TimeoutError:
+                    self._timed_out()
+                acquired.append(lock)
+
+            if settings.BOOKING_ADVISORY_LOCKS and db.bind.dialect.name == "postgresql":
+                await self._advisory_locks(db, keys, max(0.0, deadline - time.monotonic()))
+
+            self._record_wait(time.perf_counter() - started, contended)
+            self._in_flight += 1
+            try:
+                yield
+            finally:
+                self._in_flight -= 1
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    async def _advisory_locks(self, db: AsyncSession, keys: List[LockKey], timeout: float):
+        # lock_timeout gjelder også advisory-låser; SET LOCAL varer ut transaksjonen
+        await db.execute(text(f"SET LOCAL lock_timeout = '{max(1, int(timeout * 1000))}ms'"))
+        try:
+            for key in keys:
+                await db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _advisory_id(key)})
+        except DBAPIError as e:
+            if "lock timeout" not in str(e).lower():
+                raise
+            await db.rollback()
+            self._timed_out()
+
+    def stats(self) -> dict:
+        return {
+            "shards": len(self._locks),
+            "held_shards": sum(lock.locked() for lock in self._locks),
+            "in_flight": self._in_flight,
+            "acquisitions": self._acquisitions,
+            "contended": self._contended,
+            "timeouts": self._timeouts,
+            "wait_ms_avg": round(self._wait_total / self._acquisitions * 1000, 3) if self._acquisitions else 0.0,
+            "wait_ms_max": round(self._wait_max * 1000, 3),
+            "advisory_locks": settings.BOOKING_ADVISORY_LOCKS,
+        }
+
+
+booking_writes = BookingWriteCoordinator(settings.BOOKING_LOCK_SHARDS)
@@ -0,0 +1,88 @@
+"""
+Overlappvern for bookinger.
+
+PostgreSQL: `bookings.during` er en generert tsrange(start_time, end_time, '[)')
+med en GiST-basert EXCLUDE-constraint på (hall_id WITH =, during WITH &&). Da
+avviser databasen overlapp i selve INSERT/UPDATE, uten race mellom sjekk og
+commit, og overlappsøk går via GiST-indeksen i stedet for to B-tree-intervaller.
+Krever utvidelsen btree_gist (for = på hall_id); migrasjon 14 setter det opp.
+
+SQLite (eller PostgreSQL uten constraint): overlappsjekken gjøres i koden som før.
+At sjekk + commit ikke kan flettes med en annen forespørsel sørger
+app/booking_locks.py for (låser per hall og uke).
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+EXCLUSION_CONSTRAINT = "ex_bookings_hall_during"
+
+_exclusion_active = False
+
+
+def exclusion_active() -> bool:
+    """True når databasen selv håndhever at bookinger i samme hall ikke overlapper."""
+    return _exclusion_active
+
+
+def overlaps(start_time: datetime, end_time: datetime):
+    """WHERE-ledd for bookinger som overlapper [start_time, end_time) via GiST-indeksen."""
+    return literal_column("bookings.during").op("&&")(func.tsrange(start_time, end_time, literal_column("'[)'")))
+
+
+def is_overlap_error(exc: IntegrityError) -> bool:
+    return EXCLUSION_CONSTRAINT in str(exc.orig)
+
+
+async def _constraint_exists(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": EXCLUSION_CONSTRAINT}
+    )
+    return result.first() is not None
+
+
+async def install(conn: AsyncConnection) -> bool:
+    """
+    Opprett tsrange-kolonnen og constrainten (idempotent). Kjøres i et savepoint:
+    mangler rettigheter til CREATE EXTENSION, eller finnes det allerede overlappende
+    bookinger, logges en advarsel og appen faller tilbake til sjekk under lås.
+    """
+    try:
+        async with conn.begin_nested():
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            await conn.execute(text(
+                "ALTER TABLE bookings ADD COLUMN IF NOT EXISTS during tsrange "
+                "GENERATED ALWAYS AS (tsrange(start_time, end_time, '[)')) STORED"
+            ))
+            if not await _constraint_exists(conn):
+                await conn.execute(text(
+                    f"ALTER TABLE bookings ADD CONSTRAINT {EXCLUSION_CONSTRAINT} "
+                    "EXCLUDE USING gist (hall_id WITH =, during WITH &&)"
+                ))
+        return True
+    except Exception as e:
+        logger.warning(
+            f"⚠️ Could not add booking exclusion constraint ({e}). "
+            "Overlaps are checked in the application instead; fix the cause and re-run migration 14."
+        )
+        return False
+
+
+async def detect(async_engine: AsyncEngine) -> bool:
+    """Slå på constraint-modus hvis databasen har den (kalles ved oppstart)."""
+    global _exclusion_active
+    _exclusion_active = False
+    if settings.BOOKING_EXCLUSION_CONSTRAINT and async_engine.dialect.name == "postgresql":
+        async with async_engine.connect() as conn:
+            _exclusion_active = await _constraint_exists(conn)
+    mode = "database exclusion constraint" if _exclusion_active else "application check under lock"
+    logger.info(f"🔐 Booking overlap protection: {mode}")
+    return _exclusion_active
@@ -0,0 +1,158 @@
+"""
+Komprimering av svar (brotli eller gzip etter Accept-Encoding).
+
+- Svar under COMPRESSION_MIN_SIZE bytes sendes som de er.
+- /uploads og allerede komprimerte typer (bilder, zip, ...) hoppes over.
+- Svar uten kjent lengde (StreamingResponse) komprimeres bit for bit, uten å
+  samle hele bodyen i minnet.
+
+`brotli` er valgfritt; uten det brukes gzip.
+"""
+
+import zlib
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .settings import settings
+
+EXCLUDED_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/woff",
+    "application/zip", "application/gzip", "application/x-gzip", "text/event-stream",
+)
+
+
+@lru_cache(maxsize=None)
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """"br", "gzip" eller None ut fra Accept-Encoding (q=0 betyr ikke tillatt)."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if _brotli() is not None else ["gzip"]
+    best = max(candidates, key=lambda enc: accepted.get(enc, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = _brotli().Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31: gzip-header og -trailer
+            self._obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish() if self.encoding == "br" else self._obj.flush()
+
+
+class CompressionMiddleware:
+    """Ren ASGI-middleware (BaseHTTPMiddleware ville bufret strømmende svar)."""
+
+    def __init__(self, app, minimum_size: int = 1024, exclude_paths: Iterable[str] = ("/uploads",)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_length = headers.get("content-length")
+                content_type = headers.get("content-type", "")
+                if (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or content_type.startswith(EXCLUDED_CONTENT_TYPES)
+                    or (content_length is not None and int(content_length) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Vent med headerne til vi vet om første bit er hele bodyen
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                # f.eks. http.response.pathsend: send som det er
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                passthrough = True
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    # Ukjent sluttstørrelse: chunked
+                    del headers["content-length"]
+                    first = compressor.compress(body)
+                else:
+                    first = compressor.compress(body) + compressor.finish()
+                    headers["content-length"] = str(len(first))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": first, "more_body": more_body})
+                return
+
+            # Resten av et strømmende svar
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
@@ -0,0 +1,87 @@
+"""
+Prosess-lokal cache for sideinnhold (CMS-tekst).
+
+Alt innhold lastes med én spørring første gang det trengs og holdes i minnet som
+ferdig serialiserte dicts, så lesing av /api/page-content aldri går mot databasen.
+crud.create/update/delete_page_content kaller `page_content_cache.invalidate()`
+etter commit. Med flere workere ser de andre endringen senest etter
+PAGE_CONTENT_CACHE_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from . import models, schemas
+from .database import AsyncSessionLocal
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PageContentCache:
+    def __init__(self, session_factory=AsyncSessionLocal):
+        # Leser fra primær, ikke replika, så en reload rett etter en endring ser den
+        self._session_factory = session_factory
+        self._pages: Optional[Dict[str, Dict[str, dict]]] = None  # page -> section -> rad
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Kast cachen; neste lesing laster alt på nytt."""
+        self._generation += 1
+        self._pages = None
+
+    def _is_fresh(self) -> bool:
+        if self._pages is None:
+            return False
+        ttl = settings.PAGE_CONTENT_CACHE_TTL_SECONDS
+        return ttl <= 0 or time.monotonic() - self._loaded_at < ttl
+
+    async def _load(self) -> Dict[str, Dict[str, dict]]:
+        if self._is_fresh():
+            return self._pages
+        async with self._lock:
+            # En annen request kan ha lastet mens vi ventet på låsen
+            if self._is_fresh():
+                return self._pages
+            generation = self._generation
+            async with self._session_factory() as db:
+                rows = (await db.execute(select(models.PageContent))).scalars().all()
+            pages: Dict[str, Dict[str, dict]] = {}
+            for row in rows:
+                item = schemas.PageContentRead.model_validate(row).model_dump(mode="json")
+                pages.setdefault(row.page_name, {})[row.section_name] = item
+            # Ikke lagre hvis noen invaliderte mens vi leste
+            if generation == self._generation:
+                self._pages = pages
+                self._loaded_at = time.monotonic()
+                logger.info(f"📄 Page content cache loaded ({len(rows)} sections, {len(pages)} pages)")
+            return pages
+
+    async def get_page(self, page_name: str) -> List[dict]:
+        pages = await self._load()
+        return list(pages.get(page_name, {}).values())
+
+    async def get_section(self, page_name: str, section_name: str) -> Optional[dict]:
+        pages = await self._load()
+        return pages.get(page_name, {}).get(section_name)
+
+    async def get_all(self) -> List[dict]:
+        pages = await self._load()
+        return [item for sections in pages.values() for item in sections.values()]
+
+    async def get_bundle(self, page_names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """{page: {section: html}} for de oppgitte sidene (tomme sider gir {})."""
+        pages = await self._load()
+        return {
+            name: {section: item["content_html"] or item["content"] for section, item in pages.get(name, {}).items()}
+            for name in page_names
+        }
+
+
+page_content_cache = PageContentCache()
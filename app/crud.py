@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import base64
+import json
 import uuid
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select, tuple_
 
-from . import models, schemas
+from . import booking_overlap, models, schemas
+from .content_cache import page_content_cache
+from .images import sync_image_references
+from .rendering import render_content
+from . import search
 
 def _add_months(dt: datetime, months: int) -> datetime:
     """
@@ -38,11 +44,70 @@ def _to_naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
         return dt.astimezone(timezone.utc).replace(tzinfo=None)
     return dt
 
-async def create_booking(db: AsyncSession, booking: schemas.BookingCreate, user_id: str) -> models.Booking:
+# --- Haller ---
+_SLUG_CHARS = str.maketrans({"æ": "ae", "ø": "o", "å": "a"})
+
+def hall_slug(name: str) -> str:
+    """"Sidehall 2" -> "sidehall-2" (brukes som Hall.id)"""
+    slug = "".join(c if c.isascii() and c.isalnum() else "-" for c in name.strip().lower().translate(_SLUG_CHARS))
+    return "-".join(part for part in slug.split("-") if part)[:50] or "hall"
+
+async def get_halls(db: AsyncSession, include_inactive: bool = False) -> List[models.Hall]:
+    q = select(models.Hall).order_by(models.Hall.sort_order, models.Hall.name)
+    if not include_inactive:
+        q = q.where(models.Hall.is_active == True)
+    result = await db.execute(q)
+    return result.scalars().all()
+
+async def get_hall(db: AsyncSession, hall_id: str) -> Optional[models.Hall]:
+    return await db.get(models.Hall, hall_id)
+
+async def resolve_hall(db: AsyncSession, hall_id: Optional[str] = None, name: Optional[str] = None) -> Optional[models.Hall]:
+    """
+    Hallen en booking gjelder: hall_id hvis oppgitt, ellers navnet (eldre klienter
+    sender bare `hall`), ellers første aktive hall. None hvis den ikke finnes/er inaktiv.
+    """
+    if hall_id:
+        hall = await get_hall(db, hall_id)
+    elif name and name.strip():
+        result = await db.execute(select(models.Hall).where(
+            or_(models.Hall.id == hall_slug(name), models.Hall.name == name.strip())
+        ))
+        hall = result.scalars().first()
+    else:
+        halls = await get_halls(db)
+        hall = halls[0] if halls else None
+    return hall if hall is not None and hall.is_active else None
+
+async def create_hall(db: AsyncSession, hall: schemas.HallCreate) -> models.Hall:
+    db_hall = models.Hall(
+        id=hall.id or hall_slug(hall.name),
+        name=hall.name.strip(),
+        is_active=hall.is_active,
+        sort_order=hall.sort_order,
+    )
+    db.add(db_hall)
+    await db.commit()
+    await db.refresh(db_hall)
+    return db_hall
+
+async def update_hall(db: AsyncSession, hall_id: str, hall: schemas.HallUpdate) -> Optional[models.Hall]:
+    db_hall = await get_hall(db, hall_id)
+    if not db_hall:
+        return None
+    for field, value in hall.model_dump(exclude_unset=True).items():
+        setattr(db_hall, field, value)
+    db.add(db_hall)
+    await db.commit()
+    await db.refresh(db_hall)
+    return db_hall
+
+async def create_booking(db: AsyncSession, booking: schemas.BookingCreate, user_id: str, hall: models.Hall) -> models.Booking:
     db_booking = models.Booking(
         id=str(uuid.uuid4()),
         created_by=str(user_id),
-        hall=booking.hall,
+        hall_id=hall.id,
+        hall=hall.name,
         start_time=booking.start_time,
         end_time=booking.end_time,
     )
@@ -56,17 +121,21 @@ async def get_bookings_in_range(
     db: AsyncSession,
     start_time: datetime,
     end_time: datetime,
-    hall: Optional[str] = None,
+    hall_id: Optional[str] = None,
 ) -> List[models.Booking]:
     """
-    Returns bookings that overlap [start_time, end_time).
+    Returns bookings that overlap [start_time, end_time), in one hall if hall_id is given
+    (ix_bookings_hall_time).
     """
-    q = select(models.Booking).where(
-        models.Booking.start_time < end_time,
-        models.Booking.end_time > start_time,
-    )
-    if hall:
-        q = q.where(models.Booking.hall == hall)
+    if booking_overlap.exclusion_active():
+        q = select(models.Booking).where(booking_overlap.overlaps(start_time, end_time))
+    else:
+        q = select(models.Booking).where(
+            models.Booking.start_time < end_time,
+            models.Booking.end_time > start_time,
+        )
+    if hall_id:
+        q = q.where(models.Booking.hall_id == hall_id)
     result = await db.execute(q)
     return result.scalars().all()
 
@@ -259,6 +328,34 @@ def sum_booking_seconds(bookings: List[models.Booking]) -> int:
             pass
     return total
 
+async def booking_quota_error(db: AsyncSession, user_id: str, start_time: datetime, end_time: datetime) -> Optional[tuple]:
+    """
+    (statuskode, melding) hvis brukeren ikke kan booke [start_time, end_time) innenfor
+    abonnementets ukekvote, ellers None. Admin-unntaket håndteres av den som kaller.
+    """
+    sub = await get_active_user_subscription(db, user_id, at_time=start_time)
+    if not sub:
+        return 403, "Du har ikke et aktivt abonnement og kan ikke booke."
+
+    hours_limit = int(getattr(sub, "hours_per_week", 0) or 0)
+    if hours_limit <= 0:
+        return 403, "Abonnementet ditt har 0 timer per uke og kan ikke booke."
+
+    week_start = start_time - timedelta(days=start_time.weekday())
+    week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_end = week_start + timedelta(days=7)
+
+    week_bookings = await get_user_bookings_in_range(db, user_id, week_start, week_end)
+    used_seconds = sum_booking_seconds(week_bookings)
+    new_seconds = int((end_time - start_time).total_seconds())
+    limit_seconds = hours_limit * 3600
+
+    if used_seconds + new_seconds > limit_seconds:
+        used_h = used_seconds / 3600
+        remaining_h = max(0.0, (limit_seconds - used_seconds) / 3600)
+        return 400, f"Ukekvoten er brukt opp. Du har {hours_limit}t/uke, brukt {used_h:.2f}t. Gjenstående {remaining_h:.2f}t."
+    return None
+
 async def update_user_profile(db: AsyncSession, user_id, data: dict):
     """
     Update fields on models.User for given user_id and persist to DB.
@@ -317,10 +414,15 @@ async def create_page_content(db: AsyncSession, content: schemas.PageContentCrea
         section_name=content.section_name,
         content=content.content,
         content_type=content.content_type,
+        content_html=render_content(content.content, content.content_type),
         created_by=user_id
     )
     db.add(db_content)
+    await db.flush()
+    await search.index_page(db, db_content.page_name)
+    await sync_image_references(db, "page_content", db_content.id, db_content.content)
     await db.commit()
+    page_content_cache.invalidate()
     await db.refresh(db_content)
     return db_content
 
@@ -333,10 +435,15 @@ async def update_page_content(db: AsyncSession, content_id: str, content: schema
     
     db_content.content = content.content
     db_content.content_type = content.content_type
+    db_content.content_html = render_content(content.content, content.content_type)
     db_content.created_by = user_id
     
     db.add(db_content)
+    await db.flush()
+    await search.index_page(db, db_content.page_name)
+    await sync_image_references(db, "page_content", db_content.id, db_content.content)
     await db.commit()
+    page_content_cache.invalidate()
     await db.refresh(db_content)
     return db_content
 
@@ -348,13 +455,91 @@ async def delete_page_content(db: AsyncSession, content_id: str):
         return None
     
     await db.delete(db_content)
+    await db.flush()
+    await search.index_page(db, db_content.page_name)
+    await sync_image_references(db, "page_content", db_content.id)
     await db.commit()
+    page_content_cache.invalidate()
     return db_content
 
+def _upsert_insert(db: AsyncSession):
+    """INSERT-konstruksjon med ON CONFLICT-støtte for databasen sesjonen er koblet til."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+async def upsert_page_content(
+    db: AsyncSession,
+    items: List[schemas.PageContentCreate],
+    user_id: str,
+    overwrite: bool = True,
+    batch_size: int = 500,
+):
+    """
+    Insert or update many sections in one statement per batch, keyed on
+    (page_name, section_name). overwrite=False keeps existing rows (seeding).
+    Returns the resulting rows.
+    """
+    # Siste forekomst vinner hvis samme seksjon står flere ganger i requesten
+    unique = {(i.page_name, i.section_name): i for i in items}
+    if not unique:
+        return []
+
+    table = models.PageContent.__table__
+    insert = _upsert_insert(db)
+    now = datetime.now()
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "page_name": item.page_name,
+            "section_name": item.section_name,
+            "content": item.content,
+            "content_type": item.content_type,
+            "content_html": render_content(item.content, item.content_type),
+            "created_at": now,
+            "updated_at": now,
+            "created_by": user_id,
+        }
+        for item in unique.values()
+    ]
+    for start in range(0, len(rows), batch_size):
+        stmt = insert(table).values(rows[start:start + batch_size])
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["page_name", "section_name"],
+                set_={
+                    "content": stmt.excluded.content,
+                    "content_type": stmt.excluded.content_type,
+                    "content_html": stmt.excluded.content_html,
+                    "updated_at": stmt.excluded.updated_at,
+                    "created_by": stmt.excluded.created_by,
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["page_name", "section_name"])
+        await db.execute(stmt)
+    result = await db.execute(
+        select(models.PageContent)
+        .filter(tuple_(models.PageContent.page_name, models.PageContent.section_name).in_(list(unique)))
+        .execution_options(populate_existing=True)
+    )
+    db_rows = result.scalars().all()
+    for page_name in {page for page, _ in unique}:
+        await search.index_page(db, page_name)
+    for db_content in db_rows:
+        await sync_image_references(db, "page_content", db_content.id, db_content.content)
+    await db.commit()
+    page_content_cache.invalidate()
+    return db_rows
+
 # Blocked Time CRUD operations
-async def get_blocked_times(db: AsyncSession, start_date = None, end_date = None):
-    """Get all blocked times, optionally filtered by date range"""
+async def get_blocked_times(db: AsyncSession, start_date = None, end_date = None, hall_id: Optional[str] = None):
+    """Get all blocked times, optionally filtered by date range and hall (blocks without hall apply to all)"""
     query = select(models.BlockedTime).filter(models.BlockedTime.is_active == True)
+    if hall_id:
+        query = query.filter(or_(models.BlockedTime.hall_id.is_(None), models.BlockedTime.hall_id == hall_id))
     
     if start_date and end_date:
         # Convert date to datetime if needed
@@ -384,6 +569,7 @@ async def create_blocked_time(db: AsyncSession, blocked_time: schemas.BlockedTim
         hour=blocked_time.hour,
         day_of_week=blocked_time.day_of_week,
         reason=blocked_time.reason,
+        hall_id=blocked_time.hall_id,
         created_by=user_id
     )
     db.add(db_blocked_time)
@@ -420,9 +606,9 @@ async def delete_blocked_time(db: AsyncSession, blocked_time_id: str):
     await db.commit()
     return db_blocked_time
 
-async def is_time_blocked(db: AsyncSession, start_time: datetime, end_time: datetime):
+async def is_time_blocked(db: AsyncSession, start_time: datetime, end_time: datetime, hall_id: Optional[str] = None):
     """Check if a specific time range is blocked"""
-    blocked_times = await get_blocked_times(db, start_time.date(), end_time.date())
+    blocked_times = await get_blocked_times(db, start_time.date(), end_time.date(), hall_id)
     
     for blocked in blocked_times:
         if blocked.block_type == "day":
@@ -450,24 +636,84 @@ async def is_time_blocked(db: AsyncSession, start_time: datetime, end_time: date
     return False, None
 
 # News Items CRUD operations
-async def get_news_items(db: AsyncSession, item_type: str = None, published: bool = None, featured: bool = None, limit: int = None):
-    """Get news items with optional filters"""
-    query = select(models.NewsItem)
+# Kolonnene listevisningene trenger; content hentes bare via get_news_item
+NEWS_SUMMARY_COLUMNS = (
+    models.NewsItem.id,
+    models.NewsItem.title,
+    models.NewsItem.excerpt,
+    models.NewsItem.item_type,
+    models.NewsItem.event_date,
+    models.NewsItem.published,
+    models.NewsItem.featured,
+    models.NewsItem.image_url,
+    models.NewsItem.created_at,
+)
+
+def encode_news_cursor(item) -> str:
+    """Opaque cursor for the sort key (event_date, created_at, id) of the last item on a page."""
+    key = {
+        "e": item["event_date"].isoformat() if item["event_date"] else None,
+        "c": item["created_at"].isoformat(),
+        "i": item["id"],
+    }
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_news_cursor(cursor: str):
+    """Returns (event_date, created_at, id). Raises ValueError for a malformed cursor."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        event_date = datetime.fromisoformat(key["e"]) if key["e"] else None
+        return event_date, datetime.fromisoformat(key["c"]), str(key["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+async def get_news_items(
+    db: AsyncSession,
+    item_type: str = None,
+    published: bool = None,
+    featured: bool = None,
+    upcoming: bool = None,
+    limit: int = 20,
+    cursor: str = None,
+):
+    """
+    Get one page of news summaries (no content), newest event first.
+    Keyset-paginated on (event_date DESC NULLS LAST, created_at DESC, id DESC).
+    upcoming=True: event_date >= now, upcoming=False: past or no event_date.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    item = models.NewsItem
+    query = select(*NEWS_SUMMARY_COLUMNS)
     
-    if item_type:
-        query = query.filter(models.NewsItem.item_type == item_type)
     if published is not None:
-        query = query.filter(models.NewsItem.published == published)
+        query = query.filter(item.published == published)
+    if item_type:
+        query = query.filter(item.item_type == item_type)
     if featured is not None:
-        query = query.filter(models.NewsItem.featured == featured)
+        query = query.filter(item.featured == featured)
+    if upcoming is not None:
+        now = datetime.now()
+        query = query.filter(item.event_date >= now if upcoming else or_(item.event_date < now, item.event_date.is_(None)))
     
-    query = query.order_by(models.NewsItem.event_date.desc().nulls_last(), models.NewsItem.created_at.desc())
+    if cursor:
+        event_date, created_at, last_id = decode_news_cursor(cursor)
+        tie = or_(item.created_at < created_at, and_(item.created_at == created_at, item.id < last_id))
+        if event_date is None:
+            # Vi er allerede i halen av rader uten event_date
+            query = query.filter(item.event_date.is_(None), tie)
+        else:
+            query = query.filter(or_(
+                item.event_date < event_date,
+                item.event_date.is_(None),
+                and_(item.event_date == event_date, tie),
+            ))
     
-    if limit:
-        query = query.limit(limit)
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+    query = query.order_by(item.event_date.desc().nulls_last(), item.created_at.desc(), item.id.desc())
+    # Hent én ekstra rad for å vite om det finnes en neste side
+    result = await db.execute(query.limit(limit + 1))
+    items = [dict(row._mapping) for row in result]
+    next_cursor = encode_news_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
 
 async def get_news_item(db: AsyncSession, item_id: str):
     """Get a single news item by ID"""
@@ -485,6 +731,7 @@ async def create_news_item(db: AsyncSession, news_item: schemas.NewsItemCreate,
     db_news_item = models.NewsItem(
         title=news_item.title,
         content=news_item.content,
+        content_html=render_content(news_item.content, "auto"),
         excerpt=news_item.excerpt,
         item_type=news_item.item_type,
         event_date=event_date,
@@ -494,6 +741,9 @@ async def create_news_item(db: AsyncSession, news_item: schemas.NewsItemCreate,
         created_by=user_id
     )
     db.add(db_news_item)
+    await db.flush()
+    await search.index_news_item(db, db_news_item)
+    await sync_image_references(db, "news_item", db_news_item.id, db_news_item.image_url, db_news_item.content)
     await db.commit()
     await db.refresh(db_news_item)
     return db_news_item
@@ -511,10 +761,15 @@ async def update_news_item(db: AsyncSession, item_id: str, news_item: schemas.Ne
         if field == 'event_date' and value is not None and hasattr(value, 'tzinfo') and value.tzinfo is not None:
             value = value.astimezone(timezone.utc).replace(tzinfo=None)
         setattr(db_news_item, field, value)
+    if "content" in update_data:
+        db_news_item.content_html = render_content(db_news_item.content, "auto")
     
     db_news_item.updated_at = datetime.now()
     
     db.add(db_news_item)
+    await db.flush()
+    await search.index_news_item(db, db_news_item)
+    await sync_image_references(db, "news_item", db_news_item.id, db_news_item.image_url, db_news_item.content)
     await db.commit()
     await db.refresh(db_news_item)
     return db_news_item
@@ -527,6 +782,8 @@ async def delete_news_item(db: AsyncSession, item_id: str):
         return None
     
     await db.delete(db_news_item)
+    await search.remove_news_item(db, db_news_item.id)
+    await sync_image_references(db, "news_item", db_news_item.id)
     await db.commit()
     return db_news_item
 
@@ -1,15 +1,19 @@
 import os
-from sqlalchemy import create_engine
+import time
+import logging
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from .settings import settings
 
-def get_database_url():
+def get_database_url(db_url: str | None = None):
     """
     Henter DATABASE_URL fra settings og konverterer til async URL hvis nødvendig.
     Støtter både SQLite og PostgreSQL.
     """
-    db_url = settings.DATABASE_URL
+    db_url = db_url or settings.DATABASE_URL
     
     # Hvis det er en PostgreSQL URL, konverter til asyncpg format
     if db_url.startswith("postgresql://"):
@@ -30,14 +34,67 @@ def get_database_url():
 
 DATABASE_URL = get_database_url()
 
+logger = logging.getLogger(__name__)
+
+def _engine_kwargs(db_url: str) -> dict:
+    """
+    Pool-innstillinger for create_async_engine.
+    SQLite bruker SQLAlchemy sin standard-pool; PostgreSQL styres fra settings.
+    """
+    kwargs = {"echo": False, "future": True}
+    if db_url.startswith("sqlite"):
+        return kwargs
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return kwargs
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Kjøres for hver ny SQLite-connection.
+    WAL lar lesere og én skriver jobbe samtidig i stedet for å låse hele filen.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+def _create_engine(db_url: str):
+    async_engine = create_async_engine(db_url, **_engine_kwargs(db_url))
+    if db_url.startswith("sqlite"):
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return async_engine
+
 # async engine for runtime
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+engine = _create_engine(DATABASE_URL)
 
 # async session factory
 AsyncSessionLocal = async_sessionmaker(
     bind=engine, expire_on_commit=False
 )
 
+# Valgfri lese-replika (DATABASE_READ_URL). Uten replika går alt mot primær.
+DATABASE_READ_URL = get_database_url(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else None
+read_engine = _create_engine(DATABASE_READ_URL) if DATABASE_READ_URL else None
+AsyncReadSessionLocal = (
+    async_sessionmaker(bind=read_engine, expire_on_commit=False)
+    if read_engine is not None
+    else AsyncSessionLocal
+)
+
+# Cookie som sier "les fra primær" en kort stund etter at klienten har skrevet noe,
+# slik at brukeren ser sine egne endringer selv om replikaen henger litt etter.
+READ_PRIMARY_COOKIE = "db_read_primary_until"
+
 # expose a sync engine for create_all convenience (kun for SQLite)
 # For PostgreSQL bruker vi async engine direkte
 try:
@@ -75,4 +132,67 @@ from . import models
 # dependency for path operations that need a DB session
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def _recently_wrote(request: Request) -> bool:
+    raw = request.cookies.get(READ_PRIMARY_COOKIE)
+    if not raw:
+        return False
+    try:
+        return float(raw) > time.time()
+    except ValueError:
+        return False
+
+# dependency for read-only path operations (bruker replika når den finnes)
+async def get_read_db(request: Request):
+    if read_engine is None or _recently_wrote(request):
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    replica = AsyncReadSessionLocal()
+    try:
+        await replica.connection()
+    except (DBAPIError, OSError) as e:
+        # Replika utilgjengelig: fall tilbake til primær i stedet for å feile requesten
+        logger.warning(f"Read replica unavailable, falling back to primary: {e}")
+        await replica.close()
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    async with replica:
+        yield replica
+
+def mark_recent_write(response, secure: bool = False, samesite: str = "lax"):
+    """Sett read-your-writes-cookien på en respons etter en vellykket skriving."""
+    if read_engine is None:
+        return
+    window = int(settings.READ_YOUR_WRITES_SECONDS)
+    response.set_cookie(
+        READ_PRIMARY_COOKIE,
+        str(time.time() + window),
+        max_age=window,
+        httponly=True,
+        secure=secure,
+        samesite=samesite,
+    )
+
+def get_pool_status(async_engine=None) -> dict:
+    """Snapshot av connection pool-statistikk for overvåking."""
+    async_engine = async_engine or engine
+    pool = async_engine.pool
+    status = {
+        "backend": async_engine.url.drivername,
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    # QueuePool-varianter eksponerer tellere; andre pool-typer gjør det ikke
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            try:
+                status[name] = fn()
+            except Exception:
+                status[name] = None
+    return status
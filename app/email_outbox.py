@@ -0,0 +1,219 @@
+"""
+Varig e-postutboks med én bakgrunnsworker.
+
+Request-handlere kaller `enqueue_email`, som bare skriver en rad i `email_outbox`.
+Workeren (startet i lifespan) henter forfalte meldinger i batcher, sender dem via
+en langlevd EmailTransport og prøver på nytt med eksponentiell backoff. Meldinger
+overlever omstart fordi de ligger i databasen til de er sendt.
+
+Flere workere/prosesser kan kjøre samtidig: en melding "claimes" ved at
+next_attempt_at skyves frem (lease) før sending, og på PostgreSQL brukes
+SKIP LOCKED slik at to workere ikke plukker samme rad.
+
+Meldingsteksten kan inneholde passord (user_credentials) og tømmes når meldingen
+er sendt eller har feilet for godt. Meldinger som fortsatt ikke er sendt etter
+EMAIL_OUTBOX_PENDING_MAX_AGE_HOURS gis opp og tømmes på samme måte.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import AsyncSessionLocal
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PURGE_INTERVAL_SECONDS = 600
+
+
+async def enqueue_email(db: AsyncSession, msg, commit: bool = True) -> models.EmailOutbox:
+    """Legg en melding (app.emails.EmailMessage) i utboksen og vekk workeren."""
+    row = models.EmailOutbox(
+        kind=msg.kind,
+        recipient=msg.recipient,
+        reply_to=msg.reply_to,
+        subject=msg.subject,
+        body=msg.body,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(),
+    )
+    db.add(row)
+    if commit:
+        await db.commit()
+        outbox_worker.notify()
+    return row
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Eksponentiell backoff: base, 2*base, 4*base, ... begrenset til maks."""
+    seconds = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+class EmailOutboxWorker:
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self._session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._transport = None
+        self._stopping = False
+        self._last_purge = 0.0
+
+    def notify(self):
+        """Be workeren sjekke utboksen nå i stedet for å vente på neste poll."""
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is not None or not settings.EMAIL_OUTBOX_ENABLED:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="email-outbox-worker")
+        logger.info("✅ Email outbox worker started")
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._transport is not None:
+            await self._transport.close()
+            self._transport = None
+        logger.info("🛑 Email outbox worker stopped")
+
+    async def _run(self):
+        while not self._stopping:
+            # Nullstill før batchen hentes, så en notify() underveis gir en ny runde med en gang
+            self._wakeup.clear()
+            try:
+                await self._purge_stale()
+                # Tøm alle forfalte meldinger før vi legger oss til å vente
+                while await self.process_batch() >= settings.EMAIL_OUTBOX_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Email outbox worker error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_batch(self) -> List[models.EmailOutbox]:
+        now = datetime.now()
+        async with self._session_factory() as db:
+            q = (
+                select(models.EmailOutbox)
+                .where(models.EmailOutbox.status == "pending")
+                .where(models.EmailOutbox.next_attempt_at <= now)
+                .order_by(models.EmailOutbox.next_attempt_at.asc())
+                .limit(settings.EMAIL_OUTBOX_BATCH_SIZE)
+            )
+            if db.bind.dialect.name == "postgresql":
+                q = q.with_for_update(skip_locked=True)
+            rows = (await db.execute(q)).scalars().all()
+            lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+            for row in rows:
+                row.attempts = (row.attempts or 0) + 1
+                row.next_attempt_at = lease_until
+            await db.commit()
+            return rows
+
+    async def process_batch(self) -> int:
+        """Send én batch med forfalte meldinger. Returnerer antall behandlet."""
+        rows = await self._claim_batch()
+        if not rows:
+            return 0
+
+        if self._transport is None:
+            from .emails import EmailTransport
+            self._transport = EmailTransport()
+
+        from .emails import EmailMessage
+        results = []
+        for row in rows:
+            msg = EmailMessage(
+                recipient=row.recipient,
+                subject=row.subject,
+                body=row.body,
+                reply_to=row.reply_to,
+                kind=row.kind,
+            )
+            try:
+                transport = await self._transport.send(msg)
+                results.append((row.id, transport, None))
+                logger.info(f"✅ Email {row.id} ({row.kind}) sent via {transport} to {row.recipient}")
+            except Exception as e:
+                results.append((row.id, None, str(e)))
+
+        await self._record_results(results)
+        return len(rows)
+
+    async def _record_results(self, results):
+        now = datetime.now()
+        async with self._session_factory() as db:
+            ids = [r[0] for r in results]
+            rows = {
+                row.id: row
+                for row in (await db.execute(
+                    select(models.EmailOutbox).where(models.EmailOutbox.id.in_(ids))
+                )).scalars().all()
+            }
+            for row_id, transport, error in results:
+                row = rows.get(row_id)
+                if row is None:
+                    continue
+                if error is None:
+                    row.status = "sent"
+                    row.transport = transport
+                    row.sent_at = now
+                    row.last_error = None
+                    # Ikke behold passord/personopplysninger etter at meldingen er levert
+                    row.body = ""
+                elif row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    row.status = "failed"
+                    row.last_error = error
+                    row.body = ""
+                    logger.error(f"❌ Email {row.id} ({row.kind}) failed permanently after {row.attempts} attempts: {error}")
+                else:
+                    row.last_error = error
+                    row.next_attempt_at = now + retry_delay(row.attempts)
+                    logger.warning(f"⚠️ Email {row.id} ({row.kind}) attempt {row.attempts} failed, retrying at {row.next_attempt_at}: {error}")
+            await db.commit()
+
+    async def _purge_stale(self):
+        """Gi opp meldinger som har ventet for lenge, og tøm tekst som ligger igjen på feilede meldinger."""
+        if time.monotonic() - self._last_purge < _PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        now = datetime.now()
+        table = models.EmailOutbox
+        async with self._session_factory() as db:
+            expired = await db.execute(
+                update(table)
+                .where(
+                    table.status == "pending",
+                    table.created_at < now - timedelta(hours=settings.EMAIL_OUTBOX_PENDING_MAX_AGE_HOURS),
+                    table.next_attempt_at <= now,  # ikke midt i en sending
+                )
+                .values(status="failed", body="", last_error="Ikke sendt innen fristen, gitt opp")
+            )
+            await db.execute(update(table).where(table.status == "failed", table.body != "").values(body=""))
+            await db.commit()
+        if expired.rowcount:
+            logger.warning(f"🧹 Gave up on {expired.rowcount} stale outbox emails")
+
+
+outbox_worker = EmailOutboxWorker()
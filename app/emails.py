@@ -0,0 +1,259 @@
+"""
+E-postmaler og transport (Resend API med SMTP som fallback).
+
+Utsendingen skjer i bakgrunnsworkeren i app/email_outbox.py. Request-handlere
+bygger bare meldingen og legger den i utboksen. smtplib, email.mime og httpx
+importeres først når workeren faktisk sender noe.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RESEND_API_URL = "https://api.resend.com/emails"
+
+
+@dataclass
+class EmailMessage:
+    recipient: str
+    subject: str
+    body: str
+    reply_to: Optional[str] = None
+    kind: str = "generic"
+
+
+class EmailSendError(Exception):
+    """Meldingen kunne ikke sendes via noen transport."""
+
+
+# --- Maler ---
+
+def user_credentials_email(user_email: str, user_name: str, password: str, is_admin: bool) -> EmailMessage:
+    """Velkomst-e-post med innloggingsdetaljer til en ny bruker."""
+    role_text = "administrator" if is_admin else "standard bruker"
+
+    email_body = f"""
+Hei {user_name or 'der'}!
+
+Din brukerkonto hos TG Tromsø har blitt opprettet.
+
+Innloggingsdetaljer:
+E-post: {user_email}
+Passord: {password}
+Rolle: {role_text}
+
+Viktig:
+- Dette passordet er midlertidig. Vi anbefaler at du endrer det ved første innlogging.
+- Du kan endre passordet i kontoinnstillingene etter at du har logget inn.
+
+For å logge inn, gå til innloggingssiden og bruk e-postadressen og passordet over.
+
+Hvis du har spørsmål, ta kontakt med oss.
+
+Med vennlig hilsen,
+TG Tromsø
+
+---
+Dette er en automatisk e-post fra TG Tromsø.
+Ikke svar på denne e-posten.
+"""
+    return EmailMessage(
+        recipient=user_email,
+        subject="Velkommen til TG Tromsø - Dine innloggingsdetaljer",
+        body=email_body,
+        kind="user_credentials",
+    )
+
+
+def contact_form_email(
+    contact_name: str,
+    contact_email: str,
+    contact_phone: Optional[str],
+    contact_subject: str,
+    contact_message: str,
+) -> EmailMessage:
+    """Henvendelse fra kontaktskjemaet til konfigurert mottaker."""
+    recipient_email = os.getenv("CONTACT_RECIPIENT_EMAIL", "tgnrk@gmail.com")
+
+    email_body = f"""
+Ny henvendelse fra kontaktskjemaet:
+
+Navn: {contact_name}
+E-post: {contact_email}
+Telefon: {contact_phone or 'Ikke oppgitt'}
+Emne: {contact_subject}
+
+Melding:
+{contact_message}
+
+---
+Dette er en automatisk melding fra TG Tromsø kontaktskjema.
+Svar til: {contact_email}
+"""
+    return EmailMessage(
+        recipient=recipient_email,
+        subject=f"Kontaktskjema: {contact_subject}",
+        body=email_body,
+        reply_to=contact_email,
+        kind="contact_form",
+    )
+
+
+def waitlist_email(user_email: str, user_name: str, hall_name: str, start_time, end_time, booked: bool) -> EmailMessage:
+    """Tid fra ventelisten er blitt ledig (og evt. booket automatisk)."""
+    when = f"{start_time:%d.%m.%Y} kl. {start_time:%H:%M}–{end_time:%H:%M}"
+    if booked:
+        intro = f"Tiden du sto på venteliste for er blitt ledig, og vi har booket den til deg:\n\n{hall_name}, {when}"
+        outro = "Bookingen ligger under Mine bookinger. Kan du ikke likevel, slett den så neste på listen får tiden."
+        subject = f"Du har fått tiden {when}"
+    else:
+        intro = f"Tiden du sto på venteliste for er blitt ledig:\n\n{hall_name}, {when}"
+        outro = "Tiden er ikke reservert for deg. Book den på nettsiden hvis du fortsatt vil ha den."
+        subject = f"Ledig tid: {when}"
+
+    email_body = f"""
+Hei {user_name or 'der'}!
+
+{intro}
+
+{outro}
+
+Med vennlig hilsen,
+TG Tromsø
+
+---
+Dette er en automatisk e-post fra TG Tromsø.
+Ikke svar på denne e-posten.
+"""
+    return EmailMessage(
+        recipient=user_email,
+        subject=subject,
+        body=email_body,
+        kind="waitlist",
+    )
+
+
+# --- Transport ---
+
+class EmailTransport:
+    """
+    Langlevd transport som eies av utboks-workeren.
+    Holder én httpx.AsyncClient for Resend og én SMTP-connection som gjenbrukes
+    mellom meldinger. SMTP er blokkerende og kjøres derfor i en tråd.
+    """
+
+    def __init__(self):
+        self.resend_api_key = os.getenv("RESEND_API_KEY", "")
+        self.resend_from = os.getenv("RESEND_FROM_EMAIL", os.getenv("SMTP_USER", "noreply@tgtromso.no"))
+        self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+        self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
+        self.smtp_user = os.getenv("SMTP_USER", "")
+        self.smtp_password = os.getenv("SMTP_PASSWORD", "")
+        self.smtp_starttls = os.getenv("SMTP_STARTTLS", "true").lower() != "false"
+        self._http = None
+        self._smtp = None
+
+    @property
+    def has_resend(self) -> bool:
+        return bool(self.resend_api_key)
+
+    @property
+    def has_smtp(self) -> bool:
+        # Lokal SMTP-stand-in (f.eks. `python -m aiosmtpd -n`) trenger ikke innlogging
+        return bool(self.smtp_server) and (bool(self.smtp_user and self.smtp_password) or not self.smtp_starttls)
+
+    async def send(self, msg: EmailMessage) -> str:
+        """Send meldingen. Returnerer navnet på transporten som ble brukt."""
+        errors = []
+        if self.has_resend:
+            try:
+                await self._send_resend(msg)
+                return "resend"
+            except Exception as e:
+                logger.error(f"❌ Error sending email via Resend API: {e}")
+                errors.append(f"resend: {e}")
+        if self.has_smtp:
+            try:
+                await asyncio.to_thread(self._send_smtp_blocking, msg)
+                return "smtp"
+            except Exception as e:
+                logger.error(f"❌ SMTP error (Railway may block SMTP on free tier): {e}")
+                errors.append(f"smtp: {e}")
+        if not errors:
+            raise EmailSendError("Neither RESEND_API_KEY nor SMTP credentials are configured")
+        raise EmailSendError("; ".join(errors))
+
+    async def _send_resend(self, msg: EmailMessage):
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                timeout=10.0,
+                headers={"Authorization": f"Bearer {self.resend_api_key}"},
+            )
+        payload = {
+            "from": self.resend_from,
+            "to": [msg.recipient],
+            "subject": msg.subject,
+            "text": msg.body,
+        }
+        if msg.reply_to:
+            payload["reply_to"] = msg.reply_to
+        response = await self._http.post(RESEND_API_URL, json=payload)
+        if response.status_code != 200:
+            raise EmailSendError(f"Resend API error: {response.status_code} - {response.text}")
+
+    def _smtp_connect(self):
+        import smtplib
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10)
+        if self.smtp_starttls:
+            server.starttls()
+        if self.smtp_user and self.smtp_password:
+            server.login(self.smtp_user, self.smtp_password)
+        return server
+
+    def _send_smtp_blocking(self, msg: EmailMessage):
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        sender = self.smtp_user or self.resend_from
+        mime = MIMEMultipart()
+        # Use SMTP user as From (required by most SMTP servers)
+        mime['From'] = sender
+        mime['To'] = msg.recipient
+        if msg.reply_to:
+            mime['Reply-To'] = msg.reply_to
+        mime['Subject'] = msg.subject
+        mime.attach(MIMEText(msg.body, 'plain', 'utf-8'))
+        text = mime.as_string()
+
+        # Gjenbruk connection; koble til på nytt én gang hvis serveren har lukket den
+        for attempt in range(2):
+            if self._smtp is None:
+                self._smtp = self._smtp_connect()
+            try:
+                self._smtp.sendmail(sender, msg.recipient, text)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt == 1:
+                    raise
+
+    def _smtp_quit_blocking(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._smtp is not None:
+            await asyncio.to_thread(self._smtp_quit_blocking)
@@ -0,0 +1,286 @@
+"""
+iCalendar-feeder (.ics) for hallen og for hvert medlem.
+
+- /calendar/hall.ics: alle bookinger (uten navn) og aktive blokkeringer.
+- /calendar/halls/{hall_id}.ics: det samme for én hall.
+- /calendar/{token}.ics: medlemmets egne bookinger; token fra calendar_tokens.
+
+Kalenderapper poller ofte, så en ferdig generert feed caches i minnet sammen med
+en dataversjon (antall rader + siste updated_at). Innenfor
+CALENDAR_FEED_TTL_SECONDS svares det uten databasekall; etterpå sjekkes bare
+versjonen. ETag er avledet av versjonen, så If-None-Match gir 304 uten at feeden
+bygges. Radene leses med db.stream() i stedet for å laste alt i minnet først.
+
+Tider i databasen er naive veggklokketider i CALENDAR_TIMEZONE (Europe/Oslo).
+"""
+
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi import Request, Response
+from sqlalchemy import func, or_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .settings import settings
+
+PRODID = "-//TG Tromsø//HallBooking//NO"
+_CACHE_SIZE = 256
+
+# Europe/Oslo (CET/CEST), kreves av RFC 5545 når TZID brukes
+_VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    "TZID:Europe/Oslo",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "TZNAME:CEST",
+    "DTSTART:19700329T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "TZNAME:CET",
+    "DTSTART:19701025T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+# feed-nøkkel -> (versjon, etag, body, sjekket_monotonic)
+_cache: "OrderedDict[str, Tuple[tuple, str, bytes, float]]" = OrderedDict()
+
+
+# --- Formatering ---
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Del linjer over 75 oktetter (RFC 5545 3.1) uten å splitte UTF-8-tegn."""
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _local(dt: datetime) -> str:
+    return dt.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(dt: datetime) -> str:
+    # Naive tider tolkes som veggklokketid i kalendersonen
+    aware = dt.replace(tzinfo=ZoneInfo(settings.CALENDAR_TIMEZONE)) if dt.tzinfo is None else dt
+    return aware.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event(uid: str, stamp: Optional[datetime], summary: str, props: List[str]) -> List[str]:
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_utc(stamp or datetime(1970, 1, 1))}",
+        f"SUMMARY:{_escape(summary)}",
+        *props,
+        "END:VEVENT",
+    ]
+
+
+def booking_event(booking: models.Booking, summary: str) -> List[str]:
+    tz = settings.CALENDAR_TIMEZONE
+    return _event(
+        f"booking-{booking.id}@hallbooking",
+        booking.updated_at or booking.created_at,
+        summary,
+        [
+            f"DTSTART;TZID={tz}:{_local(booking.start_time)}",
+            f"DTEND;TZID={tz}:{_local(booking.end_time)}",
+            f"LOCATION:{_escape(booking.hall)}",
+        ],
+    )
+
+
+def blocked_event(blocked: models.BlockedTime) -> List[str]:
+    """Blokkeringer som (gjentakende) hendelser: hel dag, fast ukedag eller fast time hver dag."""
+    tz = settings.CALENDAR_TIMEZONE
+    first, last = blocked.start_date.date(), blocked.end_date.date()
+    if blocked.block_type == "weekly" and blocked.day_of_week is not None:
+        first += timedelta(days=(blocked.day_of_week - first.weekday()) % 7)
+        props = [
+            f"DTSTART;VALUE=DATE:{first:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{first + timedelta(days=1):%Y%m%d}",
+            f"RRULE:FREQ=WEEKLY;UNTIL={last:%Y%m%d}",
+        ]
+        summary = blocked.reason or "Ukedag blokkert"
+    elif blocked.block_type == "hour" and blocked.hour is not None:
+        start = datetime.combine(first, datetime.min.time()).replace(hour=blocked.hour)
+        until = datetime.combine(last, datetime.min.time()).replace(hour=blocked.hour)
+        props = [
+            f"DTSTART;TZID={tz}:{_local(start)}",
+            f"DTEND;TZID={tz}:{_local(start + timedelta(hours=1))}",
+            f"RRULE:FREQ=DAILY;UNTIL={_utc(until)}",
+        ]
+        summary = blocked.reason or "Time blokkert"
+    else:
+        props = [
+            f"DTSTART;VALUE=DATE:{first:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{last + timedelta(days=1):%Y%m%d}",
+        ]
+        summary = blocked.reason or "Dag blokkert"
+    if first > last:
+        return []
+    return _event(f"blocked-{blocked.id}@hallbooking", blocked.updated_at or blocked.created_at, summary, props + ["TRANSP:OPAQUE"])
+
+
+def _calendar(name: str, events: Iterable[List[str]]) -> bytes:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+        f"X-WR-TIMEZONE:{settings.CALENDAR_TIMEZONE}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:PT{max(1, settings.CALENDAR_FEED_TTL_SECONDS // 60)}M",
+        *_VTIMEZONE,
+    ]
+    for event in events:
+        lines.extend(event)
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+# --- Data ---
+
+def _window_start() -> datetime:
+    return datetime.now() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+
+
+def _blocked_in_hall(hall_id: Optional[str]):
+    # Blokkeringer uten hall gjelder alle haller
+    if hall_id is None:
+        return true()
+    return or_(models.BlockedTime.hall_id.is_(None), models.BlockedTime.hall_id == hall_id)
+
+
+async def _version(db: AsyncSession, user_id: Optional[str], hall_id: Optional[str] = None) -> tuple:
+    """Endres når en booking/blokkering legges til, endres eller slettes."""
+    bookings = select(func.count(), func.max(models.Booking.updated_at))
+    if user_id is not None:
+        bookings = bookings.where(models.Booking.created_by == user_id)
+    if hall_id is not None:
+        bookings = bookings.where(models.Booking.hall_id == hall_id)
+    version = tuple((await db.execute(bookings)).one())
+    if user_id is None:
+        blocked = select(func.count(), func.max(models.BlockedTime.updated_at)).where(_blocked_in_hall(hall_id))
+        version += tuple((await db.execute(blocked)).one())
+    # Vinduet flytter seg én gang i døgnet
+    return version + (date.today().isoformat(),)
+
+
+async def _build(db: AsyncSession, user_id: Optional[str], hall: Optional[models.Hall] = None) -> bytes:
+    events: List[List[str]] = []
+    query = (
+        select(models.Booking)
+        .where(models.Booking.end_time >= _window_start())
+        .order_by(models.Booking.start_time)
+    )
+    if user_id is not None:
+        query = query.where(models.Booking.created_by == user_id)
+    if hall is not None:
+        query = query.where(models.Booking.hall_id == hall.id)
+    async for booking in await db.stream_scalars(query):
+        summary = f"Hallbooking: {booking.hall}" if user_id else "Opptatt"
+        events.append(booking_event(booking, summary))
+
+    if user_id is None:
+        blocked_query = select(models.BlockedTime).where(
+            models.BlockedTime.is_active == True,
+            models.BlockedTime.end_date >= _window_start(),
+            _blocked_in_hall(hall.id if hall is not None else None),
+        )
+        async for blocked in await db.stream_scalars(blocked_query):
+            event = blocked_event(blocked)
+            if event:
+                events.append(event)
+        return _calendar(f"TG Tromsø – {hall.name}" if hall is not None else "TG Tromsø – hallen", events)
+    return _calendar("Mine hallbookinger", events)
+
+
+async def feed_response(
+    request: Request, db: AsyncSession, user_id: Optional[str] = None, hall: Optional[models.Hall] = None
+) -> Response:
+    """Svar for hallfeeden (user_id=None, evt. én hall) eller et medlems feed, med cache og 304."""
+    key = f"user:{user_id}" if user_id else (f"hall:{hall.id}" if hall is not None else "hall")
+    entry = _cache.get(key)
+    now = time.monotonic()
+
+    if entry is None or now - entry[3] >= settings.CALENDAR_FEED_TTL_SECONDS:
+        hall_id = hall.id if hall is not None else None
+        version = await _version(db, user_id, hall_id)
+        if entry is None or entry[0] != version:
+            body = await _build(db, user_id, hall)
+            etag = '"' + hashlib.sha256(repr((key, version)).encode()).hexdigest()[:32] + '"'
+            entry = (version, etag, body, now)
+        else:
+            entry = (entry[0], entry[1], entry[2], now)
+        _cache[key] = entry
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    _cache.move_to_end(key)
+
+    _, etag, body, _checked = entry
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"{'private' if user_id else 'public'}, max-age={settings.CALENDAR_FEED_TTL_SECONDS}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+# --- Token ---
+
+async def get_or_create_token(db: AsyncSession, user_id: str, rotate: bool = False) -> str:
+    result = await db.execute(select(models.CalendarToken).where(models.CalendarToken.user_id == user_id))
+    row = result.scalar_one_or_none()
+    if row is not None and not rotate:
+        return row.token
+    token = secrets.token_urlsafe(32)
+    if row is None:
+        db.add(models.CalendarToken(user_id=user_id, token=token))
+    else:
+        row.token = token
+        row.created_at = datetime.now()
+    await db.commit()
+    return token
+
+
+async def user_for_token(db: AsyncSession, token: str) -> Optional[str]:
+    """user_id for et gyldig token (aktiv bruker), ellers None."""
+    from .crud import get_user_by_id
+
+    result = await db.execute(select(models.CalendarToken.user_id).where(models.CalendarToken.token == token))
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        return None
+    user = await get_user_by_id(db, user_id)
+    return user_id if user is not None and user.is_active else None
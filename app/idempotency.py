@@ -0,0 +1,234 @@
+"""
+Idempotency-Key for POST-er som ikke tåler å kjøres to ganger.
+
+Mobilnett mister svar, og klienten prøver på nytt. Sender klienten samme
+`Idempotency-Key` ved retry, lagres første svar og spilles av på nytt i stedet
+for at handleren kjøres igjen (ingen dobbel booking, ingen ny velkomst-e-post).
+
+- Nøkkelen gjelder per (scope, bruker), så to brukere kan ikke se hverandres svar.
+- Samme nøkkel med en annen body gir 422.
+- Mens første forespørsel pågår gir en retry 409. Krasjet den underveis, kan
+  nøkkelen tas over etter IDEMPOTENCY_IN_PROGRESS_SECONDS.
+- Svar med status < 500 lagres (også 400 "Tiden er allerede booket"), unntatt
+  409/429 som er ment å prøves igjen. 5xx og uventede feil frigjør nøkkelen.
+
+Tabellen idempotency_keys er fasiten og deles av alle workere. Ferdige svar holdes
+også i en LRU i minnet, så en retry mot samme worker ikke trenger databasen.
+Felter i `private_fields` (f.eks. generert passord) lagres bare i minnet, aldri i
+tabellen. Utløpte rader slettes fortløpende ved nye nøkler.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import AsyncSessionLocal
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+_MAX_KEY_LENGTH = 255
+_PURGE_INTERVAL_SECONDS = 600
+_RETRYABLE_STATUS = (409, 429)
+
+CacheKey = Tuple[str, str, str]
+
+
+def request_hash(payload: BaseModel) -> str:
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(status_code: int, body: Any) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+
+class IdempotencyStore:
+    def __init__(self, session_factory=AsyncSessionLocal, cache_size: int = 1024):
+        self._session_factory = session_factory
+        self._cache_size = max(0, cache_size)
+        # (scope, user_id, key) -> (request_hash, status, body, expires_at)
+        self._cache: "OrderedDict[CacheKey, Tuple[str, int, Any, datetime]]" = OrderedDict()
+        self._last_purge = 0.0
+
+    async def run(
+        self,
+        request: Request,
+        scope: str,
+        user_id: str,
+        payload: BaseModel,
+        handler: Callable[[], Awaitable[Any]],
+        private_fields: Iterable[str] = (),
+    ):
+        """Kjør `handler` én gang per Idempotency-Key; uten headeren kjøres den som vanlig."""
+        key = request.headers.get(HEADER, "").strip()
+        if not key:
+            return await handler()
+        if len(key) > _MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"{HEADER} kan være maks {_MAX_KEY_LENGTH} tegn")
+
+        cache_key = (scope, user_id, key)
+        fingerprint = request_hash(payload)
+
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self._check_hash(cached[0], fingerprint)
+            return _replay(cached[1], cached[2])
+
+        stored = await self._claim(cache_key, fingerprint)
+        if stored is not None:
+            return _replay(*stored)
+
+        try:
+            result = await handler()
+        except HTTPException as exc:
+            if exc.status_code < 500 and exc.status_code not in _RETRYABLE_STATUS:
+                await self._complete(cache_key, fingerprint, exc.status_code, {"detail": exc.detail}, private_fields)
+            else:
+                await self._release(cache_key)
+            raise
+        except BaseException:
+            await self._release(cache_key)
+            raise
+
+        await self._complete(cache_key, fingerprint, 200, jsonable_encoder(result), private_fields)
+        return result
+
+    # --- Minne ---
+
+    def _cache_get(self, cache_key: CacheKey) -> Optional[Tuple[str, int, Any, datetime]]:
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[3] <= datetime.now():
+            del self._cache[cache_key]
+            return None
+        self._cache.move_to_end(cache_key)
+        return entry
+
+    def _cache_put(self, cache_key: CacheKey, entry: Tuple[str, int, Any, datetime]):
+        if self._cache_size == 0:
+            return
+        self._cache[cache_key] = entry
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _check_hash(stored: str, fingerprint: str):
+        if stored != fingerprint:
+            raise HTTPException(status_code=422, detail=f"{HEADER} er allerede brukt med en annen forespørsel")
+
+    # --- Tabell ---
+
+    @staticmethod
+    def _where(cache_key: CacheKey):
+        scope, user_id, key = cache_key
+        table = models.IdempotencyKey
+        return (table.scope == scope, table.user_id == user_id, table.key == key)
+
+    async def _claim(self, cache_key: CacheKey, fingerprint: str) -> Optional[Tuple[int, Any]]:
+        """Reserver nøkkelen. Returnerer (status, body) hvis et svar allerede er lagret."""
+        scope, user_id, key = cache_key
+        table = models.IdempotencyKey
+        now = datetime.now()
+        async with self._session_factory() as db:
+            await self._purge_expired(db, now)
+            row = (await db.execute(select(table).where(*self._where(cache_key)))).scalar_one_or_none()
+
+            if row is not None and row.expires_at <= now:
+                await db.delete(row)
+                await db.flush()
+                row = None
+
+            if row is not None:
+                self._check_hash(row.request_hash, fingerprint)
+                if row.status == "completed":
+                    body = json.loads(row.response_body) if row.response_body is not None else None
+                    return row.response_status, body
+                if now - row.created_at < timedelta(seconds=settings.IDEMPOTENCY_IN_PROGRESS_SECONDS):
+                    raise HTTPException(status_code=409, detail="En forespørsel med samme nøkkel pågår allerede")
+                # Forrige forsøk døde underveis: ta over, men bare én av flere samtidige retries
+                result = await db.execute(
+                    update(table)
+                    .where(*self._where(cache_key), table.status == "in_progress", table.created_at == row.created_at)
+                    .values(created_at=now)
+                )
+                await db.commit()
+                if result.rowcount != 1:
+                    raise HTTPException(status_code=409, detail="En forespørsel med samme nøkkel pågår allerede")
+                logger.warning(f"♻️ Taking over stale idempotency key for {scope}")
+                return None
+
+            db.add(table(
+                scope=scope,
+                user_id=user_id,
+                key=key,
+                request_hash=fingerprint,
+                status="in_progress",
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+            ))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="En forespørsel med samme nøkkel pågår allerede")
+        return None
+
+    async def _complete(self, cache_key: CacheKey, fingerprint: str, status_code: int, body: Any, private_fields: Iterable[str]):
+        expires_at = datetime.now() + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        stored_body = body
+        private = set(private_fields)
+        if private and isinstance(body, dict):
+            stored_body = {k: v for k, v in body.items() if k not in private}
+        try:
+            async with self._session_factory() as db:
+                await db.execute(
+                    update(models.IdempotencyKey)
+                    .where(*self._where(cache_key))
+                    .values(
+                        status="completed",
+                        response_status=status_code,
+                        response_body=json.dumps(stored_body),
+                        expires_at=expires_at,
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            # Handleren er allerede utført; en retry får 409 til nøkkelen kan tas over
+            logger.error(f"❌ Could not store idempotent response for {cache_key[0]}: {e}")
+        self._cache_put(cache_key, (fingerprint, status_code, body, expires_at))
+
+    async def _release(self, cache_key: CacheKey):
+        try:
+            async with self._session_factory() as db:
+                await db.execute(delete(models.IdempotencyKey).where(*self._where(cache_key)))
+                await db.commit()
+        except Exception as e:
+            logger.error(f"❌ Could not release idempotency key for {cache_key[0]}: {e}")
+
+    async def _purge_expired(self, db, now: datetime):
+        if time.monotonic() - self._last_purge < _PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        result = await db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= now))
+        await db.commit()
+        if result.rowcount:
+            logger.info(f"🧹 Purged {result.rowcount} expired idempotency keys")
+
+
+idempotency = IdempotencyStore(cache_size=settings.IDEMPOTENCY_CACHE_SIZE)
@@ -0,0 +1,379 @@
+"""
+Bildeopplasting og nedskalerte varianter.
+
+- `UploadSizeLimitMiddleware` teller bytes mens requesten strømmer inn og svarer 413
+  så snart grensen er passert (også uten Content-Length).
+- `save_image_upload` kopierer filen i biter i en tråd, sjekker grensen underveis,
+  bestemmer filtypen fra magic bytes (ikke klientens content_type eller filnavn) og
+  skriver til en midlertidig fil som flyttes på plass med os.replace. Filnavnet er
+  sha256 av innholdet, så samme bilde lagres bare én gang og URL-en aldri endres.
+- `sync_image_references` registrerer hvilke bilder nyheter og sideinnhold bruker,
+  slik at gc_images.py kan slette filer ingen peker på.
+- `generate_variants` lager WebP- og JPEG-varianter i faste bredder i en
+  ProcessPoolExecutor (Pillow er valgfritt) og registrerer dem i `image_variants`.
+  `variant_file` brukes av /uploads/images/{filnavn}?w=... og genererer varianter
+  for eldre bilder første gang de etterspørres.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import AsyncSessionLocal
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Plass til multipart-grenser og andre felter rundt selve filen
+MULTIPART_OVERHEAD = 64 * 1024
+
+# (prefiks, offset, content_type, filendelse)
+_SIGNATURES = [
+    (b"\xff\xd8\xff", 0, "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png", ".png"),
+    (b"GIF87a", 0, "image/gif", ".gif"),
+    (b"GIF89a", 0, "image/gif", ".gif"),
+    (b"WEBP", 8, "image/webp", ".webp"),
+]
+
+
+# <sha256>.<ext>, og varianter av slike filer: <sha256>.<ext>.<bredde>.<ext>
+_HASHED_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z]+(\.\d+\.[a-z]+)?$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UnsupportedImageType(Exception):
+    pass
+
+
+@dataclass
+class StoredImage:
+    filename: str
+    path: Path
+    size: int
+    content_type: str
+    deduplicated: bool = False  # samme innhold fantes fra før
+
+
+def detect_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """(content_type, filendelse) ut fra de første bytene, eller None."""
+    for prefix, offset, content_type, ext in _SIGNATURES:
+        if head[offset:offset + len(prefix)] == prefix:
+            if content_type == "image/webp" and head[:4] != b"RIFF":
+                continue
+            return content_type, ext
+    return None
+
+
+def _store_blocking(src, dest_dir: Path, max_bytes: int) -> StoredImage:
+    src.seek(0)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    # Samme katalog som målet, så os.replace er en atomisk rename
+    fd, tmp_name = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".tmp")
+    try:
+        size = 0
+        detected = None
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if detected is None:
+                    detected = detect_image_type(chunk[:16])
+                    if detected is None:
+                        raise UnsupportedImageType()
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+        if detected is None:
+            raise UnsupportedImageType()
+
+        content_type, ext = detected
+        filename = f"{digest.hexdigest()}{ext}"
+        final_path = dest_dir / filename
+        try:
+            # Fornyer mtime, så gc_images.py gir en gjenopplastet fil samme frist som en ny
+            os.utime(final_path)
+            deduplicated = True
+        except FileNotFoundError:
+            deduplicated = False
+        if deduplicated:
+            os.unlink(tmp_name)
+        else:
+            os.replace(tmp_name, final_path)
+        return StoredImage(filename=filename, path=final_path, size=size, content_type=content_type, deduplicated=deduplicated)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def is_content_addressed(filename: str) -> bool:
+    """Filnavn avledet av sha256 (originaler og deres varianter); innholdet bak slike URL-er endres aldri."""
+    return _HASHED_NAME.match(filename) is not None
+
+
+async def save_image_upload(upload: UploadFile, dest_dir: Path, max_bytes: int) -> StoredImage:
+    """Lagre et opplastet bilde. Kaster UploadTooLarge / UnsupportedImageType."""
+    return await asyncio.to_thread(_store_blocking, upload.file, dest_dir, max_bytes)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI-middleware som avviser for store request-bodyer på gitte stier med 413,
+    før multipart-parseren har spolet hele filen til disk.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    # Later som klienten koblet fra, så parseren slutter å lese
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if too_large:
+                # Erstatt feilsvaret fra appen (avbrutt parsing) med 413
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "File too large"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# --- Varianter ---
+
+VARIANT_WIDTHS = (320, 640, 1600)  # thumbnail, kort, fullbredde
+VARIANT_FORMATS = {"webp": ".webp", "jpeg": ".jpg"}
+VARIANT_MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# GIF kan være animert og serveres alltid som original
+VARIANT_SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+VARIANT_DIR = Path("images") / "variants"  # relativ til UPLOAD_ROOT
+
+_pool: Optional[ProcessPoolExecutor] = None
+_generation_locks: Dict[str, asyncio.Lock] = {}
+
+
+@lru_cache(maxsize=None)
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def can_generate_variants(source: str) -> bool:
+    return (
+        settings.IMAGE_VARIANTS_ENABLED
+        and Path(source).suffix.lower() in VARIANT_SOURCE_SUFFIXES
+        and pillow_available()
+    )
+
+
+def variant_width_for(requested: int) -> int:
+    """Minste variantbredde som dekker `requested`, ellers den største."""
+    return next((w for w in VARIANT_WIDTHS if w >= requested), VARIANT_WIDTHS[-1])
+
+
+def variant_relpath(source: str, width: int, fmt: str) -> Path:
+    return VARIANT_DIR / f"{source}.{width}{VARIANT_FORMATS[fmt]}"
+
+
+def _generate_variants_blocking(source_path: str, upload_root: str, widths, formats) -> List[dict]:
+    """Kjøres i en egen prosess. Returnerer én dict per skrevet fil."""
+    from PIL import Image, ImageOps
+
+    source = Path(source_path)
+    results = []
+    with Image.open(source) as original:
+        img = ImageOps.exif_transpose(original)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        for width in widths:
+            if img.width > width:
+                resized = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            else:
+                resized = img  # aldri oppskaler
+            for fmt in formats:
+                out = resized
+                if fmt == "jpeg" and has_alpha:
+                    # JPEG har ikke alfa: legg bildet på hvit bakgrunn
+                    out = Image.new("RGB", resized.size, (255, 255, 255))
+                    out.paste(resized, mask=resized.getchannel("A"))
+                relpath = variant_relpath(source.name, width, fmt)
+                path = Path(upload_root) / relpath
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f".{path.name}.tmp")
+                out.save(tmp, format=fmt.upper(), quality=80)
+                os.replace(tmp, path)
+                results.append({"width": width, "format": fmt, "path": relpath.as_posix(), "size": path.stat().st_size})
+    return results
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: trygt selv om prosessen har tråder (aiosqlite, to_thread)
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.IMAGE_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _record_variants(source: str, results: List[dict]):
+    async with AsyncSessionLocal() as db:
+        existing = {
+            (row.width, row.format)
+            for row in (await db.execute(
+                select(models.ImageVariant).where(models.ImageVariant.source == source)
+            )).scalars().all()
+        }
+        for r in results:
+            if (r["width"], r["format"]) not in existing:
+                db.add(models.ImageVariant(source=source, width=r["width"], format=r["format"], path=r["path"], size=r["size"]))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # En annen worker registrerte de samme variantene samtidig
+            await db.rollback()
+
+
+async def generate_variants(upload_root: Path, source: str) -> List[dict]:
+    """Lag alle varianter av uploads/images/{source} (hvis de mangler) og registrer dem."""
+    if not can_generate_variants(source):
+        return []
+    lock = _generation_locks.setdefault(source, asyncio.Lock())
+    async with lock:
+        expected = [(w, f) for w in VARIANT_WIDTHS for f in VARIANT_FORMATS]
+        if all((upload_root / variant_relpath(source, w, f)).exists() for w, f in expected):
+            return [{"width": w, "format": f, "path": variant_relpath(source, w, f).as_posix()} for w, f in expected]
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            _get_pool(),
+            _generate_variants_blocking,
+            str(upload_root / "images" / source),
+            str(upload_root),
+            VARIANT_WIDTHS,
+            tuple(VARIANT_FORMATS),
+        )
+        await _record_variants(source, results)
+        logger.info(f"🖼️ Generated {len(results)} variants for {source}")
+        return results
+
+
+async def variant_file(upload_root: Path, source: str, requested_width: int, accept: str) -> Optional[Tuple[Path, str]]:
+    """
+    (sti, media type) for varianten som passer `requested_width` og Accept-headeren.
+    None betyr at originalen skal serveres.
+    """
+    if not can_generate_variants(source):
+        return None
+    fmt = "webp" if "image/webp" in (accept or "") else "jpeg"
+    path = upload_root / variant_relpath(source, variant_width_for(requested_width), fmt)
+    if not path.exists():
+        try:
+            await generate_variants(upload_root, source)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not generate variants for {source}: {e}")
+            return None
+    return (path, VARIANT_MEDIA_TYPES[fmt]) if path.exists() else None
+
+
+# --- Referanser ---
+
+_UPLOAD_REFERENCE = re.compile(r"/uploads/images/([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def referenced_images(*texts: Optional[str]) -> set:
+    """Filnavn under uploads/images som nevnes i tekstene (URL-er, HTML, markdown)."""
+    names = set()
+    for value in texts:
+        if value:
+            names.update(_UPLOAD_REFERENCE.findall(value))
+    return names
+
+
+async def sync_image_references(db, ref_type: str, ref_id: str, *texts: Optional[str]):
+    """Erstatt bildereferansene til (ref_type, ref_id). Kalles fra crud før commit."""
+    table = models.ImageReference.__table__
+    await db.execute(delete(table).where(table.c.ref_type == ref_type, table.c.ref_id == ref_id))
+    names = referenced_images(*texts)
+    if names:
+        await db.execute(table.insert(), [{"filename": n, "ref_type": ref_type, "ref_id": ref_id} for n in sorted(names)])
@@ -1,40 +1,42 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, BackgroundTasks, Form
+from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from contextlib import asynccontextmanager
 from starlette.datastructures import MutableHeaders
-from . import models, schemas, crud, database
+from . import models, schemas, crud, database, search, ics, booking_overlap, booking_locks, waitlist, rendering
 from .database import Base, engine, get_db
 from .models import User
 from .schemas import UserRead, UserCreate, UserUpdate, BookingCreate, NewsItemCreate, NewsItemUpdate, NewsItemRead
 from .auth import fastapi_users, auth_backend, current_active_user, create_db_and_tables, get_user_manager, get_jwt_strategy
+from .emails import user_credentials_email, contact_form_email
+from .email_outbox import enqueue_email, outbox_worker
+from .ratelimit import rate_limit
+from .content_cache import page_content_cache
+from .idempotency import idempotency
+from .slot_holds import slot_holds
+from .static_files import UploadStaticFiles
+from .compression import CompressionMiddleware
+from .settings import settings
+from .images import (
+    MULTIPART_OVERHEAD, VARIANT_WIDTHS, UnsupportedImageType, UploadSizeLimitMiddleware, UploadTooLarge,
+    generate_variants, save_image_upload, shutdown_image_pool, variant_file,
+)
 from datetime import datetime, timedelta, date as date_type, timezone
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 import uuid
 import logging
 import time
 import os
-import shutil
-from pathlib import Path
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-try:
-    import httpx
-    HAS_HTTPX = True
-except ImportError:
-    HAS_HTTPX = False
-import shutil
+import re
+from functools import lru_cache
 from pathlib import Path
 import secrets
-import string
-from passlib.context import CryptContext
 import base64
 import hashlib
 
@@ -53,16 +55,33 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting HallBooking API...")
+    rendering.require_dependencies()
     await create_db_and_tables()
     logger.info("✅ Database tables created")
+    await booking_overlap.detect(engine)
+    slot_holds.detect(engine)
     # Ensure upload directory exists
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     logger.info(f"✅ Upload directory ready: {UPLOAD_DIR}")
+    outbox_worker.start()
     yield
     logger.info("🛑 Shutting down HallBooking API...")
+    await outbox_worker.stop()
+    shutdown_image_pool()
 
 app = FastAPI(title="HallBooking API", lifespan=lifespan)
 
+# Avvis for store opplastinger mens de strømmer inn (innerst, så CORS-headere kommer med på 413)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    paths={"/api/upload-image"},
+    max_bytes=settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+)
+
+# gzip/brotli for JSON-svar. Innenfor CORS og http-middlewarene, så de flytter færre bytes
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE, exclude_paths=("/uploads",))
+
 # CORS configuration - støtter både utvikling og produksjon
 
 # Hent tillatte origins fra environment variable, eller bruk default for utvikling
@@ -126,7 +145,8 @@ async def log_requests(request: Request, call_next):
         'origin': request.headers.get('origin'),
     }
     logger.info(f"📋 Headers: {important_headers}")
-    if request.method == "POST":
+    # Ikke les opplastinger inn i minnet bare for å logge dem
+    if request.method == "POST" and not (request.headers.get("content-type") or "").startswith("multipart/"):
         try:
             body = await request.body()
             if body:
@@ -142,19 +162,55 @@ async def log_requests(request: Request, call_next):
     logger.info(f"📤 Response: {response.status_code} ({process_time:.3f}s)")
     return response
 
+# Read-your-writes: etter en vellykket skriving leser klienten fra primær en kort stund,
+# slik at egne endringer vises selv om lese-replikaen ikke har tatt dem igjen ennå
+@app.middleware("http")
+async def pin_reads_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if request.method in {"POST", "PUT", "PATCH", "DELETE"} and response.status_code < 400:
+        database.mark_recent_write(
+            response,
+            secure=ENVIRONMENT == "production",
+            samesite="none" if ENVIRONMENT == "production" else "lax",
+        )
+    return response
+
+# Nedskalerte varianter: /uploads/images/x.jpg?w=640 (må registreres før /uploads-mounten)
+SAFE_UPLOAD_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+@app.get("/uploads/images/{filename}", include_in_schema=False)
+async def get_uploaded_image(request: Request, filename: str, w: Optional[int] = Query(None, ge=1, le=4000)):
+    """Serve an uploaded image; ?w= returns the nearest resized WebP/JPEG variant"""
+    if not SAFE_UPLOAD_NAME.match(filename):
+        raise HTTPException(status_code=404, detail="Not Found")
+    original = UPLOAD_DIR / filename
+    if not original.is_file():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if w is not None:
+        variant = await variant_file(UPLOAD_ROOT, filename, w, request.headers.get("accept", ""))
+        if variant:
+            path, media_type = variant
+            return uploads_static.file_response(
+                path, os.stat(path), request.scope, media_type=media_type, headers={"Vary": "Accept"}
+            )
+    return uploads_static.file_response(original, os.stat(original), request.scope)
+
 # Mount static files directory to serve uploaded images (must come before routes)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_ROOT)), name="uploads")
+uploads_static = UploadStaticFiles(directory=str(UPLOAD_ROOT))
+app.mount("/uploads", uploads_static, name="uploads")
 
 # Auth-rutere
 app.include_router(
     fastapi_users.get_auth_router(auth_backend),
     prefix="/auth/jwt",
     tags=["auth"],
+    dependencies=[Depends(rate_limit("login", account_field="username"))],
 )
 app.include_router(
     fastapi_users.get_register_router(UserRead, UserCreate),
     prefix="/auth",
     tags=["auth"],
+    dependencies=[Depends(rate_limit("register", account_field="email"))],
 )
 
 # PKCE helpers for authorization code flow
@@ -170,7 +226,7 @@ def _verify_pkce(code_verifier: str, code_challenge: str, method: str) -> bool:
         return secrets.compare_digest(code_verifier, code_challenge)
     return False
 
-@app.post("/auth/authorize", tags=["auth"])
+@app.post("/auth/authorize", tags=["auth"], dependencies=[Depends(rate_limit("login", account_field="username"))])
 async def authorize_pkce(
     username: str = Form(...),
     password: str = Form(...),
@@ -474,24 +530,13 @@ CALENDAR_COLORS = {
     "empty": "#F2F2F2",
     "booked": "#D88A44",
     "blocked": "#7A8B6F",
+    "held": "#F0C89A",
 }
 
-def _hour_range_for_date(target_date: date_type) -> List[Dict[str, Any]]:
-    slots = []
-    # Only show allowed booking hours: 17:00-23:00 (5 PM - 11 PM)
-    for h in range(17, 24):
-        start = datetime(target_date.year, target_date.month, target_date.day, h, 0, 0)
-        end = start + timedelta(hours=1)
-        slots.append({
-            "hour": h,
-            "start_time": start.isoformat(),
-            "end_time": end.isoformat(),
-            "booking_ids": [],
-            "status": "empty",
-            "color": CALENDAR_COLORS["empty"],
-        })
-    return slots
-
+# Only show allowed booking hours: 17:00-23:00 (5 PM - 11 PM). Bit i i bitmaskene = CALENDAR_HOURS[i]
+CALENDAR_HOURS = list(range(17, 24))
+BLOCKED_SLOT_COLOR = "#ff4444"
+CALENDAR_MAX_DAYS = 62
 
 def _to_local_naive(dt):
     """
@@ -506,148 +551,362 @@ def _to_local_naive(dt):
         dt = dt.astimezone(local_tz).replace(tzinfo=None)
     return dt
 
-def _apply_bookings_to_slots(slots: List[Dict[str, Any]], bookings: List[models.Booking]):
-    for booking in bookings:
-        b_start = _to_local_naive(getattr(booking, "start_time", None))
-        b_end = _to_local_naive(getattr(booking, "end_time", None))
-        for slot in slots:
-            slot_start = _to_local_naive(slot["start_time"])
-            slot_end = _to_local_naive(slot["end_time"])
-            # overlap-test
-            if not (b_end <= slot_start or b_start >= slot_end):
-                slot.setdefault("booking_ids", []).append(str(getattr(booking, "id", "")))
-                slot["status"] = "booked"
-                slot["color"] = CALENDAR_COLORS.get("booked", slot.get("color"))
-                
 def _require_admin(user):
     if not getattr(user, "is_superuser", False):
         raise HTTPException(status_code=403, detail="Administrator-tilgang kreves")
 
-async def _apply_blocked_times_to_slots(slots, target_date, db):
-    """Apply blocked times to calendar slots"""
-    blocked_times = await crud.get_blocked_times(db, target_date, target_date)
-    
-    for slot in slots:
-        slot_time = datetime(target_date.year, target_date.month, target_date.day, slot["hour"], 0, 0)
-        slot_end_time = slot_time + timedelta(hours=1)
-        
-        for blocked in blocked_times:
-            if blocked.block_type == "day":
-                # Block entire day
-                if (target_date >= blocked.start_date.date() and 
-                    target_date <= blocked.end_date.date()):
-                    slot["status"] = "blocked"
-                    slot["color"] = "#ff4444"
-                    slot["reason"] = blocked.reason or "Dag blokkert"
-                    break
-                    
-            elif blocked.block_type == "weekly":
-                # Block specific day of week
-                if (blocked.day_of_week is not None and
-                    target_date.weekday() == blocked.day_of_week and
-                    target_date >= blocked.start_date.date() and
-                    target_date <= blocked.end_date.date()):
-                    slot["status"] = "blocked"
-                    slot["color"] = "#ff4444"
-                    slot["reason"] = blocked.reason or "Ukedag blokkert"
-                    break
-                    
-            elif blocked.block_type == "hour":
-                # Block specific hour
-                if (blocked.hour is not None and
-                    slot["hour"] == blocked.hour and
-                    target_date >= blocked.start_date.date() and
-                    target_date <= blocked.end_date.date()):
-                    slot["status"] = "blocked"
-                    slot["color"] = "#ff4444"
-                    slot["reason"] = blocked.reason or "Time blokkert"
-                    break
-
-@app.get("/bookings/{target_date}")
-async def get_bookings_calendar(target_date: str, db: AsyncSession = Depends(database.get_db)):
+def _blocked_reason(blocked, day: date_type, hour: int) -> Optional[str]:
+    """Årsaken hvis `blocked` dekker timen `hour` på `day`, ellers None"""
+    if not (blocked.start_date.date() <= day <= blocked.end_date.date()):
+        return None
+    if blocked.block_type == "day":
+        # Block entire day
+        return blocked.reason or "Dag blokkert"
+    if blocked.block_type == "weekly" and blocked.day_of_week is not None and day.weekday() == blocked.day_of_week:
+        # Block specific day of week
+        return blocked.reason or "Ukedag blokkert"
+    if blocked.block_type == "hour" and blocked.hour is not None and hour == blocked.hour:
+        # Block specific hour
+        return blocked.reason or "Time blokkert"
+    return None
+
+def _calendar_grid(start: date_type, days: int, bookings, blocked_times, holds=()):
     """
-    Return a calendar view (hourly slots) for given date (YYYY-MM-DD).
+    Bookede, blokkerte og holdte timer for `days` dager fra `start`.
+    Returnerer (booked, blocked, held, booking_ids, reasons): én bitmaske per dag og
+    sparse oppslag (dag, slot) -> booking-id-er / årsak.
     """
-    try:
-        d = datetime.strptime(target_date, "%Y-%m-%d").date()
-    except Exception:
-        raise HTTPException(status_code=400, detail="target_date must be YYYY-MM-DD")
-    slots = _hour_range_for_date(d)
-    day_start = datetime(d.year, d.month, d.day, 0, 0, 0)
-    day_end = day_start + timedelta(days=1)
-    day_bookings = await crud.get_bookings_in_range(db, day_start, day_end)
-    _apply_bookings_to_slots(slots, day_bookings)
-    
-    # Apply blocked times to slots
-    await _apply_blocked_times_to_slots(slots, d, db)
-    
+    booked = [0] * days
+    blocked = [0] * days
+    held = [0] * days
+    booking_ids: Dict[tuple, List[str]] = {}
+    reasons: Dict[tuple, str] = {}
+
+    for booking in bookings:
+        b_start = _to_local_naive(booking.start_time)
+        b_end = _to_local_naive(booking.end_time)
+        first_day = max(0, (b_start.date() - start).days)
+        last_day = min(days - 1, (b_end.date() - start).days)
+        for d in range(first_day, last_day + 1):
+            day = start + timedelta(days=d)
+            for i, h in enumerate(CALENDAR_HOURS):
+                slot_start = datetime(day.year, day.month, day.day, h)
+                # overlap-test
+                if b_start < slot_start + timedelta(hours=1) and b_end > slot_start:
+                    booked[d] |= 1 << i
+                    booking_ids.setdefault((d, i), []).append(str(booking.id))
+
+    for hold in holds:
+        first_day = max(0, (hold.start_time.date() - start).days)
+        last_day = min(days - 1, (hold.end_time.date() - start).days)
+        for d in range(first_day, last_day + 1):
+            day = start + timedelta(days=d)
+            for i, h in enumerate(CALENDAR_HOURS):
+                slot_start = datetime(day.year, day.month, day.day, h)
+                if hold.start_time < slot_start + timedelta(hours=1) and hold.end_time > slot_start:
+                    held[d] |= 1 << i
+
+    for d in range(days):
+        day = start + timedelta(days=d)
+        active = [b for b in blocked_times if b.start_date.date() <= day <= b.end_date.date()]
+        if not active:
+            continue
+        for i, h in enumerate(CALENDAR_HOURS):
+            # Første blokkering som treffer vinner (samme rekkefølge som i databasen)
+            reason = next((r for r in (_blocked_reason(b, day, h) for b in active) if r), None)
+            if reason:
+                blocked[d] |= 1 << i
+                reasons[(d, i)] = reason
+
+    return booked, blocked, held, booking_ids, reasons
+
+def _verbose_day(start: date_type, d: int, grid) -> Dict[str, Any]:
+    booked, blocked, held, booking_ids, reasons = grid
+    day = start + timedelta(days=d)
+    slots = []
+    for i, h in enumerate(CALENDAR_HOURS):
+        slot_start = datetime(day.year, day.month, day.day, h, 0, 0)
+        slot = {
+            "hour": h,
+            "start_time": slot_start,
+            "end_time": slot_start + timedelta(hours=1),
+            "booking_ids": booking_ids.get((d, i), []),
+            "status": "empty",
+            "color": CALENDAR_COLORS["empty"],
+        }
+        if held[d] >> i & 1:
+            slot["status"] = "held"
+            slot["color"] = CALENDAR_COLORS["held"]
+        if booked[d] >> i & 1:
+            slot["status"] = "booked"
+            slot["color"] = CALENDAR_COLORS["booked"]
+        if blocked[d] >> i & 1:
+            slot["status"] = "blocked"
+            slot["color"] = BLOCKED_SLOT_COLOR
+            slot["reason"] = reasons[(d, i)]
+        slots.append(slot)
+    return {"date": day.isoformat(), "slots": slots, "colors": CALENDAR_COLORS}
+
+def _compact_calendar(start: date_type, days: int, grid) -> Dict[str, Any]:
+    booked, blocked, held, booking_ids, reasons = grid
     return {
-        "date": d.isoformat(),
-        "slots": slots,
-        "colors": CALENDAR_COLORS,
+        "start": start.isoformat(),
+        "days": days,
+        "hours": CALENDAR_HOURS,
+        "booked": booked,
+        "blocked": blocked,
+        "held": held,
+        "booking_ids": [[d, i, bid] for (d, i), ids in sorted(booking_ids.items()) for bid in ids],
+        "reasons": [[d, i, reason] for (d, i), reason in sorted(reasons.items())],
+        "colors": {**CALENDAR_COLORS, "blocked": BLOCKED_SLOT_COLOR},
     }
 
-@app.post("/bookings")
-async def create_booking(booking: BookingCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
-    # Normalize incoming datetimes to local naive before storing (prevents shift)
-    start_local = _to_local_naive(booking.start_time)
-    end_local = _to_local_naive(booking.end_time)
+async def _load_calendar_grid(db: AsyncSession, start: date_type, days: int, hall_id: str):
+    range_start = datetime(start.year, start.month, start.day)
+    range_end = range_start + timedelta(days=days)
+    bookings = await crud.get_bookings_in_range(db, range_start, range_end, hall_id)
+    blocked_times = await crud.get_blocked_times(db, range_start, range_end - timedelta(days=1), hall_id)
+    holds = await slot_holds.active(db, hall_id, range_start, range_end)
+    return _calendar_grid(start, days, bookings, blocked_times, holds)
+
+async def _calendar_hall(db: AsyncSession, hall_id: Optional[str]) -> models.Hall:
+    """Hallen kalenderen gjelder; uten hall_id den første aktive (som før flere haller)"""
+    hall = await crud.resolve_hall(db, hall_id=hall_id)
+    if hall is None:
+        raise HTTPException(status_code=404, detail="Hall ikke funnet")
+    return hall
+
+async def _calendar_range(db: AsyncSession, hall_id: Optional[str], start: str, days: int, format: str):
+    hall = await _calendar_hall(db, hall_id)
+    d = _parse_calendar_date(start, "start")
+    grid = await _load_calendar_grid(db, d, days, hall.id)
+    if format == "compact":
+        return {**_compact_calendar(d, days, grid), "hall_id": hall.id}
+    return {"days": [_verbose_day(d, i, grid) for i in range(days)], "colors": CALENDAR_COLORS, "hall_id": hall.id}
+
+async def _calendar_day(db: AsyncSession, hall_id: Optional[str], target_date: str, format: str):
+    hall = await _calendar_hall(db, hall_id)
+    d = _parse_calendar_date(target_date, "target_date")
+    grid = await _load_calendar_grid(db, d, 1, hall.id)
+    if format == "compact":
+        return {**_compact_calendar(d, 1, grid), "hall_id": hall.id}
+    return _verbose_day(d, 0, grid)
+
+def _parse_calendar_date(value: str, name: str) -> date_type:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
+
+CALENDAR_FORMAT = Query("verbose", pattern="^(verbose|compact)$")
+
+@app.get("/api/halls", response_model=schemas.HallList)
+async def list_halls(db: AsyncSession = Depends(database.get_read_db)):
+    """Active halls in display order"""
+    return {"halls": await crud.get_halls(db)}
+
+@app.get(
+    "/bookings",
+    response_model=Union[schemas.CalendarRange, schemas.CompactCalendar],
+    response_model_exclude_none=True,
+)
+async def get_bookings_calendar_range(
+    start: str,
+    days: int = Query(7, ge=1, le=CALENDAR_MAX_DAYS),
+    format: str = CALENDAR_FORMAT,
+    hall_id: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    """
+    Calendar for `days` days from `start` (YYYY-MM-DD) in one request.
+    format=compact returns bitmasks per day instead of one object per slot.
+    Without hall_id the first active hall is shown.
+    """
+    return await _calendar_range(db, hall_id, start, days, format)
+
+@app.get(
+    "/bookings/{target_date}",
+    response_model=Union[schemas.CalendarDay, schemas.CompactCalendar],
+    response_model_exclude_none=True,
+)
+async def get_bookings_calendar(
+    target_date: str,
+    format: str = CALENDAR_FORMAT,
+    hall_id: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    """
+    Return a calendar view (hourly slots) for given date (YYYY-MM-DD).
+    """
+    return await _calendar_day(db, hall_id, target_date, format)
+
+@app.get(
+    "/halls/{hall_id}/bookings",
+    response_model=Union[schemas.CalendarRange, schemas.CompactCalendar],
+    response_model_exclude_none=True,
+)
+async def get_hall_calendar_range(
+    hall_id: str,
+    start: str,
+    days: int = Query(7, ge=1, le=CALENDAR_MAX_DAYS),
+    format: str = CALENDAR_FORMAT,
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    """Calendar for one hall, same format as /bookings"""
+    return await _calendar_range(db, hall_id, start, days, format)
 
-    # Check if time is blocked
-    is_blocked, blocked_info = await crud.is_time_blocked(db, start_local, end_local)
+@app.get(
+    "/halls/{hall_id}/bookings/{target_date}",
+    response_model=Union[schemas.CalendarDay, schemas.CompactCalendar],
+    response_model_exclude_none=True,
+)
+async def get_hall_calendar(
+    hall_id: str,
+    target_date: str,
+    format: str = CALENDAR_FORMAT,
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    """Calendar for one hall and one day, same format as /bookings/{target_date}"""
+    return await _calendar_day(db, hall_id, target_date, format)
+
+# iCalendar-feeder (se app/ics.py)
+@app.get("/calendar/hall.ics", include_in_schema=False)
+async def hall_calendar_feed(request: Request, db: AsyncSession = Depends(database.get_read_db)):
+    """Public feed with all bookings (without names) and blocked times"""
+    return await ics.feed_response(request, db)
+
+@app.get("/calendar/halls/{hall_id}.ics", include_in_schema=False)
+async def hall_calendar_feed_single(hall_id: str, request: Request, db: AsyncSession = Depends(database.get_read_db)):
+    """Public feed for one hall"""
+    hall = await crud.resolve_hall(db, hall_id=hall_id)
+    if hall is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await ics.feed_response(request, db, hall=hall)
+
+@app.get("/calendar/{token}.ics", include_in_schema=False)
+async def user_calendar_feed(token: str, request: Request, db: AsyncSession = Depends(database.get_read_db)):
+    """Personal feed with the member's own bookings"""
+    user_id = await ics.user_for_token(db, token)
+    if not user_id:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await ics.feed_response(request, db, user_id)
+
+@app.get("/users/me/calendar-feed")
+async def get_my_calendar_feed(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """Return the URL of the member's personal .ics feed (created on first use)"""
+    token = await ics.get_or_create_token(db, str(getattr(user, "id", "")))
+    return {"url": f"/calendar/{token}.ics", "hall_url": "/calendar/hall.ics"}
+
+@app.post("/users/me/calendar-feed/reset")
+async def reset_my_calendar_feed(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """Replace the feed token; the old URL stops working"""
+    token = await ics.get_or_create_token(db, str(getattr(user, "id", "")), rotate=True)
+    return {"url": f"/calendar/{token}.ics", "hall_url": "/calendar/hall.ics"}
+
+async def _booking_hall(db: AsyncSession, hall_id: Optional[str], name: Optional[str]) -> models.Hall:
+    hall = await crud.resolve_hall(db, hall_id=hall_id, name=name)
+    if hall is None:
+        raise HTTPException(status_code=400, detail="Ukjent eller inaktiv hall")
+    return hall
+
+async def _ensure_bookable(db: AsyncSession, start_time: datetime, end_time: datetime, hall_id: str, booking_id: Optional[str] = None, action: str = "booke"):
+    """Avvis blokkerte og opptatte tider. Kalles under booking_locks.booking_writes.hold()."""
+    is_blocked, blocked_info = await crud.is_time_blocked(db, start_time, end_time, hall_id)
     if is_blocked:
         reason = blocked_info.reason or "Tiden er blokkert"
-        raise HTTPException(status_code=400, detail=f"Kan ikke booke: {reason}")
+        raise HTTPException(status_code=400, detail=f"Kan ikke {action}: {reason}")
 
-    # Prevent overlaps (single hall calendar)
-    overlaps = await crud.get_bookings_in_range(db, start_local, end_local)
+    # Med EXCLUDE-constraint (PostgreSQL) avviser databasen overlapp ved commit
+    if booking_overlap.exclusion_active():
+        return
+    overlaps = await crud.get_bookings_in_range(db, start_time, end_time, hall_id)
+    overlaps = [b for b in overlaps if str(getattr(b, "id", "")) != booking_id]
     if overlaps:
         raise HTTPException(status_code=400, detail="Tiden er allerede booket")
 
-    # Enforce subscription weekly hours (admins are unlimited)
-    if not getattr(user, "is_superuser", False):
-        sub = await crud.get_active_user_subscription(db, str(getattr(user, "id", "")), at_time=start_local)
-        if not sub:
-            raise HTTPException(status_code=403, detail="Du har ikke et aktivt abonnement og kan ikke booke.")
-
-        hours_limit = int(getattr(sub, "hours_per_week", 0) or 0)
-        if hours_limit <= 0:
-            raise HTTPException(status_code=403, detail="Abonnementet ditt har 0 timer per uke og kan ikke booke.")
-
-        week_start = start_local - timedelta(days=start_local.weekday())
-        week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_end = week_start + timedelta(days=7)
-
-        week_bookings = await crud.get_user_bookings_in_range(db, str(getattr(user, "id", "")), week_start, week_end)
-        used_seconds = crud.sum_booking_seconds(week_bookings)
-        new_seconds = int((end_local - start_local).total_seconds())
-        limit_seconds = hours_limit * 3600
-
-        if used_seconds + new_seconds > limit_seconds:
-            used_h = used_seconds / 3600
-            remaining_h = max(0.0, (limit_seconds - used_seconds) / 3600)
-            raise HTTPException(
-                status_code=400,
-                detail=f"Ukekvoten er brukt opp. Du har {hours_limit}t/uke, brukt {used_h:.2f}t. Gjenstående {remaining_h:.2f}t.",
-            )
-
-    # Persist booking
-    booking_id = str(uuid.uuid4())
-    db_booking = models.Booking(
-        id=booking_id,
-        hall=booking.hall,
-        start_time=start_local,
-        end_time=end_local,
-        created_by=str(getattr(user, "id", "")),
-    )
+async def _commit_booking(db: AsyncSession, db_booking: models.Booking):
     db.add(db_booking)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if booking_overlap.is_overlap_error(exc):
+            raise HTTPException(status_code=400, detail="Tiden er allerede booket")
+        raise
     await db.refresh(db_booking)
 
+@app.post("/bookings")
+async def create_booking(booking: BookingCreate, request: Request, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    # Retry med samme Idempotency-Key får første svar igjen (se app/idempotency.py)
+    return await idempotency.run(
+        request, "booking.create", str(getattr(user, "id", "")), booking,
+        lambda: _create_booking(booking, user, db),
+    )
+
+async def _create_booking(booking: BookingCreate, user, db: AsyncSession):
+    # Normalize incoming datetimes to local naive before storing (prevents shift)
+    start_local = _to_local_naive(booking.start_time)
+    end_local = _to_local_naive(booking.end_time)
+    hall = await _booking_hall(db, booking.hall_id, booking.hall)
+    user_id = str(getattr(user, "id", ""))
+
+    # Hall-uken (overlapp) og brukerens uke (kvote) låses rundt sjekk + commit
+    lock_keys = booking_locks.hall_keys(hall.id, start_local, end_local) | booking_locks.user_keys(user_id, start_local, end_local)
+    async with booking_locks.booking_writes.hold(db, lock_keys):
+        # Blocked times and overlaps (per hall)
+        await _ensure_bookable(db, start_local, end_local, hall.id)
+        # Andres hold (POST /bookings/hold); eget hold brukes opp under
+        await slot_holds.ensure_not_held(db, hall.id, start_local, end_local, user_id)
+
+        # Enforce subscription weekly hours (admins are unlimited)
+        if not getattr(user, "is_superuser", False):
+            quota_error = await crud.booking_quota_error(db, user_id, start_local, end_local)
+            if quota_error:
+                raise HTTPException(status_code=quota_error[0], detail=quota_error[1])
+
+        # Persist booking
+        booking_id = str(uuid.uuid4())
+        db_booking = models.Booking(
+            id=booking_id,
+            hall_id=hall.id,
+            hall=hall.name,
+            start_time=start_local,
+            end_time=end_local,
+            created_by=user_id,
+        )
+        await _commit_booking(db, db_booking)
+        await slot_holds.consume(db, user_id, hall.id, start_local, end_local)
+
     logger.info(f"Created booking {booking_id} by user {getattr(user, 'id', None)}")
     return {"id": booking_id, "msg": "Booking opprettet"}
 
-@app.get("/api/admin/bookings/{booking_id}")
+@app.post("/bookings/hold", response_model=schemas.SlotHoldRead)
+async def hold_slot(payload: schemas.SlotHoldCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """
+    Hold en ledig tid i SLOT_HOLD_SECONDS mens bookingen fylles ut (se app/slot_holds.py).
+    Andre ser den som "held" og kan ikke booke den så lenge.
+    """
+    start_local = _to_local_naive(payload.start_time)
+    end_local = _to_local_naive(payload.end_time)
+    if end_local <= start_local:
+        raise HTTPException(status_code=400, detail="Sluttid må være etter starttid")
+    hall = await _booking_hall(db, payload.hall_id, payload.hall)
+    user_id = str(getattr(user, "id", ""))
+
+    async with booking_locks.booking_writes.hold(db, booking_locks.hall_keys(hall.id, start_local, end_local)):
+        await _ensure_bookable(db, start_local, end_local, hall.id)
+        # Med EXCLUDE-constraint hopper _ensure_bookable over overlappsjekken; et hold trenger den
+        if booking_overlap.exclusion_active() and await crud.get_bookings_in_range(db, start_local, end_local, hall.id):
+            raise HTTPException(status_code=400, detail="Tiden er allerede booket")
+        return await slot_holds.place(db, user_id, hall.id, start_local, end_local)
+
+@app.delete("/bookings/hold/{hold_id}")
+async def release_slot_hold(hold_id: str, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    if not await slot_holds.release(db, hold_id, str(getattr(user, "id", ""))):
+        raise HTTPException(status_code=404, detail="Holdet finnes ikke eller er utløpt")
+    return {"id": hold_id, "msg": "Hold sluppet"}
+
+@app.get("/api/admin/bookings/{booking_id}", response_model=schemas.BookingRead)
 async def get_booking_admin(booking_id: str, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Get a specific booking by ID (admin only)"""
     _require_admin(user)
@@ -668,28 +927,30 @@ async def update_booking(booking_id: str, payload: BookingCreate, user=Depends(c
     # Normalize incoming datetimes to local naive before storing
     start_local = _to_local_naive(payload.start_time)
     end_local = _to_local_naive(payload.end_time)
-    
-    # Check if time is blocked
-    is_blocked, blocked_info = await crud.is_time_blocked(db, start_local, end_local)
-    if is_blocked:
-        reason = blocked_info.reason or "Tiden er blokkert"
-        raise HTTPException(status_code=400, detail=f"Kan ikke oppdatere booking: {reason}")
-    
-    overlaps = await crud.get_bookings_in_range(db, start_local, end_local)
-    overlaps = [b for b in overlaps if str(getattr(b, "id", "")) != booking_id]
-    if overlaps:
-        raise HTTPException(status_code=400, detail="Tiden er allerede booket")
+    hall = await _booking_hall(db, payload.hall_id, payload.hall)
+    freed = (db_booking.hall_id, db_booking.start_time, db_booking.end_time)
 
-    db_booking.hall = payload.hall
-    db_booking.start_time = start_local
-    db_booking.end_time = end_local
-    db.add(db_booking)
-    await db.commit()
-    await db.refresh(db_booking)
+    lock_keys = (
+        booking_locks.hall_keys(db_booking.hall_id, db_booking.start_time, db_booking.end_time)
+        | booking_locks.hall_keys(hall.id, start_local, end_local)
+    )
+    async with booking_locks.booking_writes.hold(db, lock_keys):
+        await _ensure_bookable(db, start_local, end_local, hall.id, booking_id, action="oppdatere booking")
+        # Flyttes ikke inn i en tid andre holder; eierens eget hold teller ikke
+        await slot_holds.ensure_not_held(db, hall.id, start_local, end_local, db_booking.created_by)
+
+        db_booking.hall_id = hall.id
+        db_booking.hall = hall.name
+        db_booking.start_time = start_local
+        db_booking.end_time = end_local
+        await _commit_booking(db, db_booking)
+    if freed != (db_booking.hall_id, db_booking.start_time, db_booking.end_time):
+        await waitlist.promote(db, *freed)
     logger.info(f"Booking {booking_id} oppdatert av admin {getattr(user, 'id', None)}")
     return {"id": booking_id, "msg": "Booking oppdatert"}
 
 class BookingUpdate(BaseModel):
+    hall_id: Optional[str] = None
     hall: Optional[str] = None
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
@@ -705,8 +966,8 @@ async def partial_update_booking(booking_id: str, payload: BookingUpdate, user=D
 
     updates: Dict[str, Any] = {}
     
-    if payload.hall is not None:
-        updates["hall"] = payload.hall
+    if payload.hall_id is not None or payload.hall is not None:
+        updates["hall"] = await _booking_hall(db, payload.hall_id, payload.hall)
     
     if payload.start_time is not None:
         start_local = _to_local_naive(payload.start_time)
@@ -715,32 +976,36 @@ async def partial_update_booking(booking_id: str, payload: BookingUpdate, user=D
     if payload.end_time is not None:
         end_local = _to_local_naive(payload.end_time)
         updates["end_time"] = end_local
-    
-    # If we're updating times, check if the new time is blocked
-    if payload.start_time is not None or payload.end_time is not None:
-        start_time = updates.get("start_time", db_booking.start_time)
-        end_time = updates.get("end_time", db_booking.end_time)
+    freed = (db_booking.hall_id, db_booking.start_time, db_booking.end_time)
+
+    lock_keys = (
+        booking_locks.hall_keys(db_booking.hall_id, db_booking.start_time, db_booking.end_time)
+        | booking_locks.hall_keys(
+            updates["hall"].id if "hall" in updates else db_booking.hall_id,
+            updates.get("start_time", db_booking.start_time),
+            updates.get("end_time", db_booking.end_time),
+        )
+    )
+    async with booking_locks.booking_writes.hold(db, lock_keys):
+        # If we're updating times or hall, check if the new time is blocked or taken
+        if updates:
+            start_time = updates.get("start_time", db_booking.start_time)
+            end_time = updates.get("end_time", db_booking.end_time)
+            hall_id = updates["hall"].id if "hall" in updates else db_booking.hall_id
+            await _ensure_bookable(db, start_time, end_time, hall_id, booking_id, action="oppdatere booking")
+            await slot_holds.ensure_not_held(db, hall_id, start_time, end_time, db_booking.created_by)
         
-        is_blocked, blocked_info = await crud.is_time_blocked(db, start_time, end_time)
-        if is_blocked:
-            reason = blocked_info.reason or "Tiden er blokkert"
-            raise HTTPException(status_code=400, detail=f"Kan ikke oppdatere booking: {reason}")
-
-        overlaps = await crud.get_bookings_in_range(db, start_time, end_time)
-        overlaps = [b for b in overlaps if str(getattr(b, "id", "")) != booking_id]
-        if overlaps:
-            raise HTTPException(status_code=400, detail="Tiden er allerede booket")
-    
-    if "hall" in updates:
-        db_booking.hall = updates["hall"]
-    if "start_time" in updates:
-        db_booking.start_time = updates["start_time"]
-    if "end_time" in updates:
-        db_booking.end_time = updates["end_time"]
-
-    db.add(db_booking)
-    await db.commit()
-    await db.refresh(db_booking)
+        if "hall" in updates:
+            db_booking.hall_id = updates["hall"].id
+            db_booking.hall = updates["hall"].name
+        if "start_time" in updates:
+            db_booking.start_time = updates["start_time"]
+        if "end_time" in updates:
+            db_booking.end_time = updates["end_time"]
+
+        await _commit_booking(db, db_booking)
+    if freed != (db_booking.hall_id, db_booking.start_time, db_booking.end_time):
+        await waitlist.promote(db, *freed)
     logger.info(f"Booking {booking_id} delvis oppdatert av admin {getattr(user, 'id', None)}")
     return {"id": booking_id, "msg": "Booking oppdatert"}
 
@@ -751,11 +1016,46 @@ async def delete_booking(booking_id: str, user=Depends(current_active_user), db:
     if not deleted:
         raise HTTPException(status_code=404, detail="Booking ikke funnet")
     logger.info(f"Booking {booking_id} slettet av admin {getattr(user, 'id', None)}")
+    # Første på ventelisten for tiden får den
+    await waitlist.promote(db, deleted.hall_id, deleted.start_time, deleted.end_time)
     return {"id": booking_id, "msg": "Booking slettet"}
 
 
-@app.get("/users/me/bookings")
-async def get_my_bookings(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+@app.post("/bookings/waitlist", response_model=schemas.WaitlistEntryRead)
+async def join_waitlist(payload: schemas.WaitlistCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """Stå i kø for en opptatt tid; se app/waitlist.py"""
+    hall = await _booking_hall(db, payload.hall_id, payload.hall)
+    user_id = str(getattr(user, "id", ""))
+    entry = await waitlist.join(
+        db, user_id, hall, _to_local_naive(payload.start_time), _to_local_naive(payload.end_time), payload.auto_book
+    )
+    position = (await waitlist.positions(db, [entry])).get(entry.id)
+    logger.info(f"User {user_id} joined waitlist for {hall.id} {entry.start_time} (position {position})")
+    return schemas.WaitlistEntryRead.model_validate(entry).model_copy(update={"position": position})
+
+
+@app.get("/users/me/waitlist", response_model=schemas.WaitlistEntryList)
+async def get_my_waitlist(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    entries = await waitlist.entries_for_user(db, str(getattr(user, "id", "")))
+    positions = await waitlist.positions(db, entries)
+    return {
+        "entries": [
+            schemas.WaitlistEntryRead.model_validate(e).model_copy(update={"position": positions.get(e.id)})
+            for e in entries
+        ]
+    }
+
+
+@app.delete("/users/me/waitlist/{entry_id}")
+async def leave_waitlist(entry_id: str, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    entry = await waitlist.cancel(db, entry_id, str(getattr(user, "id", "")), is_admin=getattr(user, "is_superuser", False))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Fant ikke oppføringen på ventelisten")
+    return {"id": entry_id, "msg": "Fjernet fra ventelisten"}
+
+
+@app.get("/users/me/bookings", response_model=schemas.MyBookingList)
+async def get_my_bookings(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_read_db)):
     """
     Return bookings created by the authenticated user.
     """
@@ -765,21 +1065,10 @@ async def get_my_bookings(user=Depends(current_active_user), db: AsyncSession =
         .where(models.Booking.created_by == user_id)
         .order_by(models.Booking.start_time.desc())
     )
-    bookings = result.scalars().all()
-    return {
-        "bookings": [
-            {
-                "id": str(b.id),
-                "hall": b.hall,
-                "start_time": b.start_time.isoformat(),
-                "end_time": b.end_time.isoformat(),
-            }
-            for b in bookings
-        ]
-    }
+    return {"bookings": result.scalars().all()}
 
-@app.get("/api/admin/bookings")
-async def get_all_bookings(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+@app.get("/api/admin/bookings", response_model=schemas.AdminBookingList)
+async def get_all_bookings(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_read_db)):
     """
     Return all bookings for admin users with user information.
     """
@@ -807,19 +1096,20 @@ async def get_all_bookings(user=Depends(current_active_user), db: AsyncSession =
         all_bookings.append(
             {
                 "id": str(b.id),
+                "hall_id": b.hall_id,
                 "hall": b.hall,
-                "start_time": b.start_time.isoformat(),
-                "end_time": b.end_time.isoformat(),
+                "start_time": b.start_time,
+                "end_time": b.end_time,
                 "created_by": b.created_by,
                 "user": user_info,
-                "created_at": (b.created_at.isoformat() if getattr(b, "created_at", None) else b.start_time.isoformat()),
+                "created_at": b.created_at or b.start_time,
             }
         )
 
     return {"bookings": all_bookings}
 
 @app.get("/api/admin/users")
-async def get_all_users(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+async def get_all_users(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_read_db)):
     """
     Return all users for admin users.
     """
@@ -858,6 +1148,49 @@ async def get_all_users(user=Depends(current_active_user), db: AsyncSession = De
     return {"users": out}
 
 
+@app.get("/api/admin/db-pool")
+async def admin_db_pool_status(user=Depends(current_active_user)):
+    """Connection pool-statistikk (admin only)"""
+    _require_admin(user)
+    return {
+        "pool": database.get_pool_status(),
+        "read_pool": database.get_pool_status(database.read_engine) if database.read_engine is not None else None,
+    }
+
+
+@app.get("/api/admin/booking-locks")
+async def admin_booking_lock_stats(user=Depends(current_active_user)):
+    """Ventetid og konflikter på skrivelåsene for bookinger (admin only)"""
+    _require_admin(user)
+    return booking_locks.booking_writes.stats()
+
+
+@app.get("/api/admin/halls", response_model=schemas.HallList)
+async def admin_list_halls(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    _require_admin(user)
+    return {"halls": await crud.get_halls(db, include_inactive=True)}
+
+@app.post("/api/admin/halls", response_model=schemas.HallRead)
+async def admin_create_hall(payload: schemas.HallCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    _require_admin(user)
+    if not payload.name.strip():
+        raise HTTPException(status_code=400, detail="Navn kreves")
+    if await crud.get_hall(db, payload.id or crud.hall_slug(payload.name)):
+        raise HTTPException(status_code=409, detail="Hallen finnes allerede")
+    hall = await crud.create_hall(db, payload)
+    logger.info(f"🏟️ Hall {hall.id} opprettet av admin {getattr(user, 'id', None)}")
+    return hall
+
+@app.put("/api/admin/halls/{hall_id}", response_model=schemas.HallRead)
+async def admin_update_hall(hall_id: str, payload: schemas.HallUpdate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """Rename, reorder or deactivate a hall (bookings keep their hall_id)"""
+    _require_admin(user)
+    hall = await crud.update_hall(db, hall_id, payload)
+    if not hall:
+        raise HTTPException(status_code=404, detail="Hall ikke funnet")
+    return hall
+
+
 @app.get("/api/admin/subscription-plans")
 async def admin_list_subscription_plans(user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     _require_admin(user)
@@ -957,117 +1290,19 @@ async def get_my_subscription(user=Depends(current_active_user), db: AsyncSessio
         }
     }
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context (bygges først ved første bruk for rask oppstart)
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def generate_password(length=12):
     """Generate a secure random password"""
+    import string
     alphabet = string.ascii_letters + string.digits + "!@#$%&*"
     password = ''.join(secrets.choice(alphabet) for i in range(length))
     return password
 
-async def send_user_credentials_email(user_email: str, user_name: str, password: str, is_admin: bool):
-    """
-    Send email to new user with their login credentials.
-    This function will not fail the request if email sending fails.
-    Supports both Resend API (recommended for Railway) and SMTP.
-    """
-    role_text = "administrator" if is_admin else "standard bruker"
-    
-    email_body = f"""
-Hei {user_name or 'der'}!
-
-Din brukerkonto hos TG Tromsø har blitt opprettet.
-
-Innloggingsdetaljer:
-E-post: {user_email}
-Passord: {password}
-Rolle: {role_text}
-
-Viktig:
-- Dette passordet er midlertidig. Vi anbefaler at du endrer det ved første innlogging.
-- Du kan endre passordet i kontoinnstillingene etter at du har logget inn.
-
-For å logge inn, gå til innloggingssiden og bruk e-postadressen og passordet over.
-
-Hvis du har spørsmål, ta kontakt med oss.
-
-Med vennlig hilsen,
-TG Tromsø
-
----
-Dette er en automatisk e-post fra TG Tromsø.
-Ikke svar på denne e-posten.
-"""
-    
-    # Try Resend API first (works on Railway free tier)
-    resend_api_key = os.getenv("RESEND_API_KEY", "")
-    if resend_api_key and HAS_HTTPX:
-        try:
-            sender_email = os.getenv("RESEND_FROM_EMAIL", os.getenv("SMTP_USER", "noreply@tgtromso.no"))
-            
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    "https://api.resend.com/emails",
-                    headers={
-                        "Authorization": f"Bearer {resend_api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "from": sender_email,
-                        "to": [user_email],
-                        "subject": "Velkommen til TG Tromsø - Dine innloggingsdetaljer",
-                        "text": email_body,
-                    },
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Welcome email sent successfully via Resend to {user_email}")
-                    return
-                else:
-                    logger.error(f"❌ Resend API error: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.error(f"❌ Error sending welcome email via Resend API: {str(e)}")
-            # Fall through to SMTP
-    
-    # Fallback to SMTP if Resend is not configured or failed
-    try:
-        smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        smtp_user = os.getenv("SMTP_USER", "")
-        smtp_password = os.getenv("SMTP_PASSWORD", "")
-        
-        if not smtp_user or not smtp_password:
-            logger.warning("⚠️ Neither Resend API key nor SMTP credentials configured. Email not sent.")
-            logger.warning("   Set RESEND_API_KEY (recommended for Railway) or SMTP_USER/SMTP_PASSWORD environment variables.")
-            return
-        
-        # Create email message
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = user_email
-        msg['Subject'] = "Velkommen til TG Tromsø - Dine innloggingsdetaljer"
-        
-        msg.attach(MIMEText(email_body, 'plain', 'utf-8'))
-        
-        # Send email using SMTP
-        try:
-            server = smtplib.SMTP(smtp_server, smtp_port, timeout=10)
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            text = msg.as_string()
-            server.sendmail(smtp_user, user_email, text)
-            server.quit()
-            logger.info(f"✅ Welcome email sent successfully via SMTP to {user_email}")
-        except (smtplib.SMTPAuthenticationError, smtplib.SMTPException, OSError) as e:
-            logger.error(f"❌ SMTP error (Railway may block SMTP on free tier): {str(e)}")
-            logger.warning("   Consider using Resend API (set RESEND_API_KEY) for Railway deployments.")
-        except Exception as e:
-            logger.error(f"❌ Error sending welcome email via SMTP to {user_email}: {e}")
-            
-    except Exception as e:
-        logger.error(f"❌ Error processing welcome email for {user_email}: {e}")
-
 class CreateUserRequest(BaseModel):
     email: str
     full_name: Optional[str] = None
@@ -1077,7 +1312,7 @@ class CreateUserRequest(BaseModel):
 @app.post("/api/admin/users")
 async def create_user_admin(
     user_data: CreateUserRequest, 
-    background_tasks: BackgroundTasks,
+    request: Request,
     user=Depends(current_active_user), 
     db: AsyncSession = Depends(database.get_db)
 ):
@@ -1086,7 +1321,15 @@ async def create_user_admin(
     Generates a random password automatically.
     """
     _require_admin(user)
-    
+    # Retry gir samme bruker tilbake i stedet for "eksisterer allerede" og en ny e-post.
+    # Passordet spilles bare av fra minnet, det lagres ikke i idempotency_keys.
+    return await idempotency.run(
+        request, "admin.user.create", str(getattr(user, "id", "")), user_data,
+        lambda: _create_user_admin(user_data, db),
+        private_fields=("password",),
+    )
+
+async def _create_user_admin(user_data: CreateUserRequest, db: AsyncSession):
     # Check if user already exists
     from sqlalchemy import select
     
@@ -1098,7 +1341,7 @@ async def create_user_admin(
     
     # Generate password
     generated_password = generate_password()
-    hashed_password = pwd_context.hash(generated_password)
+    hashed_password = get_pwd_context().hash(generated_password)
     
     # Create new user
     new_user = models.User(
@@ -1115,15 +1358,14 @@ async def create_user_admin(
     await db.commit()
     await db.refresh(new_user)
     
-    # Send welcome email with credentials to the new user in the background
+    # Queue welcome email with credentials in the outbox
     # This won't block the request and won't fail it if email sending fails
-    background_tasks.add_task(
-        send_user_credentials_email,
+    await enqueue_email(db, user_credentials_email(
         user_email=new_user.email,
         user_name=new_user.full_name or "Bruker",
         password=generated_password,
         is_admin=user_data.is_superuser
-    )
+    ))
     
     return {
         "user": {
@@ -1163,11 +1405,11 @@ async def change_password(
         raise HTTPException(status_code=404, detail="Bruker ikke funnet")
     
     # Verify current password
-    if not pwd_context.verify(password_data.current_password, db_user.hashed_password):
+    if not get_pwd_context().verify(password_data.current_password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Nåværende passord er feil")
     
     # Hash and update password
-    db_user.hashed_password = pwd_context.hash(password_data.new_password)
+    db_user.hashed_password = get_pwd_context().hash(password_data.new_password)
     db.add(db_user)
     await db.commit()
     
@@ -1215,32 +1457,46 @@ async def update_my_profile(payload: UserProfileUpdate, db: AsyncSession = Depen
     return {"ok": True, "user": {"email": getattr(user, "email", ""), "name": getattr(user, "name", ""), "phone": getattr(user, "phone", "")}}
 
 # Page Content API endpoints
-@app.get("/api/page-content/{page_name}")
-async def get_page_content_api(page_name: str, section_name: str = None, db: AsyncSession = Depends(database.get_db)):
-    """Get content for a specific page"""
-    content = await crud.get_page_content(db, page_name, section_name)
-    if section_name and content:
-        return content
-    elif not section_name and content:
-        return {"content": content}
-    else:
-        return {"content": []}
-
-@app.get("/api/page-content")
-async def get_all_page_content_api(db: AsyncSession = Depends(database.get_db)):
-    """Get all page content (admin only)"""
-    content = await crud.get_all_page_content(db)
-    return {"content": content}
+@app.get("/api/page-content/{page_name}", response_model=Union[schemas.PageContentRead, schemas.PageContentList])
+async def get_page_content_api(page_name: str, section_name: str = None):
+    """Get content for a specific page (served from the in-memory cache)"""
+    if section_name:
+        section = await page_content_cache.get_section(page_name, section_name)
+        return section if section else {"content": []}
+    return {"content": await page_content_cache.get_page(page_name)}
+
+@app.get("/api/page-content", response_model=Union[Dict[str, Dict[str, str]], schemas.PageContentList])
+async def get_all_page_content_api(pages: Optional[str] = None):
+    """
+    Get page content. With ?pages=landing,kontakt returns one bundle
+    {page: {section: content}}; without it, all content rows.
+    """
+    if pages is not None:
+        names = [p.strip() for p in pages.split(",") if p.strip()]
+        return await page_content_cache.get_bundle(names)
+    return {"content": await page_content_cache.get_all()}
 
-@app.post("/api/page-content")
+@app.post("/api/page-content", response_model=schemas.PageContentRead)
 async def create_page_content_api(content: schemas.PageContentCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Create new page content (admin only)"""
     _require_admin(user)
     user_id = str(getattr(user, "id", ""))
-    new_content = await crud.create_page_content(db, content, user_id)
+    try:
+        new_content = await crud.create_page_content(db, content, user_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Content for this page and section already exists")
     return new_content
 
-@app.put("/api/page-content/{content_id}")
+@app.put("/api/page-content/bulk", response_model=schemas.PageContentList)
+async def bulk_upsert_page_content_api(items: List[schemas.PageContentCreate], user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
+    """Create or update many sections at once, keyed on page_name + section_name (admin only)"""
+    _require_admin(user)
+    user_id = str(getattr(user, "id", ""))
+    content = await crud.upsert_page_content(db, items, user_id)
+    return {"content": content}
+
+@app.put("/api/page-content/{content_id}", response_model=schemas.PageContentRead)
 async def update_page_content_api(content_id: str, content: schemas.PageContentUpdate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Update page content (admin only)"""
     _require_admin(user)
@@ -1260,27 +1516,31 @@ async def delete_page_content_api(content_id: str, user=Depends(current_active_u
     return {"message": "Content deleted successfully"}
 
 # Blocked Time API endpoints
-@app.get("/api/blocked-times")
-async def get_blocked_times_api(start_date: str = None, end_date: str = None, db: AsyncSession = Depends(database.get_db)):
+@app.get("/api/blocked-times", response_model=schemas.BlockedTimeList)
+async def get_blocked_times_api(start_date: str = None, end_date: str = None, hall_id: Optional[str] = None, db: AsyncSession = Depends(database.get_read_db)):
     """Get blocked times (admin only)"""
     start_dt = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
     end_dt = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
     
-    blocked_times = await crud.get_blocked_times(db, start_dt, end_dt)
+    blocked_times = await crud.get_blocked_times(db, start_dt, end_dt, hall_id)
     return {"blocked_times": blocked_times}
 
-@app.post("/api/blocked-times")
+@app.post("/api/blocked-times", response_model=schemas.BlockedTimeRead)
 async def create_blocked_time_api(blocked_time: schemas.BlockedTimeCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Create blocked time (admin only)"""
     _require_admin(user)
+    if blocked_time.hall_id and not await crud.get_hall(db, blocked_time.hall_id):
+        raise HTTPException(status_code=400, detail="Ukjent hall")
     user_id = str(getattr(user, "id", ""))
     new_blocked_time = await crud.create_blocked_time(db, blocked_time, user_id)
     return new_blocked_time
 
-@app.put("/api/blocked-times/{blocked_time_id}")
+@app.put("/api/blocked-times/{blocked_time_id}", response_model=schemas.BlockedTimeRead)
 async def update_blocked_time_api(blocked_time_id: str, blocked_time: schemas.BlockedTimeUpdate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Update blocked time (admin only)"""
     _require_admin(user)
+    if blocked_time.hall_id and not await crud.get_hall(db, blocked_time.hall_id):
+        raise HTTPException(status_code=400, detail="Ukjent hall")
     user_id = str(getattr(user, "id", ""))
     updated_blocked_time = await crud.update_blocked_time(db, blocked_time_id, blocked_time, user_id)
     if not updated_blocked_time:
@@ -1304,135 +1564,14 @@ class ContactForm(BaseModel):
     subject: str
     message: str
 
-async def send_contact_form_email(
-    contact_name: str,
-    contact_email: str,
-    contact_phone: Optional[str],
-    contact_subject: str,
-    contact_message: str
-):
-    """
-    Send contact form email to configured recipient.
-    This function runs in the background and will not block the request.
-    Supports both Resend API (recommended for Railway) and SMTP.
-    """
-    recipient_email = os.getenv("CONTACT_RECIPIENT_EMAIL", "tgnrk@gmail.com")
-    
-    # Try Resend API first (works on Railway free tier)
-    resend_api_key = os.getenv("RESEND_API_KEY", "")
-    if resend_api_key and HAS_HTTPX:
-        try:
-            email_body = f"""
-Ny henvendelse fra kontaktskjemaet:
-
-Navn: {contact_name}
-E-post: {contact_email}
-Telefon: {contact_phone or 'Ikke oppgitt'}
-Emne: {contact_subject}
-
-Melding:
-{contact_message}
-
----
-Dette er en automatisk melding fra TG Tromsø kontaktskjema.
-Svar til: {contact_email}
-"""
-            
-            # Get sender email from environment or use default
-            sender_email = os.getenv("RESEND_FROM_EMAIL", os.getenv("SMTP_USER", "noreply@tgtromso.no"))
-            
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    "https://api.resend.com/emails",
-                    headers={
-                        "Authorization": f"Bearer {resend_api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "from": sender_email,
-                        "to": [recipient_email],
-                        "reply_to": contact_email,
-                        "subject": f"Kontaktskjema: {contact_subject}",
-                        "text": email_body,
-                    },
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Contact form email sent successfully via Resend to {recipient_email} from {contact_email}")
-                    return
-                else:
-                    logger.error(f"❌ Resend API error: {response.status_code} - {response.text}")
-        except Exception as e:
-            logger.error(f"❌ Error sending email via Resend API: {str(e)}")
-            # Fall through to SMTP
-    
-    # Fallback to SMTP if Resend is not configured or failed
-    try:
-        smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "587"))
-        smtp_user = os.getenv("SMTP_USER", "")
-        smtp_password = os.getenv("SMTP_PASSWORD", "")
-        
-        if not smtp_user or not smtp_password:
-            logger.warning("⚠️ Neither Resend API key nor SMTP credentials configured. Email not sent.")
-            logger.warning("   Set RESEND_API_KEY (recommended for Railway) or SMTP_USER/SMTP_PASSWORD environment variables.")
-            return
-        
-        # Create email message
-        msg = MIMEMultipart()
-        # Use SMTP user as From (required by most SMTP servers)
-        msg['From'] = smtp_user
-        msg['To'] = recipient_email
-        # Add Reply-To header so replies go to the contact form submitter
-        msg['Reply-To'] = contact_email
-        msg['Subject'] = f"Kontaktskjema: {contact_subject}"
-        
-        # Create email body
-        body = f"""
-Ny henvendelse fra kontaktskjemaet:
-
-Navn: {contact_name}
-E-post: {contact_email}
-Telefon: {contact_phone or 'Ikke oppgitt'}
-Emne: {contact_subject}
-
-Melding:
-{contact_message}
-
----
-Dette er en automatisk melding fra TG Tromsø kontaktskjema.
-Svar til: {contact_email}
-"""
-        
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-        
-        # Send email using SMTP with timeout
-        try:
-            # Set timeout to prevent hanging (10 seconds)
-            server = smtplib.SMTP(smtp_server, smtp_port, timeout=10)
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            text = msg.as_string()
-            server.sendmail(smtp_user, recipient_email, text)
-            server.quit()
-            logger.info(f"✅ Contact form email sent successfully via SMTP to {recipient_email} from {contact_email}")
-        except (smtplib.SMTPAuthenticationError, smtplib.SMTPException, OSError) as e:
-            logger.error(f"❌ SMTP error (Railway may block SMTP on free tier): {str(e)}")
-            logger.warning("   Consider using Resend API (set RESEND_API_KEY) for Railway deployments.")
-        except Exception as e:
-            logger.error(f"❌ Error sending contact form email via SMTP: {str(e)}")
-        
-    except Exception as e:
-        logger.error(f"❌ Error processing contact form email: {str(e)}")
-
-@app.post("/api/contact")
+@app.post("/api/contact", dependencies=[Depends(rate_limit("contact"))])
 async def submit_contact_form(
     contact: ContactForm,
-    background_tasks: BackgroundTasks
+    db: AsyncSession = Depends(database.get_db)
 ):
     """
     Handle contact form submissions (kurs, seminar, trening, atferdsproblemer, etc.)
-    Sends email to configured recipient in the background.
+    Queues an email to the configured recipient in the email outbox.
     """
     logger.info(f"📧 Contact form submission received:")
     logger.info(f"   Name: {contact.name}")
@@ -1441,44 +1580,54 @@ async def submit_contact_form(
     logger.info(f"   Subject: {contact.subject}")
     logger.info(f"   Message: {contact.message}")
     
-    # Send email in the background - this won't block the response
-    background_tasks.add_task(
-        send_contact_form_email,
+    # Queue email in the outbox - the outbox worker sends it, so this won't block the response
+    await enqueue_email(db, contact_form_email(
         contact_name=contact.name,
         contact_email=contact.email,
         contact_phone=contact.phone,
         contact_subject=contact.subject,
         contact_message=contact.message
-    )
+    ))
     
-    # Return immediately - email will be sent in background
+    # Return immediately - email will be sent by the outbox worker
     return {
         "message": "Takk for din henvendelse! Vi kommer tilbake til deg snart.",
         "success": True
     }
 
 # News Items API endpoints
-@app.get("/api/news")
+@app.get("/api/news", response_model=schemas.NewsItemPage)
 async def get_news_items_api(
     item_type: Optional[str] = None,
     published: Optional[bool] = None,
     featured: Optional[bool] = None,
-    limit: Optional[int] = None,
-    db: AsyncSession = Depends(database.get_db)
+    upcoming: Optional[bool] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db)
 ):
-    """Get news items (kurs, seminarer, nyheter) with optional filters"""
-    items = await crud.get_news_items(db, item_type=item_type, published=published, featured=featured, limit=limit)
-    return {"items": items}
+    """
+    Get news items (kurs, seminarer, nyheter) as summaries without content.
+    Pass next_cursor back as ?cursor= to get the next page.
+    """
+    try:
+        items, next_cursor = await crud.get_news_items(
+            db, item_type=item_type, published=published, featured=featured,
+            upcoming=upcoming, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
-@app.get("/api/news/{item_id}")
-async def get_news_item_api(item_id: str, db: AsyncSession = Depends(database.get_db)):
+@app.get("/api/news/{item_id}", response_model=schemas.NewsItemRead)
+async def get_news_item_api(item_id: str, db: AsyncSession = Depends(database.get_read_db)):
     """Get a single news item by ID"""
     item = await crud.get_news_item(db, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="News item not found")
     return item
 
-@app.post("/api/news")
+@app.post("/api/news", response_model=schemas.NewsItemRead)
 async def create_news_item_api(news_item: NewsItemCreate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Create new news item (admin only)"""
     _require_admin(user)
@@ -1486,7 +1635,7 @@ async def create_news_item_api(news_item: NewsItemCreate, user=Depends(current_a
     new_item = await crud.create_news_item(db, news_item, user_id)
     return new_item
 
-@app.put("/api/news/{item_id}")
+@app.put("/api/news/{item_id}", response_model=schemas.NewsItemRead)
 async def update_news_item_api(item_id: str, news_item: NewsItemUpdate, user=Depends(current_active_user), db: AsyncSession = Depends(database.get_db)):
     """Update news item (admin only)"""
     _require_admin(user)
@@ -1505,6 +1654,16 @@ async def delete_news_item_api(item_id: str, user=Depends(current_active_user),
         raise HTTPException(status_code=404, detail="News item not found")
     return {"message": "News item deleted successfully"}
 
+# Search
+@app.get("/api/search", response_model=schemas.SearchResults)
+async def search_api(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """Full-text search over published news and page content, best match first"""
+    return {"results": await search.search(db, q, limit)}
+
 @app.post("/api/upload-image")
 async def upload_image(
     file: UploadFile = File(...),
@@ -1513,25 +1672,28 @@ async def upload_image(
     """Upload an image file (admin only)"""
     _require_admin(user)
     
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed types: {', '.join(allowed_types)}")
+    try:
+        stored = await save_image_upload(file, UPLOAD_DIR, settings.UPLOAD_MAX_BYTES)
+    except UnsupportedImageType:
+        raise HTTPException(status_code=400, detail="Invalid file type. Allowed types: JPEG, PNG, GIF, WebP")
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File too large (max {settings.UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+    except OSError as e:
+        logger.error(f"❌ Error uploading image: {e}")
+        raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
     
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = UPLOAD_DIR / unique_filename
+    # Return URL path (relative to static files)
+    image_url = f"/uploads/images/{stored.filename}"
+    if stored.deduplicated:
+        logger.info(f"♻️ Image already stored: {image_url} ({stored.size} bytes, {stored.content_type})")
+    else:
+        logger.info(f"✅ Image uploaded: {image_url} ({stored.size} bytes, {stored.content_type})")
     
-    # Save file
+    # Skaleres i en egen prosess; feiler det, serveres originalen og variantene lages ved første visning
+    variants = []
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Return URL path (relative to static files)
-        image_url = f"/uploads/images/{unique_filename}"
-        logger.info(f"✅ Image uploaded: {image_url}")
-        return {"url": image_url, "filename": unique_filename}
+        if await generate_variants(UPLOAD_ROOT, stored.filename):
+            variants = [{"width": width, "url": f"{image_url}?w={width}"} for width in VARIANT_WIDTHS]
     except Exception as e:
-        logger.error(f"❌ Error uploading image: {e}")
-        raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
\ No newline at end of file
+        logger.warning(f"⚠️ Could not generate variants for {stored.filename}: {e}")
+    return {"url": image_url, "filename": stored.filename, "variants": variants}
\ No newline at end of file
@@ -0,0 +1,354 @@
+"""
+Versjonert migrasjonslogg.
+
+Hver migrasjon har et fast versjonsnummer og kjøres én gang. Hvilke som er kjørt
+lagres i tabellen `schema_version`, så en varm oppstart koster én spørring:
+
+    SELECT max(version) FROM schema_version
+
+Nye migrasjoner legges til nederst med neste ledige versjonsnummer. Stegene skal
+være idempotente (sjekk før endring), siden baseline-steget oppretter alle tabeller
+med dagens modeller på en tom database.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import func, inspect, insert, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from . import models
+from .database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+# Vilkårlig konstant for pg_advisory_xact_lock, så bare én worker migrerer om gangen
+_MIGRATION_LOCK_ID = 804_117_028
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Registrer en migrasjon. Versjoner må være unike og stigende."""
+    def decorator(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise RuntimeError(f"Migration {version} ({name}) is out of order")
+        MIGRATIONS.append(Migration(version=version, name=name, apply=fn))
+        return fn
+    return decorator
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# --- Hjelpere ---
+
+def _is_postgres(conn: AsyncConnection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+async def _columns(conn: AsyncConnection, table_name: str) -> set:
+    def _inspect(sync_conn):
+        insp = inspect(sync_conn)
+        if not insp.has_table(table_name):
+            return set()
+        return {c["name"] for c in insp.get_columns(table_name)}
+    return await conn.run_sync(_inspect)
+
+
+async def _create_tables(conn: AsyncConnection, *model_classes):
+    tables = [m.__table__ for m in model_classes]
+    await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
+
+
+# --- Migrasjoner ---
+
+@migration(1, "baseline_tables")
+async def _baseline_tables(conn: AsyncConnection):
+    await conn.run_sync(Base.metadata.create_all)
+
+
+@migration(2, "user_privacy_columns")
+async def _user_privacy_columns(conn: AsyncConnection):
+    columns = await _columns(conn, "user")
+    if "privacy_accepted" not in columns:
+        logger.info("Adding privacy_accepted column to user table...")
+        await conn.execute(text('ALTER TABLE "user" ADD COLUMN privacy_accepted BOOLEAN NOT NULL DEFAULT FALSE'))
+    if "privacy_accepted_date" not in columns:
+        logger.info("Adding privacy_accepted_date column to user table...")
+        await conn.execute(text('ALTER TABLE "user" ADD COLUMN privacy_accepted_date TIMESTAMP NULL'))
+
+
+@migration(3, "bookings_created_by_updated_at")
+async def _bookings_created_by_updated_at(conn: AsyncConnection):
+    columns = await _columns(conn, "bookings")
+    if "user_id" in columns and "created_by" not in columns:
+        logger.info("Migrating bookings table: renaming user_id to created_by...")
+        await conn.execute(text("ALTER TABLE bookings RENAME COLUMN user_id TO created_by"))
+    if "updated_at" not in columns:
+        logger.info("Adding updated_at column to bookings table...")
+        # SQLite tillater ikke ikke-konstant DEFAULT i ALTER TABLE
+        default = " DEFAULT CURRENT_TIMESTAMP" if _is_postgres(conn) else ""
+        await conn.execute(text(f"ALTER TABLE bookings ADD COLUMN updated_at TIMESTAMP{default}"))
+
+
+@migration(4, "seed_subscription_plans")
+async def _seed_subscription_plans(conn: AsyncConnection):
+    plans = models.SubscriptionPlan.__table__
+    existing = {row[0] for row in (await conn.execute(select(plans.c.code))).fetchall()}
+    now = datetime.now()
+    defaults = [
+        {"code": "tilgang1", "name": "Tilgang 1 (1 år)", "duration_months": 12},
+        {"code": "tilgang2", "name": "Tilgang 2 (6 måneder)", "duration_months": 6},
+    ]
+    to_add = [
+        {**p, "default_hours_per_week": 2, "is_active": True, "created_at": now, "updated_at": now}
+        for p in defaults
+        if p["code"] not in existing
+    ]
+    if to_add:
+        logger.info(f"Seeding subscription plans: {[p['code'] for p in to_add]}")
+        await conn.execute(insert(plans), to_add)
+
+
+@migration(5, "email_outbox")
+async def _email_outbox(conn: AsyncConnection):
+    await _create_tables(conn, models.EmailOutbox)
+
+
+@migration(6, "page_content_unique_section")
+async def _page_content_unique_section(conn: AsyncConnection):
+    # Behold den sist oppdaterte raden per (page_name, section_name) før indeksen lages
+    stamp = "COALESCE({t}.updated_at, {t}.created_at, '1970-01-01')"
+    result = await conn.execute(text(f"""
+        DELETE FROM page_content WHERE id IN (
+            SELECT p.id FROM page_content p
+            JOIN page_content q
+              ON q.page_name = p.page_name AND q.section_name = p.section_name AND q.id <> p.id
+            WHERE {stamp.format(t="q")} > {stamp.format(t="p")}
+               OR ({stamp.format(t="q")} = {stamp.format(t="p")} AND q.id > p.id)
+        )
+    """))
+    if result.rowcount:
+        logger.info(f"Removed {result.rowcount} duplicate page_content rows")
+    await conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_page_content_page_section ON page_content (page_name, section_name)"
+    ))
+    # Den sammensatte indeksen dekker oppslag på page_name alene
+    await conn.execute(text("DROP INDEX IF EXISTS ix_page_content_page_name"))
+
+
+@migration(7, "rendered_content_html")
+async def _rendered_content_html(conn: AsyncConnection):
+    from .rendering import render_content
+
+    for table, content_type_column in (("page_content", "content_type"), ("news_items", None)):
+        if "content_html" not in await _columns(conn, table):
+            logger.info(f"Adding content_html column to {table} table...")
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN content_html TEXT NULL"))
+
+        type_expr = content_type_column or "'auto'"
+        rows = (await conn.execute(text(
+            f"SELECT id, content, {type_expr} FROM {table} WHERE content_html IS NULL"
+        ))).fetchall()
+        if rows:
+            logger.info(f"Rendering content_html for {len(rows)} rows in {table}")
+            await conn.execute(
+                text(f"UPDATE {table} SET content_html = :html WHERE id = :id"),
+                [{"id": row[0], "html": render_content(row[1], row[2] or "text")} for row in rows],
+            )
+
+
+@migration(8, "news_items_feed_index")
+async def _news_items_feed_index(conn: AsyncConnection):
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_news_items_feed ON news_items (published, item_type, event_date, created_at)"
+    ))
+
+
+@migration(9, "search_index")
+async def _search_index(conn: AsyncConnection):
+    from .search import create_search_index, rebuild_search_index
+
+    await create_search_index(conn)
+    await rebuild_search_index(conn)
+
+
+@migration(10, "image_variants")
+async def _image_variants(conn: AsyncConnection):
+    await _create_tables(conn, models.ImageVariant)
+
+
+@migration(11, "image_references")
+async def _image_references(conn: AsyncConnection):
+    from .images import referenced_images
+
+    await _create_tables(conn, models.ImageReference)
+    # Backfill fra eksisterende innhold; slettes først så steget kan kjøres på nytt
+    await conn.execute(text("DELETE FROM image_references"))
+    refs = []
+    for row in (await conn.execute(text("SELECT id, image_url, content FROM news_items"))).fetchall():
+        refs += [("news_item", row[0], name) for name in referenced_images(row[1], row[2])]
+    for row in (await conn.execute(text("SELECT id, content FROM page_content"))).fetchall():
+        refs += [("page_content", row[0], name) for name in referenced_images(row[1])]
+    if refs:
+        logger.info(f"Recording {len(refs)} image references")
+        await conn.execute(
+            models.ImageReference.__table__.insert(),
+            [{"ref_type": ref_type, "ref_id": ref_id, "filename": name} for ref_type, ref_id, name in refs],
+        )
+
+
+@migration(12, "calendar_feeds")
+async def _calendar_feeds(conn: AsyncConnection):
+    if "updated_at" not in await _columns(conn, "blocked_time"):
+        logger.info("Adding updated_at column to blocked_time table...")
+        await conn.execute(text("ALTER TABLE blocked_time ADD COLUMN updated_at TIMESTAMP NULL"))
+    await conn.execute(text("UPDATE blocked_time SET updated_at = created_at WHERE updated_at IS NULL"))
+    await _create_tables(conn, models.CalendarToken)
+
+
+@migration(13, "halls")
+async def _halls(conn: AsyncConnection):
+    from .crud import hall_slug
+
+    await _create_tables(conn, models.Hall)
+    for table in ("bookings", "blocked_time"):
+        if "hall_id" not in await _columns(conn, table):
+            logger.info(f"Adding hall_id column to {table} table...")
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN hall_id VARCHAR(50) NULL REFERENCES halls (id)"))
+
+    # Én hall per distinkt fritekstnavn i bookings (samme slug slås sammen), og alltid minst én
+    halls = models.Hall.__table__
+    existing = {row[0] for row in (await conn.execute(select(halls.c.id))).fetchall()}
+    names = [row[0] for row in (await conn.execute(text(
+        "SELECT DISTINCT hall FROM bookings WHERE hall_id IS NULL AND hall IS NOT NULL AND TRIM(hall) <> ''"
+    ))).fetchall()]
+    if not existing and not names:
+        names = ["Hovedsal"]
+    now = datetime.now()
+    to_add = {}
+    for name in sorted(names):
+        slug = hall_slug(name)
+        if slug not in existing and slug not in to_add:
+            to_add[slug] = {
+                "id": slug, "name": name.strip(), "is_active": True,
+                "sort_order": len(existing) + len(to_add), "created_at": now, "updated_at": now,
+            }
+    if to_add:
+        logger.info(f"Creating halls: {sorted(to_add)}")
+        await conn.execute(insert(halls), list(to_add.values()))
+
+    if names:
+        await conn.execute(
+            text("UPDATE bookings SET hall_id = :hall_id WHERE hall_id IS NULL AND hall = :name"),
+            [{"hall_id": hall_slug(name), "name": name} for name in names],
+        )
+    # Bookinger uten hallnavn havner i første hall
+    first = (await conn.execute(select(halls.c.id, halls.c.name).order_by(halls.c.sort_order, halls.c.name).limit(1))).first()
+    if first is not None:
+        await conn.execute(
+            text("UPDATE bookings SET hall_id = :hall_id, hall = :name WHERE hall_id IS NULL"),
+            {"hall_id": first[0], "name": first[1]},
+        )
+    if _is_postgres(conn):
+        await conn.execute(text("ALTER TABLE bookings ALTER COLUMN hall_id SET NOT NULL"))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bookings_hall_time ON bookings (hall_id, start_time, end_time)"
+    ))
+
+
+
+@migration(14, "booking_exclusion_constraint")
+async def _booking_exclusion_constraint(conn: AsyncConnection):
+    # Bare PostgreSQL; SQLite sjekker overlapp i koden (se app/booking_overlap.py)
+    if _is_postgres(conn):
+        from .booking_overlap import install
+
+        await install(conn)
+
+
+@migration(15, "idempotency_keys")
+async def _idempotency_keys(conn: AsyncConnection):
+    await _create_tables(conn, models.IdempotencyKey)
+
+
+@migration(16, "waitlist")
+async def _waitlist(conn: AsyncConnection):
+    await _create_tables(conn, models.WaitlistEntry)
+
+
+@migration(17, "slot_holds")
+async def _slot_holds(conn: AsyncConnection):
+    await _create_tables(conn, models.SlotHold)
+
+
+@migration(18, "plain_page_content_html")
+async def _plain_page_content_html(conn: AsyncConnection):
+    # Bare markdown rendres; text/json/html skal vises som råtekst igjen
+    result = await conn.execute(text(
+        "UPDATE page_content SET content_html = NULL "
+        "WHERE content_html IS NOT NULL AND (content_type IS NULL OR content_type <> 'markdown')"
+    ))
+    if result.rowcount:
+        logger.info(f"Cleared content_html for {result.rowcount} non-markdown page_content rows")
+
+
+# --- Runner ---
+
+async def get_schema_version(conn: AsyncConnection) -> int:
+    """Høyeste kjørte versjon, eller 0 hvis loggen ikke finnes ennå."""
+    table = models.SchemaVersion.__table__
+    try:
+        result = await conn.execute(select(func.max(table.c.version)))
+    except DBAPIError:
+        return 0
+    return result.scalar() or 0
+
+
+async def run_migrations(async_engine: AsyncEngine = engine) -> int:
+    """
+    Kjør alle migrasjoner som mangler. Returnerer versjonen databasen står på etterpå.
+    """
+    target = latest_version()
+
+    # Varm oppstart: én spørring og ferdig
+    async with async_engine.connect() as conn:
+        current = await get_schema_version(conn)
+    if current >= target:
+        logger.info(f"Database schema up to date (version {current})")
+        return current
+
+    async with async_engine.begin() as conn:
+        if _is_postgres(conn):
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": _MIGRATION_LOCK_ID})
+        await _create_tables(conn, models.SchemaVersion)
+        # Les på nytt under låsen i tilfelle en annen worker nettopp migrerte
+        current = await get_schema_version(conn)
+
+        for step in MIGRATIONS:
+            if step.version <= current:
+                continue
+            logger.info(f"Applying migration {step.version}: {step.name}")
+            await step.apply(conn)
+            await conn.execute(
+                insert(models.SchemaVersion.__table__).values(
+                    version=step.version, name=step.name, applied_at=datetime.now()
+                )
+            )
+            current = step.version
+
+    logger.info(f"✅ Database schema migrated to version {current}")
+    return current
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index, ForeignKey
 from .database import Base
 import uuid
 from sqlalchemy.orm import Mapped, mapped_column
@@ -18,16 +18,18 @@ class PageContent(Base):
     __tablename__ = "page_content"
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    page_name: Mapped[str] = mapped_column(String(100), index=True)  # e.g., "landing", "kontakt", "om-oss"
+    page_name: Mapped[str] = mapped_column(String(100))  # e.g., "landing", "kontakt", "om-oss"
     section_name: Mapped[str] = mapped_column(String(100), index=True)  # e.g., "hero_title", "contact_address"
     content: Mapped[str] = mapped_column(Text)  # HTML or plain text content
     content_type: Mapped[str] = mapped_column(String(20), default="text")  # "text", "html", "markdown"
+    content_html: Mapped[str] = mapped_column(Text, nullable=True)  # sanitert HTML, rendret ved lagring
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
     created_by: Mapped[str] = mapped_column(String, nullable=True)  # user_id who created/updated
     
-    # Unique constraint on page_name + section_name combination
+    # Unique constraint on page_name + section_name combination (dekker også oppslag på page_name alene)
     __table_args__ = (
+        Index("uq_page_content_page_section", "page_name", "section_name", unique=True),
         {"extend_existing": True},
     )
 
@@ -41,9 +43,11 @@ class BlockedTime(Base):
     hour: Mapped[int] = mapped_column(Integer, nullable=True)  # Hour to block (0-23) for single hour blocks
     day_of_week: Mapped[int] = mapped_column(Integer, nullable=True)  # 0=Monday, 6=Sunday for weekly blocks
     reason: Mapped[str] = mapped_column(String(255), nullable=True)  # Reason for blocking
+    hall_id: Mapped[str] = mapped_column(String(50), ForeignKey("halls.id"), nullable=True)  # NULL = alle haller
     is_active: Mapped[bool] = mapped_column(default=True)  # Can be temporarily disabled
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     created_by: Mapped[str] = mapped_column(String, nullable=True)  # user_id who created the block
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=True)
 
 class NewsItem(Base):
     __tablename__ = "news_items"
@@ -51,6 +55,7 @@ class NewsItem(Base):
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title: Mapped[str] = mapped_column(String(255))  # Title of the news/course/seminar
     content: Mapped[str] = mapped_column(Text)  # Full content (HTML or markdown)
+    content_html: Mapped[str] = mapped_column(Text, nullable=True)  # sanitert HTML, rendret ved lagring
     excerpt: Mapped[str] = mapped_column(String(500), nullable=True)  # Short description for preview
     item_type: Mapped[str] = mapped_column(String(20))  # "kurs", "seminar", "nyhet"
     event_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)  # When the course/seminar takes place
@@ -61,6 +66,11 @@ class NewsItem(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
     created_by: Mapped[str] = mapped_column(String, nullable=True)  # user_id who created it
 
+    # Nyhetslisten filtrerer på published/item_type og sorterer på event_date, created_at
+    __table_args__ = (
+        Index("ix_news_items_feed", "published", "item_type", "event_date", "created_at"),
+    )
+
 class UserSession(Base):
     __tablename__ = "user_sessions"
     
@@ -85,18 +95,140 @@ class AuthorizationCode(Base):
     expires_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
     used_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True)
 
+class EmailOutbox(Base):
+    """
+    Utboks for e-post. Request-handlere legger meldinger her, og bakgrunnsworkeren
+    i app/email_outbox.py sender dem med retry og backoff.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind: Mapped[str] = mapped_column(String(50), default="generic")  # "user_credentials", "contact_form", ...
+    recipient: Mapped[str] = mapped_column(String(255), nullable=False)
+    reply_to: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)  # tømmes etter vellykket sending
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # "pending", "sent", "failed"
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    transport: Mapped[str | None] = mapped_column(String(20), nullable=True)  # "resend" / "smtp"
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+class ImageVariant(Base):
+    """
+    Nedskalert versjon av et opplastet bilde (se app/images.py).
+    """
+    __tablename__ = "image_variants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source: Mapped[str] = mapped_column(String(255))  # filnavn under uploads/images
+    width: Mapped[int] = mapped_column(Integer)  # målbredde (320/640/1600), aldri oppskalert
+    format: Mapped[str] = mapped_column(String(10))  # "webp" / "jpeg"
+    path: Mapped[str] = mapped_column(String(500))  # relativ til UPLOAD_ROOT
+    size: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("uq_image_variants_source_width_format", "source", "width", "format", unique=True),
+    )
+
+class ImageReference(Base):
+    """
+    Hvilke opplastede bilder som brukes hvor. Filer uten referanse kan slettes av gc_images.py.
+    """
+    __tablename__ = "image_references"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    filename: Mapped[str] = mapped_column(String(255))  # filnavn under uploads/images
+    ref_type: Mapped[str] = mapped_column(String(20))  # "news_item" / "page_content"
+    ref_id: Mapped[str] = mapped_column(String(255))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("uq_image_references_file_ref", "filename", "ref_type", "ref_id", unique=True),
+        Index("ix_image_references_ref", "ref_type", "ref_id"),
+    )
+
+class CalendarToken(Base):
+    """
+    Hemmelig token for en medlems kalenderabonnement (/calendar/{token}.ics).
+    """
+    __tablename__ = "calendar_tokens"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id: Mapped[str] = mapped_column(String(36), unique=True, index=True)
+    token: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+class IdempotencyKey(Base):
+    """
+    Lagrede svar for Idempotency-Key (se app/idempotency.py). En retry med samme nøkkel
+    får svaret på nytt uten at handleren kjøres igjen. Slettes etter expires_at.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("uq_idempotency_keys_scope_key", "scope", "user_id", "key", unique=True),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    scope: Mapped[str] = mapped_column(String(50))  # "booking.create", "admin.user.create", ...
+    user_id: Mapped[str] = mapped_column(String(36))
+    key: Mapped[str] = mapped_column(String(255))
+    request_hash: Mapped[str] = mapped_column(String(64))  # sha256 av body; samme nøkkel + annen body avvises
+    status: Mapped[str] = mapped_column(String(20), default="in_progress")  # "in_progress" / "completed"
+    response_status: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+
+class SchemaVersion(Base):
+    """
+    Logg over kjørte migrasjoner (se app/migrations.py).
+    """
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String(100))
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
 # --- Booking + Abonnement (rettigheter) ---
+class Hall(Base):
+    """
+    Haller som kan bookes hver for seg. id er en kort slug ("hovedsal") som brukes i URL-er.
+    """
+    __tablename__ = "halls"
+
+    id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    name: Mapped[str] = mapped_column(String(255))
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    sort_order: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
 class Booking(Base):
     """
     Persistente bookinger.
     NB: Vi lagrer `created_by` som string (UUID-str) for å fungere likt på SQLite/PostgreSQL.
+    `hall` beholdes som visningsnavn; overlapp og kalender går på `hall_id`.
+    På PostgreSQL har tabellen i tillegg den genererte kolonnen `during` (tsrange) med
+    EXCLUDE-constraint, se app/booking_overlap.py. Den er ikke mappet her.
     """
     __tablename__ = "bookings"
     __table_args__ = (
+        # Overlappsjekk og kalender: hall_id = ? AND start_time < ? AND end_time > ?
+        Index("ix_bookings_hall_time", "hall_id", "start_time", "end_time"),
         {"extend_existing": True},
     )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    hall_id: Mapped[str] = mapped_column(String(50), ForeignKey("halls.id"), nullable=False)
     hall: Mapped[str] = mapped_column(String(255))
     start_time: Mapped[datetime] = mapped_column(DateTime, index=True)
     end_time: Mapped[datetime] = mapped_column(DateTime, index=True)
@@ -105,6 +237,51 @@ class Booking(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
 
 
+class WaitlistEntry(Base):
+    """
+    Venteliste for opptatte tider (se app/waitlist.py). Når en booking slettes eller
+    flyttes, får første ventende (created_at) med en tid innenfor det ledige
+    intervallet tiden (auto_book) eller en e-post.
+    """
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        # Ledig intervall: hall_id = ? AND status = 'waiting' AND start_time >= ? AND start_time < ?
+        Index("ix_waitlist_hall_status_time", "hall_id", "status", "start_time", "end_time"),
+        Index("ix_waitlist_user_status", "user_id", "status"),
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    hall_id: Mapped[str] = mapped_column(String(50), ForeignKey("halls.id"), nullable=False)
+    user_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    start_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    end_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    auto_book: Mapped[bool] = mapped_column(Boolean, default=True)  # False = bare varsle
+    status: Mapped[str] = mapped_column(String(20), default="waiting")  # "waiting", "booked", "notified", "cancelled"
+    booking_id: Mapped[str | None] = mapped_column(String, nullable=True)  # satt når auto_book ga en booking
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    resolved_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class SlotHold(Base):
+    """
+    Kortvarig reservasjon av en tid mens medlemmet fyller ut bookingen (se app/slot_holds.py).
+    Brukes bare med flere workere (PostgreSQL); ellers holdes reservasjonene i minnet.
+    """
+    __tablename__ = "slot_holds"
+    __table_args__ = (
+        Index("ix_slot_holds_hall_time", "hall_id", "start_time", "end_time"),
+        Index("ix_slot_holds_expires_at", "expires_at"),
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    hall_id: Mapped[str] = mapped_column(String(50), ForeignKey("halls.id"), nullable=False)
+    user_id: Mapped[str] = mapped_column(String(36), index=True, nullable=False)
+    start_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    end_time: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+
 class SubscriptionPlan(Base):
     """
     Abonnement-planer (tilgang1/tilgang2).
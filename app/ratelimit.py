@@ -0,0 +1,185 @@
+"""
+Token-bucket rate limiting for offentlige og auth-endepunkter.
+
+Hver rute har et navn ("login", "register", "contact") med én bucket per IP og
+eventuelt én per konto (brukernavn/e-post fra requesten). Grensene kan overstyres
+med RATE_LIMIT_OVERRIDES, f.eks. "login.ip=10/60,contact.ip=3/600".
+
+Bruk som dependency:
+
+    @app.post("/api/contact", dependencies=[Depends(rate_limit("contact"))])
+
+Lagringen er pluggbar: InMemoryRateLimitStore holder buckets i prosessen (sharded
+dict med én lås per shard). Med flere workere kan en delt backend implementere
+RateLimitStore.take() og settes med set_rate_limit_store().
+"""
+
+import math
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from .settings import settings
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    capacity: int  # maks antall requests i en burst
+    period_seconds: float  # tiden det tar å fylle bucketen helt opp igjen
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit":
+        """'5/60' = 5 requests, fylles opp igjen i løpet av 60 sekunder."""
+        capacity, period = spec.strip().split("/", 1)
+        return cls(capacity=int(capacity), period_seconds=float(period))
+
+
+# route -> scope ("ip" / "account") -> grense
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, str]] = {
+    "login": {"ip": "20/60", "account": "10/300"},
+    "register": {"ip": "5/3600"},
+    "contact": {"ip": "5/600"},
+}
+
+
+def _load_rules() -> Dict[str, Dict[str, RateLimit]]:
+    rules = {
+        route: {scope: RateLimit.parse(spec) for scope, spec in scopes.items()}
+        for route, scopes in DEFAULT_RATE_LIMITS.items()
+    }
+    for item in filter(None, (p.strip() for p in settings.RATE_LIMIT_OVERRIDES.split(","))):
+        key, spec = item.split("=", 1)
+        route, scope = key.strip().split(".", 1)
+        rules.setdefault(route, {})[scope] = RateLimit.parse(spec)
+    return rules
+
+
+RATE_LIMITS = _load_rules()
+
+
+class RateLimitStore:
+    """Grensesnitt for lagring av token-buckets."""
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Trekk `cost` tokens fra bucketen for `key`.
+        Returnerer (tillatt, sekunder til nok tokens er tilgjengelig).
+        """
+        raise NotImplementedError
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Buckets i prosessminnet, fordelt på shards for å holde låsene korte."""
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10_000):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._max_keys_per_shard = max_keys_per_shard
+
+    def _shard(self, key: str):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> Tuple[bool, float]:
+        return self.take_sync(key, limit, cost)
+
+    def take_sync(self, key: str, limit: RateLimit, cost: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        now = time.monotonic() if now is None else now
+        buckets, lock = self._shard(key)
+        with lock:
+            tokens, updated, _ = buckets.get(key, (float(limit.capacity), now, limit.period_seconds))
+            tokens = min(float(limit.capacity), tokens + (now - updated) * limit.refill_per_second)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / limit.refill_per_second
+            buckets[key] = (tokens, now, limit.period_seconds)
+            if len(buckets) > self._max_keys_per_shard:
+                self._evict_idle(buckets, now)
+        return allowed, retry_after
+
+    @staticmethod
+    def _evict_idle(buckets: dict, now: float):
+        # Buckets som uansett ville vært fulle igjen kan glemmes uten at noe endres
+        stale = [k for k, (_, updated, period) in buckets.items() if now - updated >= period]
+        for k in stale:
+            del buckets[k]
+
+
+_store: RateLimitStore = InMemoryRateLimitStore()
+
+
+def get_rate_limit_store() -> RateLimitStore:
+    return _store
+
+
+def set_rate_limit_store(store: RateLimitStore):
+    global _store
+    _store = store
+
+
+def client_ip(request: Request) -> str:
+    """
+    Klientens IP. Standard er TCP-adressen; X-Forwarded-For kan klienten skrive
+    selv. Bak proxyer (Railway, nginx) settes RATE_LIMIT_PROXY_HOPS til antall
+    proxyer, og adressen den ytterste proxyen la til brukes.
+    """
+    hops = settings.RATE_LIMIT_PROXY_HOPS
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        parts = [p.strip() for p in forwarded.split(",") if p.strip()]
+        # Færre oppføringer enn proxyer: headeren kom ikke gjennom alle, ikke stol på den
+        if len(parts) >= hops:
+            return parts[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+async def _account_from_request(request: Request, field: str) -> Optional[str]:
+    # Body er allerede lest og cachet på request-objektet når dependencies kjøres
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            value = (await request.form()).get(field)
+        elif content_type.startswith("application/json"):
+            data = await request.json()
+            value = data.get(field) if isinstance(data, dict) else None
+        else:
+            return None
+    except Exception:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().lower()
+
+
+def rate_limit(route: str, account_field: Optional[str] = None):
+    """Lag en dependency som håndhever grensene for `route`."""
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        rules = RATE_LIMITS.get(route, {})
+        checks = []
+        if "ip" in rules:
+            checks.append(("ip", client_ip(request), rules["ip"]))
+        if "account" in rules and account_field:
+            account = await _account_from_request(request, account_field)
+            if account:
+                checks.append(("account", account, rules["account"]))
+
+        store = get_rate_limit_store()
+        for scope, identity, limit in checks:
+            allowed, retry_after = await store.take(f"{route}:{scope}:{identity}", limit)
+            if not allowed:
+                raise HTTPException(
+                    status_code=429,
+                    detail="For mange forespørsler. Vent litt og prøv igjen.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+    return dependency
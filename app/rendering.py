@@ -0,0 +1,135 @@
+"""
+Markdown -> sanitert HTML for sideinnhold og nyheter.
+
+Innholdet rendres én gang når det skrives (crud) og lagres i `content_html`, så
+lesing bare serverer ferdig HTML. Resultatet caches også i minnet på sha256 av
+innholdet, slik at lik tekst (re-lagring, seeding, backfill) ikke rendres på nytt.
+
+Bare markdown (og nyheter, "auto") rendres. Seksjoner av typen text/json/html får
+`content_html` = NULL, og frontend bruker råteksten som før.
+
+`markdown` og `nh3` er påkrevd, men importeres først ved bruk (oppstartstid);
+require_dependencies() stopper oppstarten hvis de mangler.
+"""
+
+import hashlib
+import importlib.util
+import re
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Optional
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "code", "div", "em", "h1", "h2", "h3", "h4",
+    "h5", "h6", "hr", "i", "img", "li", "ol", "p", "pre", "s", "span", "strong", "sub",
+    "sup", "table", "tbody", "td", "th", "thead", "tr", "u", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "*": {"class", "title"},
+    "a": {"href", "target"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+}
+URL_SCHEMES = {"http", "https", "mailto", "tel"}
+
+# content_type-verdier som får content_html; "auto" er nyheter
+RENDERED_TYPES = {"markdown", "auto"}
+
+# Innholdet i disse fjernes helt, ikke bare taggene
+_DROP_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template", "noscript"}
+_HTML_HINT = re.compile(r"<(p|div|br|h[1-6]|ul|ol|li|img|a|b|i|u|strong|em|table|span)\b", re.IGNORECASE)
+
+_CACHE_SIZE = 512
+_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def require_dependencies():
+    """Kalles ved oppstart: uten en ekte sanitizer skal ikke appen lagre HTML."""
+    missing = [name for name in ("markdown", "nh3") if importlib.util.find_spec(name) is None]
+    if missing:
+        raise RuntimeError(f"Missing required packages for content rendering: {', '.join(missing)}")
+
+
+def sanitize_html(value: str) -> str:
+    """Fjern alt som ikke står i allowlisten (script, event-attributter, javascript:-lenker)."""
+    import nh3
+
+    return nh3.clean(
+        value,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        url_schemes=URL_SCHEMES,
+        clean_content_tags=_DROP_CONTENT_TAGS,
+    )
+
+
+class _TextExtractor(HTMLParser):
+    _BLOCK_TAGS = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "tr", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _DROP_CONTENT_TAGS:
+            self._skip_depth += 1
+        elif tag in self._BLOCK_TAGS:
+            self.out.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _DROP_CONTENT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self._BLOCK_TAGS:
+            self.out.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.out.append(data)
+
+
+def html_to_text(value: Optional[str]) -> str:
+    """Ren tekst fra HTML (til søkeindeksen)."""
+    if not value:
+        return ""
+    parser = _TextExtractor()
+    parser.feed(value)
+    parser.close()
+    return re.sub(r"\s+", " ", "".join(parser.out)).strip()
+
+
+def markdown_to_html(text: str) -> str:
+    import markdown
+
+    return markdown.markdown(text, extensions=["extra", "sane_lists"])
+
+
+def _render(content: str, content_type: str) -> str:
+    if content_type == "auto":
+        # Nyheter har ingen type: redigert HTML fra adminpanelet, ellers markdown
+        content_type = "html" if _HTML_HINT.search(content) else "markdown"
+    if content_type == "markdown":
+        return sanitize_html(markdown_to_html(content))
+    return sanitize_html(content)
+
+
+def render_content(content: Optional[str], content_type: str = "markdown") -> Optional[str]:
+    """
+    Sanitert HTML for `content`, cachet på (type, sha256(innhold)). None for typer
+    som ikke rendres (text, json, html); da vises råteksten.
+    """
+    if content_type not in RENDERED_TYPES:
+        return None
+    if not content:
+        return ""
+    key = f"{content_type}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+    rendered = _render(content, content_type)
+    _cache[key] = rendered
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return rendered
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, model_validator
 from datetime import datetime, time, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from fastapi_users import schemas
 import uuid
 
@@ -18,8 +18,33 @@ class UserUpdate(schemas.BaseUserUpdate):
     privacy_accepted_date: Optional[datetime] = None
 
 
+class HallCreate(BaseModel):
+    name: str
+    id: Optional[str] = None  # slug; lages fra navnet hvis utelatt
+    is_active: bool = True
+    sort_order: int = 0
+
+class HallUpdate(BaseModel):
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    sort_order: Optional[int] = None
+
+class HallRead(BaseModel):
+    id: str
+    name: str
+    is_active: bool
+    sort_order: int
+
+    class Config:
+        from_attributes = True
+
+class HallList(BaseModel):
+    halls: List[HallRead]
+
+
 class BookingCreate(BaseModel):
-    hall: str
+    hall_id: Optional[str] = None
+    hall: Optional[str] = None  # hallnavn, for klienter som ikke sender hall_id
     start_time: datetime
     end_time: datetime
 
@@ -69,6 +94,123 @@ class BookingCreate(BaseModel):
 
         return self
 
+class BookingRead(BaseModel):
+    id: str
+    hall: str
+    hall_id: Optional[str] = None
+    start_time: datetime
+    end_time: datetime
+    created_by: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class MyBooking(BaseModel):
+    id: str
+    hall: str
+    hall_id: Optional[str] = None
+    start_time: datetime
+    end_time: datetime
+
+    class Config:
+        from_attributes = True
+
+class MyBookingList(BaseModel):
+    bookings: List[MyBooking]
+
+class SlotHoldCreate(BaseModel):
+    hall_id: Optional[str] = None
+    hall: Optional[str] = None  # navn; brukes hvis hall_id mangler
+    start_time: datetime
+    end_time: datetime
+
+class SlotHoldRead(BaseModel):
+    id: str
+    hall_id: str
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class WaitlistCreate(BaseModel):
+    hall_id: Optional[str] = None
+    hall: Optional[str] = None  # navn; brukes hvis hall_id mangler
+    start_time: datetime
+    end_time: datetime
+    auto_book: bool = True  # book automatisk hvis tiden blir ledig (innenfor ukekvoten)
+
+class WaitlistEntryRead(BaseModel):
+    id: str
+    hall_id: str
+    start_time: datetime
+    end_time: datetime
+    auto_book: bool
+    status: str
+    booking_id: Optional[str] = None
+    position: Optional[int] = None  # plass i køen for samme tid, bare for "waiting"
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class WaitlistEntryList(BaseModel):
+    entries: List[WaitlistEntryRead]
+
+class BookingUser(BaseModel):
+    id: str
+    email: str
+    name: str = ""
+    phone: str = ""
+
+class AdminBookingRead(BaseModel):
+    id: str
+    hall: str
+    hall_id: Optional[str] = None
+    start_time: datetime
+    end_time: datetime
+    created_by: Optional[str] = None
+    user: Optional[BookingUser] = None
+    created_at: datetime
+
+class AdminBookingList(BaseModel):
+    bookings: List[AdminBookingRead]
+
+class CalendarSlot(BaseModel):
+    hour: int
+    start_time: datetime
+    end_time: datetime
+    booking_ids: List[str] = []
+    status: str  # "empty" / "held" / "booked" / "blocked"
+    color: str
+    reason: Optional[str] = None
+
+class CalendarDay(BaseModel):
+    date: str
+    slots: List[CalendarSlot]
+    colors: Dict[str, str]
+
+class CalendarRange(BaseModel):
+    days: List[CalendarDay]
+    hall_id: Optional[str] = None
+    colors: Dict[str, str]
+
+class CompactCalendar(BaseModel):
+    """?format=compact: bit i i booked/blocked/held[dag] gjelder timen hours[i]"""
+    start: str
+    days: int
+    hall_id: Optional[str] = None
+    hours: List[int]
+    booked: List[int]
+    blocked: List[int]
+    held: List[int] = []  # holdt av noen som holder på å booke
+    booking_ids: List[Tuple[int, int, str]]  # (dag, slot, booking-id)
+    reasons: List[Tuple[int, int, str]]  # (dag, slot, årsak) for blokkerte timer
+    colors: Dict[str, str]
+
 class PageContentCreate(BaseModel):
     page_name: str
     section_name: str
@@ -85,6 +227,7 @@ class PageContentRead(BaseModel):
     section_name: str
     content: str
     content_type: str
+    content_html: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     created_by: Optional[str] = None
@@ -92,6 +235,9 @@ class PageContentRead(BaseModel):
     class Config:
         from_attributes = True
 
+class PageContentList(BaseModel):
+    content: List[PageContentRead]
+
 class BlockedTimeCreate(BaseModel):
     block_type: str  # "day", "weekly", "hour"
     start_date: datetime
@@ -99,11 +245,13 @@ class BlockedTimeCreate(BaseModel):
     hour: Optional[int] = None  # Hour to block (0-23) for single hour blocks
     day_of_week: Optional[int] = None  # 0=Monday, 6=Sunday
     reason: Optional[str] = None
+    hall_id: Optional[str] = None  # None = alle haller
 
 class BlockedTimeUpdate(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     reason: Optional[str] = None
+    hall_id: Optional[str] = None
     is_active: Optional[bool] = None
 
 class BlockedTimeRead(BaseModel):
@@ -114,6 +262,7 @@ class BlockedTimeRead(BaseModel):
     hour: Optional[int] = None
     day_of_week: Optional[int] = None
     reason: Optional[str] = None
+    hall_id: Optional[str] = None
     is_active: bool
     created_at: datetime
     created_by: Optional[str] = None
@@ -121,6 +270,9 @@ class BlockedTimeRead(BaseModel):
     class Config:
         from_attributes = True
 
+class BlockedTimeList(BaseModel):
+    blocked_times: List[BlockedTimeRead]
+
 class NewsItemCreate(BaseModel):
     title: str
     content: str
@@ -145,6 +297,7 @@ class NewsItemRead(BaseModel):
     id: str
     title: str
     content: str
+    content_html: Optional[str] = None
     excerpt: Optional[str] = None
     item_type: str
     event_date: Optional[datetime] = None
@@ -158,6 +311,36 @@ class NewsItemRead(BaseModel):
     class Config:
         from_attributes = True
 
+class NewsItemSummary(BaseModel):
+    """Listevisning: alt unntatt content (hentes via /api/news/{id})"""
+    id: str
+    title: str
+    excerpt: Optional[str] = None
+    item_type: str
+    event_date: Optional[datetime] = None
+    published: bool
+    featured: bool
+    image_url: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class NewsItemPage(BaseModel):
+    items: List[NewsItemSummary]
+    next_cursor: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    kind: str  # "news" eller "page"
+    id: str
+    title: str
+    snippet: str  # HTML-escapet tekst med <mark> rundt treffene
+    url: str  # frontend-rute
+
+class SearchResults(BaseModel):
+    results: List[SearchResult]
+
 
 # --- Subscription / rettigheter ---
 class SubscriptionPlanRead(BaseModel):
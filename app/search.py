@@ -0,0 +1,171 @@
+"""
+Fulltekstsøk over nyheter og sideinnhold.
+
+Én søkeindeks-tabell `search_index` med ett dokument per publisert nyhet og ett per
+side (alle seksjoner slått sammen):
+
+- SQLite: FTS5-virtuell tabell, rangert med bm25() og snippet().
+- PostgreSQL: vanlig tabell med generert tsvector-kolonne (norsk stemming) og
+  GIN-indeks, rangert med ts_rank() og ts_headline().
+
+Indeksen holdes i synk av crud (`index_news_item`, `remove_news_item`,
+`index_page`) i samme transaksjon som endringen. Tabellen opprettes av migrasjon 9.
+"""
+
+import html
+import re
+from typing import List
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from . import models
+from .rendering import html_to_text
+
+# Markører rundt treff i snippets; byttes til <mark> etter at teksten er escapet
+_HIT_START, _HIT_END = "\x02", "\x03"
+_MAX_TERMS = 8
+
+# Seksjoner som brukes som tittel på et sidedokument, i prioritert rekkefølge
+_PAGE_TITLE_SECTIONS = ("pageTitle", "hero_title", "title")
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, title, body,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        kind VARCHAR(20) NOT NULL,
+        ref_id VARCHAR(255) NOT NULL,
+        title TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL DEFAULT '',
+        tsv tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('norwegian', title), 'A') ||
+            setweight(to_tsvector('norwegian', body), 'B')
+        ) STORED,
+        PRIMARY KEY (kind, ref_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_tsv ON search_index USING GIN (tsv)",
+]
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+async def create_search_index(conn: AsyncConnection):
+    for ddl in POSTGRES_DDL if _is_postgres(conn) else SQLITE_DDL:
+        await conn.execute(text(ddl))
+
+
+def page_url(page_name: str) -> str:
+    return "/" if page_name == "landing" else f"/{page_name}"
+
+
+# --- Vedlikehold (kalles fra crud før commit) ---
+
+async def _replace_document(db, kind: str, ref_id: str, title: str, body: str):
+    # FTS5 har ingen primærnøkkel på kind/ref_id, så vi sletter og setter inn på nytt.
+    # Det er en skanning ved skriving (sjelden), mens søk alltid går via indeksen.
+    await db.execute(text("DELETE FROM search_index WHERE kind = :kind AND ref_id = :ref_id"), {"kind": kind, "ref_id": ref_id})
+    if title or body:
+        await db.execute(
+            text("INSERT INTO search_index (kind, ref_id, title, body) VALUES (:kind, :ref_id, :title, :body)"),
+            {"kind": kind, "ref_id": ref_id, "title": title or "", "body": body or ""},
+        )
+
+
+async def index_news_item(db: AsyncSession, item: models.NewsItem):
+    """Indekser en nyhet; upubliserte fjernes fra indeksen."""
+    if not item.published:
+        await remove_news_item(db, item.id)
+        return
+    body = " ".join(filter(None, [item.excerpt, html_to_text(item.content_html or item.content)]))
+    await _replace_document(db, "news", item.id, item.title, body)
+
+
+async def remove_news_item(db: AsyncSession, item_id: str):
+    await _replace_document(db, "news", item_id, "", "")
+
+
+async def index_page(db: AsyncSession, page_name: str):
+    """Bygg sidedokumentet for `page_name` på nytt fra alle seksjonene."""
+    table = models.PageContent.__table__
+    rows = (await db.execute(select(table).where(table.c.page_name == page_name))).fetchall()
+    sections = {row.section_name: html_to_text(row.content_html or row.content) for row in rows}
+    title = next((sections[s] for s in _PAGE_TITLE_SECTIONS if sections.get(s)), page_name)
+    await _replace_document(db, "page", page_name, title, " ".join(sections.values()))
+
+
+async def rebuild_search_index(db):
+    """Fyll indeksen fra bunnen av (migrasjon / reparasjon). `db` kan være sesjon eller connection."""
+    await db.execute(text("DELETE FROM search_index"))
+    for item in (await db.execute(
+        select(models.NewsItem.__table__).where(models.NewsItem.published == True)
+    )).fetchall():
+        await index_news_item(db, item)
+    for (page_name,) in (await db.execute(select(models.PageContent.page_name).distinct())).fetchall():
+        await index_page(db, page_name)
+
+
+# --- Søk ---
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())[:_MAX_TERMS]
+
+
+def _highlight(snippet: str) -> str:
+    escaped = html.escape(snippet or "", quote=False)
+    return escaped.replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+
+
+async def search(db: AsyncSession, query: str, limit: int = 20) -> List[dict]:
+    """Rangerte treff med uthevede utdrag. Alle ord må finnes (prefiks-treff)."""
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if _is_postgres(db.bind):
+        sql = text("""
+            SELECT kind, ref_id, title,
+                   ts_headline('norwegian', body, q,
+                               'StartSel=' || :start || ', StopSel=' || :stop || ', MaxFragments=2, MaxWords=20, MinWords=5') AS snippet,
+                   ts_rank(tsv, q) AS rank
+            FROM search_index, to_tsquery('norwegian', :q) AS q
+            WHERE tsv @@ q
+            ORDER BY rank DESC
+            LIMIT :limit
+        """)
+        params = {"q": " & ".join(f"{t}:*" for t in terms)}
+    else:
+        # bm25-vekter per kolonne (kind, ref_id, title, body): tittel teller mest
+        sql = text("""
+            SELECT kind, ref_id, title,
+                   snippet(search_index, 3, :start, :stop, '…', 16) AS snippet,
+                   bm25(search_index, 0.0, 0.0, 5.0, 1.0) AS rank
+            FROM search_index
+            WHERE search_index MATCH :q
+            ORDER BY rank
+            LIMIT :limit
+        """)
+        params = {"q": " ".join(f'"{t}"*' for t in terms)}
+
+    params.update({"start": _HIT_START, "stop": _HIT_END, "limit": limit})
+    rows = (await db.execute(sql, params)).fetchall()
+    return [
+        {
+            "kind": kind,
+            "id": ref_id,
+            "title": title,
+            "snippet": _highlight(snippet),
+            "url": f"/nyheter/{ref_id}" if kind == "news" else page_url(ref_id),
+        }
+        for kind, ref_id, title, snippet, _rank in rows
+    ]
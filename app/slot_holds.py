@@ -0,0 +1,187 @@
+"""
+Midlertidig hold på en tid mens et medlem fyller ut bookingen.
+
+Velger et medlem en ledig time i kalenderen, holdes den i SLOT_HOLD_SECONDS
+(POST /bookings/hold). Andre ser timen som "held" og får ikke booke den før holdet
+er brukt opp, sluppet eller utløpt. create_booking bruker opp medlemmets eget hold.
+
+Holdene ligger i minnet med en heap sortert på utløpstid, så utløpte hold ryddes
+uten å gå gjennom alle. Med én worker (SQLite) er det nok. På PostgreSQL
+(SLOT_HOLDS_IN_DATABASE) speiles de i tabellen slot_holds, og sjekk og kalender
+leser derfra så alle workere ser hverandres hold. Oppretting skjer under
+booking_locks for hall-uken, samme lås som booking, så to hold kan ikke overlappe.
+"""
+
+import heapq
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from . import models
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SlotHold:
+    id: str
+    hall_id: str
+    user_id: str
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+
+class SlotHoldRegistry:
+    def __init__(self):
+        self._holds: Dict[str, SlotHold] = {}
+        self._by_hall: Dict[str, Set[str]] = {}
+        self._heap: List[Tuple[datetime, str]] = []  # (expires_at, id); sluppede hold hoppes over
+        self._shared = False
+
+    def detect(self, async_engine: AsyncEngine) -> bool:
+        """Speil i tabellen ved flere workere (PostgreSQL). Kalles ved oppstart."""
+        self._shared = settings.SLOT_HOLDS_IN_DATABASE and async_engine.dialect.name == "postgresql"
+        logger.info(f"⏳ Slot holds: {'memory + slot_holds table' if self._shared else 'memory'}")
+        return self._shared
+
+    # --- Minne ---
+
+    def _expire(self, now: datetime):
+        while self._heap and self._heap[0][0] <= now:
+            _, hold_id = heapq.heappop(self._heap)
+            hold = self._holds.get(hold_id)
+            if hold is not None and hold.expires_at <= now:
+                self._forget(hold_id)
+
+    def _forget(self, hold_id: str) -> Optional[SlotHold]:
+        hold = self._holds.pop(hold_id, None)
+        if hold is not None:
+            ids = self._by_hall.get(hold.hall_id)
+            if ids is not None:
+                ids.discard(hold_id)
+                if not ids:
+                    del self._by_hall[hold.hall_id]
+        return hold
+
+    def _remember(self, hold: SlotHold):
+        self._holds[hold.id] = hold
+        self._by_hall.setdefault(hold.hall_id, set()).add(hold.id)
+        heapq.heappush(self._heap, (hold.expires_at, hold.id))
+
+    # --- Oppslag ---
+
+    async def active(self, db: AsyncSession, hall_id: str, start_time: datetime, end_time: datetime) -> List[SlotHold]:
+        """Gyldige hold i hallen som overlapper [start_time, end_time)."""
+        now = datetime.now()
+        self._expire(now)
+        if self._shared:
+            table = models.SlotHold
+            result = await db.execute(
+                select(table).where(
+                    table.hall_id == hall_id,
+                    table.start_time < end_time,
+                    table.end_time > start_time,
+                    table.expires_at > now,
+                )
+            )
+            return [
+                SlotHold(row.id, row.hall_id, row.user_id, row.start_time, row.end_time, row.expires_at)
+                for row in result.scalars()
+            ]
+        return [
+            hold for hold in (self._holds[i] for i in self._by_hall.get(hall_id, ()))
+            if hold.start_time < end_time and hold.end_time > start_time
+        ]
+
+    async def ensure_not_held(self, db: AsyncSession, hall_id: str, start_time: datetime, end_time: datetime, user_id: str, status_code: int = 400):
+        """Avvis hvis noen andre holder tiden. Kalles under booking_locks."""
+        if any(hold.user_id != user_id for hold in await self.active(db, hall_id, start_time, end_time)):
+            raise HTTPException(
+                status_code=status_code, detail="Noen andre holder på å booke denne tiden. Prøv igjen om litt."
+            )
+
+    # --- Endringer ---
+
+    async def place(self, db: AsyncSession, user_id: str, hall_id: str, start_time: datetime, end_time: datetime) -> SlotHold:
+        """Hold tiden for medlemmet. Et medlem har ett hold om gangen; et nytt slipper det forrige."""
+        await self.ensure_not_held(db, hall_id, start_time, end_time, user_id, status_code=409)
+        # Samme transaksjon som det nye holdet, så advisory-låsen holdes til commit
+        await self._release_where(db, user_id, commit=False)
+
+        now = datetime.now()
+        hold = SlotHold(
+            id=str(uuid.uuid4()),
+            hall_id=hall_id,
+            user_id=user_id,
+            start_time=start_time,
+            end_time=end_time,
+            expires_at=now + timedelta(seconds=settings.SLOT_HOLD_SECONDS),
+        )
+        if self._shared:
+            await db.execute(delete(models.SlotHold).where(models.SlotHold.expires_at <= now))
+            db.add(models.SlotHold(
+                id=hold.id,
+                hall_id=hold.hall_id,
+                user_id=hold.user_id,
+                start_time=hold.start_time,
+                end_time=hold.end_time,
+                expires_at=hold.expires_at,
+                created_at=now,
+            ))
+            await db.commit()
+        self._remember(hold)
+        return hold
+
+    async def release(self, db: AsyncSession, hold_id: str, user_id: str) -> bool:
+        """Slipp et hold (medlemmet lukket dialogen). False hvis det ikke finnes eller er noen andres."""
+        return await self._release_where(db, user_id, hold_id=hold_id) > 0
+
+    async def consume(self, db: AsyncSession, user_id: str, hall_id: str, start_time: datetime, end_time: datetime) -> int:
+        """Bruk opp medlemmets hold som overlapper en booking som nettopp ble lagret."""
+        return await self._release_where(db, user_id, hall_id=hall_id, interval=(start_time, end_time))
+
+    async def _release_where(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        hold_id: Optional[str] = None,
+        hall_id: Optional[str] = None,
+        interval: Optional[Tuple[datetime, datetime]] = None,
+        commit: bool = True,
+    ) -> int:
+        matches = [
+            hold for hold in self._holds.values()
+            if hold.user_id == user_id
+            and (hold_id is None or hold.id == hold_id)
+            and (hall_id is None or hold.hall_id == hall_id)
+            and (interval is None or (hold.start_time < interval[1] and hold.end_time > interval[0]))
+        ]
+        for hold in matches:
+            self._forget(hold.id)
+        if not self._shared:
+            return len(matches)
+
+        # Holdet kan være laget av en annen worker
+        table = models.SlotHold
+        query = delete(table).where(table.user_id == user_id)
+        if hold_id is not None:
+            query = query.where(table.id == hold_id)
+        if hall_id is not None:
+            query = query.where(table.hall_id == hall_id)
+        if interval is not None:
+            query = query.where(table.start_time < interval[1], table.end_time > interval[0])
+        result = await db.execute(query)
+        if commit:
+            await db.commit()
+        return max(len(matches), result.rowcount or 0)
+
+
+slot_holds = SlotHoldRegistry()
@@ -0,0 +1,74 @@
+"""
+Servering av opplastede filer under /uploads.
+
+- Filer med innholdshash i navnet (se images.is_content_addressed) får
+  `Cache-Control: immutable` med ett års levetid og en ETag avledet av navnet, som
+  er lik på alle replikaer. Gjentatte besøk laster dem aldri ned på nytt.
+- Andre filer (eldre opplastinger med uuid-navn) caches i
+  UPLOAD_CACHE_MAX_AGE_SECONDS og revalideres med ETag / Last-Modified.
+- If-None-Match / If-Modified-Since gir 304, Range / If-Range håndteres av
+  Starlettes FileResponse, som også bruker `http.response.pathsend` (zero-copy)
+  når ASGI-serveren støtter det.
+- Med UPLOAD_ACCEL_REDIRECT_PREFIX satt svarer API-et bare med headere og
+  `X-Accel-Redirect`, og nginx sender selve filen med sendfile.
+"""
+
+import os
+from pathlib import Path
+from typing import Mapping, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .images import is_content_addressed
+from .settings import settings
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class _UploadFileResponse(FileResponse):
+    # Færre og større skriv enn standard 64 KB når serveren ikke støtter pathsend
+    chunk_size = 256 * 1024
+
+
+class UploadStaticFiles(StaticFiles):
+    def __init__(self, *, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.root = Path(directory).resolve()
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+        media_type: Optional[str] = None,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Response:
+        """Brukes både av mounten og av /uploads/images/{filnavn}-ruten i main."""
+        response = _UploadFileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, media_type=media_type, headers=headers
+        )
+        name = os.path.basename(full_path)
+        if is_content_addressed(name):
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["etag"] = f'"{name}"'
+        else:
+            response.headers["cache-control"] = f"public, max-age={settings.UPLOAD_CACHE_MAX_AGE_SECONDS}"
+
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        if settings.UPLOAD_ACCEL_REDIRECT_PREFIX and status_code == 200:
+            return self._accel_redirect(full_path, response)
+        return response
+
+    def _accel_redirect(self, full_path, response: Response) -> Response:
+        relative = Path(full_path).resolve().relative_to(self.root).as_posix()
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key not in ("content-length", "accept-ranges")
+        }
+        headers["x-accel-redirect"] = f"{settings.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return Response(status_code=200, headers=headers)
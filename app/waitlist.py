@@ -0,0 +1,238 @@
+"""
+Venteliste for opptatte tider.
+
+I stedet for å polle kalenderen kan et medlem stille seg i kø for en opptatt tid
+(POST /bookings/waitlist). Når en booking slettes, eller flyttes til en annen tid
+eller hall, kaller API-et promote() med intervallet som ble ledig:
+
+1. Én indeksert spørring (ix_waitlist_hall_status_time) henter ventende oppføringer
+   i samme hall som ligger helt innenfor intervallet, eldste først.
+2. Under booking_locks for hall-ukene og kandidatenes bruker-uker sjekkes hver
+   kandidat på nytt i køordning: blokkering, andres hold, overlapp og ukekvote.
+3. auto_book og innenfor kvoten: bookingen opprettes og medlemmet får e-post.
+   Uten auto_book får medlemmet en e-post om at tiden er ledig, og tiden går ikke
+   videre til senere i køen i samme runde. Over kvoten: står fortsatt i kø.
+
+Alt i én runde commites samlet, sammen med e-postene i utboksen.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import booking_locks, crud, models
+from .email_outbox import enqueue_email, outbox_worker
+from .emails import waitlist_email
+from .settings import settings
+from .slot_holds import slot_holds
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime, datetime]
+
+
+def _overlaps(a: Interval, b: Interval) -> bool:
+    return a[0] < b[1] and a[1] > b[0]
+
+
+# --- Medlem ---
+
+async def join(db: AsyncSession, user_id: str, hall: models.Hall, start_time: datetime, end_time: datetime, auto_book: bool) -> models.WaitlistEntry:
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="Sluttid må være etter starttid")
+    if start_time <= datetime.now():
+        raise HTTPException(status_code=400, detail="Tiden har allerede vært")
+
+    is_blocked, blocked_info = await crud.is_time_blocked(db, start_time, end_time, hall.id)
+    if is_blocked:
+        raise HTTPException(status_code=400, detail=blocked_info.reason or "Tiden er blokkert")
+    bookings = await crud.get_bookings_in_range(db, start_time, end_time, hall.id)
+    if not bookings:
+        raise HTTPException(status_code=400, detail="Tiden er ledig, book den direkte")
+    if any(b.created_by == user_id for b in bookings):
+        raise HTTPException(status_code=400, detail="Du har allerede booket denne tiden")
+
+    table = models.WaitlistEntry
+    waiting = (await db.execute(
+        select(table).where(table.user_id == user_id, table.status == "waiting", table.end_time > datetime.now())
+    )).scalars().all()
+    if any(e.hall_id == hall.id and e.start_time == start_time and e.end_time == end_time for e in waiting):
+        raise HTTPException(status_code=400, detail="Du står allerede på ventelisten for denne tiden")
+    if len(waiting) >= settings.WAITLIST_MAX_PER_USER:
+        raise HTTPException(status_code=400, detail=f"Du kan stå på venteliste for maks {settings.WAITLIST_MAX_PER_USER} tider")
+
+    entry = models.WaitlistEntry(
+        id=str(uuid.uuid4()),
+        hall_id=hall.id,
+        user_id=user_id,
+        start_time=start_time,
+        end_time=end_time,
+        auto_book=auto_book,
+        status="waiting",
+        created_at=datetime.now(),
+    )
+    db.add(entry)
+    await db.commit()
+    return entry
+
+
+async def entries_for_user(db: AsyncSession, user_id: str) -> List[models.WaitlistEntry]:
+    """Medlemmets oppføringer for kommende tider, unntatt de som er trukket."""
+    table = models.WaitlistEntry
+    result = await db.execute(
+        select(table)
+        .where(table.user_id == user_id, table.status != "cancelled", table.end_time > datetime.now())
+        .order_by(table.start_time)
+    )
+    return result.scalars().all()
+
+
+async def positions(db: AsyncSession, entries: Sequence[models.WaitlistEntry]) -> Dict[str, int]:
+    """Plass i køen (1 = først) for ventende oppføringer: eldre ventende med overlappende tid i samme hall + 1."""
+    table = models.WaitlistEntry
+    out: Dict[str, int] = {}
+    for entry in entries:
+        if entry.status != "waiting":
+            continue
+        ahead = await db.execute(
+            select(func.count()).select_from(table).where(
+                table.hall_id == entry.hall_id,
+                table.status == "waiting",
+                table.start_time < entry.end_time,
+                table.end_time > entry.start_time,
+                table.created_at < entry.created_at,
+            )
+        )
+        out[entry.id] = (ahead.scalar() or 0) + 1
+    return out
+
+
+async def cancel(db: AsyncSession, entry_id: str, user_id: str, is_admin: bool = False) -> Optional[models.WaitlistEntry]:
+    entry = await db.get(models.WaitlistEntry, entry_id)
+    if entry is None or (entry.user_id != user_id and not is_admin):
+        return None
+    if entry.status == "waiting":
+        entry.status = "cancelled"
+        entry.resolved_at = datetime.now()
+        await db.commit()
+    return entry
+
+
+# --- Opprykk ---
+
+async def _candidates(db: AsyncSession, hall_id: str, start_time: datetime, end_time: datetime) -> List[models.WaitlistEntry]:
+    table = models.WaitlistEntry
+    result = await db.execute(
+        select(table)
+        .where(
+            table.hall_id == hall_id,
+            table.status == "waiting",
+            table.start_time >= max(start_time, datetime.now()),
+            table.start_time < end_time,
+            table.end_time <= end_time,
+        )
+        .order_by(table.created_at, table.id)
+        .limit(settings.WAITLIST_PROMOTION_BATCH)
+    )
+    return result.scalars().all()
+
+
+async def _is_free(db: AsyncSession, entry: models.WaitlistEntry) -> bool:
+    is_blocked, _ = await crud.is_time_blocked(db, entry.start_time, entry.end_time, entry.hall_id)
+    if is_blocked:
+        return False
+    holds = await slot_holds.active(db, entry.hall_id, entry.start_time, entry.end_time)
+    if any(hold.user_id != entry.user_id for hold in holds):
+        return False
+    return not await crud.get_bookings_in_range(db, entry.start_time, entry.end_time, entry.hall_id)
+
+
+async def _promote(db: AsyncSession, hall_id: str, start_time: datetime, end_time: datetime) -> int:
+    candidates = await _candidates(db, hall_id, start_time, end_time)
+    if not candidates:
+        return 0
+
+    keys = booking_locks.hall_keys(hall_id, start_time, end_time)
+    for entry in candidates:
+        keys |= booking_locks.user_keys(entry.user_id, entry.start_time, entry.end_time)
+
+    hall = await db.get(models.Hall, hall_id)
+    hall_name = hall.name if hall is not None else hall_id
+    claimed: List[Interval] = []
+    emails = []
+    async with booking_locks.booking_writes.hold(db, keys):
+        for entry in candidates:
+            await db.refresh(entry)
+            interval = (entry.start_time, entry.end_time)
+            if entry.status != "waiting" or any(_overlaps(interval, c) for c in claimed):
+                continue
+            if not await _is_free(db, entry):
+                continue
+            user = await crud.get_user_by_id(db, entry.user_id)
+            if user is None or not user.is_active:
+                entry.status, entry.resolved_at = "cancelled", datetime.now()
+                continue
+
+            booked = False
+            if entry.auto_book:
+                if not user.is_superuser and await crud.booking_quota_error(db, entry.user_id, *interval):
+                    # Over kvoten: blir stående i kø, neste kandidat prøves
+                    continue
+                booking = models.Booking(
+                    id=str(uuid.uuid4()),
+                    hall_id=hall_id,
+                    hall=hall_name,
+                    start_time=entry.start_time,
+                    end_time=entry.end_time,
+                    created_by=entry.user_id,
+                )
+                db.add(booking)
+                await db.flush()
+                entry.booking_id = booking.id
+                booked = True
+
+            entry.status = "booked" if booked else "notified"
+            entry.resolved_at = datetime.now()
+            claimed.append(interval)
+            emails.append(waitlist_email(
+                user_email=user.email,
+                user_name=user.full_name or "Bruker",
+                hall_name=hall_name,
+                start_time=entry.start_time,
+                end_time=entry.end_time,
+                booked=booked,
+            ))
+
+        for msg in emails:
+            await enqueue_email(db, msg, commit=False)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Noen skrev utenom låsene (f.eks. EXCLUDE-constrainten slo til): ingen opprykk denne gangen
+            await db.rollback()
+            logger.warning(f"⚠️ Waitlist promotion for {hall_id} {start_time}–{end_time} conflicted, skipped")
+            return 0
+
+    if emails:
+        outbox_worker.notify()
+    logger.info(f"⏫ Waitlist: {len(claimed)} promoted for {hall_id} {start_time:%Y-%m-%d %H:%M}–{end_time:%H:%M}")
+    return len(claimed)
+
+
+async def promote(db: AsyncSession, hall_id: str, start_time: datetime, end_time: datetime) -> int:
+    """
+    Gi [start_time, end_time) i hallen til ventelisten. Kalles etter at en booking er
+    slettet eller flyttet; feil logges og stopper ikke forespørselen som frigjorde tiden.
+    """
+    try:
+        return await _promote(db, hall_id, start_time, end_time)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"❌ Waitlist promotion failed for {hall_id} {start_time}–{end_time}: {e}")
+        return 0
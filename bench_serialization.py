@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for JSON-serialisering av store lister.
+
+Sammenligner det gamle løpet (endepunkt uten response_model: jsonable_encoder på
+SQLAlchemy-objekter + json.dumps) med det nye (response_model med from_attributes,
+som FastAPI serialiserer rett til bytes i Pydantic). Er orjson installert, måles
+også orjson på ferdig dumpede dicts til sammenligning.
+
+Ingen database trengs; objektene lages i minnet.
+
+Usage:
+    python bench_serialization.py
+    python bench_serialization.py --items 5000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app import models, schemas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_news_items(n: int):
+    now = datetime.now()
+    body = "<p>" + "Valpekurs med fokus på hverdagslydighet og miljøtrening. " * 30 + "</p>"
+    return [
+        models.NewsItem(
+            id=f"news-{i}", title=f"Kurs {i}", content=body, content_html=body, excerpt="Kort utdrag",
+            item_type="kurs", event_date=now + timedelta(days=i), published=True, featured=i % 10 == 0,
+            image_url=f"/uploads/images/{i:064x}.jpg", created_at=now, updated_at=now, created_by="admin",
+        )
+        for i in range(n)
+    ]
+
+
+def make_blocked_times(n: int):
+    now = datetime.now()
+    return [
+        models.BlockedTime(
+            id=f"block-{i}", block_type="hour", start_date=now, end_date=now + timedelta(days=30),
+            hour=17 + i % 7, day_of_week=None, reason="Stengt", hall_id=None, is_active=True, created_at=now, created_by="admin",
+        )
+        for i in range(n)
+    ]
+
+
+def make_calendar_days(n: int):
+    start = datetime(2030, 1, 1)
+    days = []
+    for d in range(n):
+        day = start + timedelta(days=d)
+        slots = [
+            {
+                "hour": h,
+                "start_time": day.replace(hour=h),
+                "end_time": day.replace(hour=h) + timedelta(hours=1),
+                "booking_ids": [f"booking-{d}-{h}"] if h % 2 else [],
+                "status": "booked" if h % 2 else "empty",
+                "color": "#D88A44" if h % 2 else "#F2F2F2",
+            }
+            for h in range(17, 24)
+        ]
+        days.append({"date": day.date().isoformat(), "slots": slots, "colors": {"empty": "#F2F2F2"}})
+    return days
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench(label: str, objects, model, repeat: int, exclude_none: bool = False):
+    adapter = TypeAdapter(List[model])
+
+    old = lambda: json.dumps(jsonable_encoder(objects)).encode()
+    new = lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes=True), exclude_none=exclude_none)
+
+    # Samme JSON ut (bortsett fra rekkefølge/mellomrom)
+    assert json.loads(old()) == json.loads(new()), f"{label}: output differs"
+
+    t_old = best_of(repeat, old)
+    t_new = best_of(repeat, new)
+    print(f"{label:<28} {len(new()) / 1024:>8.0f} KB   jsonable_encoder {t_old * 1000:>8.1f} ms"
+          f"   response_model {t_new * 1000:>7.1f} ms   {t_old / t_new:>5.1f}x")
+    if orjson is not None:
+        dumped = lambda: orjson.dumps(adapter.dump_python(
+            adapter.validate_python(objects, from_attributes=True), mode="json", exclude_none=exclude_none
+        ))
+        print(f"{'':<28} {'':>8}      orjson (dicts)   {best_of(repeat, dumped) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000, help="antall rader per liste (default 2000)")
+    parser.add_argument("--repeat", type=int, default=5, help="beste av N kjøringer (default 5)")
+    args = parser.parse_args()
+
+    print(f"Serializing {args.items} items, best of {args.repeat}\n")
+    bench("news items (NewsItemRead)", make_news_items(args.items), schemas.NewsItemRead, args.repeat)
+    bench("blocked times", make_blocked_times(args.items), schemas.BlockedTimeRead, args.repeat)
+    bench("calendar days (7 slots)", make_calendar_days(args.items), schemas.CalendarDay, args.repeat, exclude_none=True)
@@ -24,6 +24,7 @@ export default function Account() {
   const [changingPassword, setChangingPassword] = useState(false);
   const [passwordError, setPasswordError] = useState(null);
   const [passwordSuccess, setPasswordSuccess] = useState(false);
+  const [calendarUrl, setCalendarUrl] = useState("");
 
   useEffect(() => {
     async function load() {
@@ -49,6 +50,19 @@ export default function Account() {
     load();
   }, []);
 
+  useEffect(() => {
+    apiFetch(`${API}/users/me/calendar-feed`)
+      .then(res => (res.ok ? res.json() : null))
+      .then(data => { if (data) setCalendarUrl(`${API}${data.url}`); })
+      .catch(err => console.error("Could not load calendar feed:", err));
+  }, []);
+
+  async function resetCalendarUrl() {
+    if (!window.confirm("Lag ny lenke? Den gamle slutter å virke i kalendere som abonnerer på den.")) return;
+    const res = await apiFetch(`${API}/users/me/calendar-feed/reset`, { method: "POST" });
+    if (res.ok) setCalendarUrl(`${API}${(await res.json()).url}`);
+  }
+
   async function save() {
     setSaving(true);
     setError(null);
@@ -228,6 +242,35 @@ export default function Account() {
               </div>
             </section>
 
+            {/* Calendar Feed Section */}
+            <section className="account-section">
+              <div className="section-header">
+                <h2 className="section-title">
+                  <span className="section-icon">📅</span>
+                  Kalenderabonnement
+                </h2>
+                <p className="section-description">
+                  Legg inn lenken som abonnement i kalenderen på mobilen (Google, Apple, Outlook), så dukker bookingene dine opp automatisk
+                </p>
+              </div>
+
+              {calendarUrl && (
+                <div className="form-group">
+                  <input className="form-input" type="text" value={calendarUrl} readOnly onFocus={(e) => e.target.select()} />
+                  <div style={{ display: "flex", gap: "10px", marginTop: "10px" }}>
+                    <button className="btn btn-outline" onClick={() => navigator.clipboard.writeText(calendarUrl)}>
+                      <span className="btn-icon">📋</span>
+                      Kopier lenke
+                    </button>
+                    <button className="btn btn-outline" onClick={resetCalendarUrl}>
+                      <span className="btn-icon">🔄</span>
+                      Lag ny lenke
+                    </button>
+                  </div>
+                </div>
+              )}
+            </section>
+
             {/* Change Password Section */}
             <section className="account-section">
               <div className="section-header">
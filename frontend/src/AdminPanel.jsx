@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { apiFetch } from "./api";
+import { apiFetch, apiFetchIdempotent } from "./api";
+import { invalidatePageContent } from "./hooks/usePageContent";
 
 const API = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 const fetch = apiFetch;
@@ -27,8 +28,9 @@ function AdminPanel() {
     status: ''
   });
   const [editingBooking, setEditingBooking] = useState(null);
+  const [halls, setHalls] = useState([]);
   const [bookingEditForm, setBookingEditForm] = useState({
-    hall: '',
+    hall_id: '',
     start_time: '',
     end_time: ''
   });
@@ -71,8 +73,10 @@ function AdminPanel() {
       fetchPageContent();
     } else if (activeTab === 'blocking') {
       fetchBlockedTimes();
+      fetchHalls();
     } else if (activeTab === 'bookings') {
       fetchBookings();
+      fetchHalls();
     } else if (activeTab === 'users') {
       fetchUsers();
       fetchSubscriptionPlans();
@@ -123,6 +127,7 @@ function AdminPanel() {
         throw new Error('Kunne ikke lagre endringer');
       }
       
+      invalidatePageContent();
       await fetchPageContent();
       setEditingContent(null);
       setSelectedPage('');
@@ -154,6 +159,7 @@ function AdminPanel() {
         throw new Error('Kunne ikke opprette innhold');
       }
       
+      invalidatePageContent(pageName);
       await fetchPageContent();
     } catch (err) {
       setError(err.message);
@@ -185,7 +191,22 @@ function AdminPanel() {
     }
   };
 
-  const createBlockedTime = async (blockType, startDate, endDate, hour, dayOfWeek, reason) => {
+  const fetchHalls = async () => {
+    try {
+      const response = await fetch(`${API}/api/admin/halls`, {
+        headers: {
+          'Content-Type': 'application/json'
+        }
+      });
+      if (!response.ok) return;
+      const data = await response.json();
+      setHalls(data.halls || []);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  const createBlockedTime = async (blockType, startDate, endDate, hour, dayOfWeek, reason, hallId) => {
     setLoading(true);
     setError(null);
     try {
@@ -200,7 +221,8 @@ function AdminPanel() {
           end_date: endDate,
           hour: hour,
           day_of_week: dayOfWeek,
-          reason: reason
+          reason: reason,
+          hall_id: hallId || null
         })
       });
       
@@ -363,18 +385,27 @@ function AdminPanel() {
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API}/api/news`, {
-        headers: {
-          'Content-Type': 'application/json'
+      // API-et er paginert; adminlisten trenger alle elementene
+      const allItems = [];
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ limit: '100' });
+        if (cursor) params.append('cursor', cursor);
+        const response = await fetch(`${API}/api/news?${params.toString()}`, {
+          headers: {
+            'Content-Type': 'application/json'
+          }
+        });
+        
+        if (!response.ok) {
+          throw new Error('Kunne ikke hente kurs og nyheter');
         }
-      });
-      
-      if (!response.ok) {
-        throw new Error('Kunne ikke hente kurs og nyheter');
-      }
-      
-      const data = await response.json();
-      setNewsItems(data.items || []);
+        
+        const data = await response.json();
+        allItems.push(...(data.items || []));
+        cursor = data.next_cursor;
+      } while (cursor);
+      setNewsItems(allItems);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -501,7 +532,19 @@ function AdminPanel() {
     }
   };
 
-  const editNewsItem = (item) => {
+  const editNewsItem = async (summary) => {
+    // Listen inneholder bare sammendrag; hent fullt innhold før redigering
+    let item = summary;
+    try {
+      const response = await fetch(`${API}/api/news/${summary.id}`);
+      if (!response.ok) {
+        throw new Error('Kunne ikke hente innholdet');
+      }
+      item = await response.json();
+    } catch (err) {
+      setError(err.message);
+      return;
+    }
     setEditingNewsItem(item);
     setNewsItemForm({
       title: item.title || '',
@@ -518,7 +561,7 @@ function AdminPanel() {
   const editBooking = async (booking) => {
     setEditingBooking(booking);
     setBookingEditForm({
-      hall: booking.hall || '',
+      hall_id: booking.hall_id || '',
       start_time: booking.start_time ? new Date(booking.start_time).toISOString().slice(0, 16) : '',
       end_time: booking.end_time ? new Date(booking.end_time).toISOString().slice(0, 16) : ''
     });
@@ -536,7 +579,7 @@ function AdminPanel() {
           'Content-Type': 'application/json'
         },
         body: JSON.stringify({
-          hall: bookingEditForm.hall,
+          hall_id: bookingEditForm.hall_id || null,
           start_time: bookingEditForm.start_time,
           end_time: bookingEditForm.end_time
         })
@@ -550,7 +593,7 @@ function AdminPanel() {
       // Refresh bookings
       await fetchBookings();
       setEditingBooking(null);
-      setBookingEditForm({ hall: '', start_time: '', end_time: '' });
+      setBookingEditForm({ hall_id: '', start_time: '', end_time: '' });
     } catch (err) {
       setError(err.message);
     } finally {
@@ -560,7 +603,7 @@ function AdminPanel() {
 
   const cancelBookingEdit = () => {
     setEditingBooking(null);
-    setBookingEditForm({ hall: '', start_time: '', end_time: '' });
+    setBookingEditForm({ hall_id: '', start_time: '', end_time: '' });
   };
 
   const deleteBooking = async (bookingId) => {
@@ -1031,7 +1074,8 @@ function AdminPanel() {
                   formData.get('endDate'),
                   formData.get('hour') ? parseInt(formData.get('hour')) : null,
                   formData.get('dayOfWeek') ? parseInt(formData.get('dayOfWeek')) : null,
-                  formData.get('reason')
+                  formData.get('reason'),
+                  formData.get('hallId')
                 );
               }}>
                 <div className="form-group">
@@ -1127,6 +1171,18 @@ function AdminPanel() {
                   </select>
                 </div>
                 
+                {halls.length > 1 && (
+                  <div className="form-group">
+                    <label>Hall:</label>
+                    <select name="hallId">
+                      <option value="">Alle haller</option>
+                      {halls.map(h => (
+                        <option key={h.id} value={h.id}>{h.name}</option>
+                      ))}
+                    </select>
+                  </div>
+                )}
+
                 <div className="form-group">
                   <label>Årsak (valgfritt):</label>
                   <input type="text" name="reason" placeholder="f.eks. Ferie, vedlikehold" />
@@ -1161,6 +1217,11 @@ function AdminPanel() {
                       {['Mandag', 'Tirsdag', 'Onsdag', 'Torsdag', 'Fredag', 'Lørdag', 'Søndag'][blocked.day_of_week]}
                     </div>
                   )}
+                  {blocked.hall_id && (
+                    <div className="blocked-time-hall">
+                      {(halls.find(h => h.id === blocked.hall_id) || {}).name || blocked.hall_id}
+                    </div>
+                  )}
                   {blocked.reason && (
                     <div className="blocked-time-reason">
                       {blocked.reason}
@@ -1585,13 +1646,13 @@ function AdminPanel() {
               <div className="form-group">
                 <label>Hall:</label>
                 <select
-                  value={bookingEditForm.hall}
-                  onChange={(e) => setBookingEditForm({...bookingEditForm, hall: e.target.value})}
+                  value={bookingEditForm.hall_id}
+                  onChange={(e) => setBookingEditForm({...bookingEditForm, hall_id: e.target.value})}
                 >
                   <option value="">Velg hall</option>
-                  <option value="Hovedhall">Hovedhall</option>
-                  <option value="Sidehall">Sidehall</option>
-                  <option value="Utendørs">Utendørs</option>
+                  {halls.filter(h => h.is_active || h.id === bookingEditForm.hall_id).map(h => (
+                    <option key={h.id} value={h.id}>{h.name}</option>
+                  ))}
                 </select>
               </div>
               <div className="form-group">
@@ -1905,7 +1966,7 @@ function AdminPanel() {
                 setLoading(true);
                 setError(null);
                 try {
-                  const response = await fetch(`${API}/api/admin/users`, {
+                  const response = await apiFetchIdempotent(`${API}/api/admin/users`, {
                     method: 'POST',
                     headers: {
                       'Content-Type': 'application/json'
@@ -18,6 +18,7 @@ import NyhetDetail from "./NyhetDetail";
 import CookieConsent from "./components/CookieConsent";
 import PrivacyConsentDialog from "./components/PrivacyConsentDialog";
 import Personvern from "./Personvern";
+import Sok from "./Sok";
 import "./styles/global.css";
 import "./components/NavBar.css";
 import "./components/Home.css";
@@ -25,6 +26,7 @@ import "./components/Bookings.css";
 import "./components/LandingPage.css";
 import "./components/Pages.css";
 import { useInactivityLogout } from "./hooks/useInactivityLogout";
+import { prefetchPageContent } from "./hooks/usePageContent";
 import { apiFetch, setAccessToken, clearAccessToken } from "./api";
 
 const API = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
@@ -38,6 +40,11 @@ function App() {
   const [privacyAccepted, setPrivacyAccepted] = useState(true); // Default to true to avoid showing dialog if not logged in
   const [showPrivacyDialog, setShowPrivacyDialog] = useState(false);
 
+  useEffect(() => {
+    // Hent CMS-tekst for de offentlige sidene i én forespørsel
+    prefetchPageContent(["landing", "om-oss", "instruktorer", "kontakt", "nyheter", "personvern"]).catch(() => {});
+  }, []);
+
   useEffect(() => {
     // Verifiser innloggingsstatus via cookie
     apiFetch(`${API}/users/me`)
@@ -181,6 +188,7 @@ function App() {
           <Route path="/nyheter" element={<Nyheter />} />
           <Route path="/nyheter/:id" element={<NyhetDetail />} />
           <Route path="/personvern" element={<Personvern />} />
+          <Route path="/sok" element={<Sok />} />
           <Route path="/admin" element={isLoggedIn && isAdmin ? <AdminPanel /> : <Navigate to="/" replace />} />
           <Route path="/account" element={isLoggedIn ? <Account /> : <Navigate to="/login" replace />} />
         </Routes>
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
 import { createPortal } from "react-dom";
-import { apiFetch } from "./api";
+import { apiFetch, apiFetchIdempotent } from "./api";
 
 const API = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
@@ -10,6 +10,26 @@ function pad(num) {
 function isoDate(d) {
   return d.toISOString().slice(0, 10);
 }
+// ?format=compact: én bitmaske per dag (bit i = hours[i]) + sparse booking-id-er og årsaker. held = noen holder på å booke
+function expandCompactCalendar(data) {
+  const bookingIds = {};
+  for (const [d, i, id] of data.booking_ids) {
+    (bookingIds[`${d}:${i}`] = bookingIds[`${d}:${i}`] || []).push(id);
+  }
+  const reasons = {};
+  for (const [d, i, reason] of data.reasons) reasons[`${d}:${i}`] = reason;
+  return data.booked.map((booked, d) => data.hours.map((hour, i) => {
+    const key = `${d}:${i}`;
+    const slot = { hour, booking_ids: bookingIds[key] || [], status: "empty" };
+    if (((data.held || [])[d] >> i) & 1) slot.status = "held";
+    if ((booked >> i) & 1) slot.status = "booked";
+    if ((data.blocked[d] >> i) & 1) {
+      slot.status = "blocked";
+      slot.reason = reasons[key];
+    }
+    return slot;
+  }));
+}
 function startOfWeek(date) {
   const d = new Date(date);
   const day = d.getDay(); // 0=Sunday, 1=Monday, ..., 6=Saturday
@@ -57,9 +77,12 @@ export default function Bookings({ isAdmin }) {
   const [colors, setColors] = useState({});
   const [loading, setLoading] = useState(false);
   const [selected, setSelected] = useState(null); // {date, hour}
-  const [hall, setHall] = useState("Hovedsal");
+  const [halls, setHalls] = useState([]);
+  const [hallId, setHallId] = useState(""); // "" = første aktive hall
   const [error, setError] = useState("");
   const [creating, setCreating] = useState(false);
+  const [notice, setNotice] = useState("");
+  const [hold, setHold] = useState(null); // {id, date, hour, expires_at} for valgt ledig time
   const [openDay, setOpenDay] = useState(null); // date string shown in top-left panel
   const [showWeekSelector, setShowWeekSelector] = useState(false);
   const [dropdownPosition, setDropdownPosition] = useState({ top: 0, left: 0 });
@@ -69,7 +92,8 @@ export default function Bookings({ isAdmin }) {
     return localStorage.getItem('bookingPanelPosition') || 'bottom';
   });
 
-  useEffect(() => { fetchWeek(); /* eslint-disable-next-line */ }, [weekStart]);
+  useEffect(() => { fetchHalls(); }, []);
+  useEffect(() => { fetchWeek(); /* eslint-disable-next-line */ }, [weekStart, hallId]);
 
   // Close dropdown when clicking outside
   useEffect(() => {
@@ -87,31 +111,32 @@ export default function Bookings({ isAdmin }) {
 
   // No need for scroll logic since current week is now first in the list
 
-  async function fetchDay(dateStr) {
-    const res = await apiFetch(`${API}/bookings/${dateStr}`);
-    if (!res.ok) throw new Error(`Kunne ikke hente ${dateStr}`);
-    return res.json();
+  async function fetchHalls() {
+    try {
+      const res = await fetch(`${API}/api/halls`);
+      if (!res.ok) return;
+      const data = await res.json();
+      setHalls(data.halls || []);
+    } catch (err) { console.error(err); }
   }
 
   async function fetchWeek() {
     setLoading(true); setError("");
     try {
-      const promises = []; const daysArr = [];
-      for (let i = 0; i < 7; i++) {
+      // Hele uken i én forespørsel, for valgt hall
+      const base = hallId ? `${API}/halls/${encodeURIComponent(hallId)}/bookings` : `${API}/bookings`;
+      const res = await apiFetch(`${base}?start=${isoDate(weekStart)}&days=7&format=compact`);
+      if (!res.ok) throw new Error("Kunne ikke hente uken");
+      const data = await res.json();
+      const weekSlots = expandCompactCalendar(data);
+      const combined = weekSlots.map((slots, idx) => {
         const d = new Date(weekStart);
-        d.setDate(d.getDate() + i);
-        const dateStr = isoDate(d);
-        promises.push(fetchDay(dateStr));
-        daysArr.push({ date: dateStr, dateObj: d });
-      }
-      const results = await Promise.all(promises);
-      const combined = daysArr.map((day, idx) => ({
-        date: day.date,
-        dateObj: day.dateObj,
-        slots: results[idx].slots || [],
-      }));
+        d.setDate(d.getDate() + idx);
+        return { date: isoDate(d), dateObj: d, slots };
+      });
       setDays(combined);
-      if (results[0] && results[0].colors) setColors(results[0].colors);
+      if (data.colors) setColors(data.colors);
+      if (!hallId && data.hall_id) setHallId(data.hall_id);
     } catch (err) {
       console.error(err); setError(err.message || "Feil ved henting");
     } finally { setLoading(false); }
@@ -127,10 +152,41 @@ export default function Bookings({ isAdmin }) {
   function onDayHeaderClick(date) {
     setOpenDay(openDay === date ? null : date);
     setSelected(null);
+    releaseHold();
   }
 
   function onSlotClick(slot, day) {
+    setNotice("");
     setSelected({ date: day.date, hour: slot.hour, slot });
+    if (slot.status === "empty" && !isSlotInPast(day.date, slot.hour)) placeHold(day.date, slot.hour);
+    else releaseHold();
+  }
+
+  // Hold valgt ledig time et par minutter, så ingen andre booker den mens vi fyller ut
+  async function placeHold(date, hour) {
+    const start = new Date(`${date}T${pad(hour)}:00:00`).toISOString();
+    const endDate = new Date(start); endDate.setHours(endDate.getHours() + 1);
+    try {
+      const res = await apiFetch(`${API}/bookings/hold`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ hall_id: hallId || undefined, start_time: start, end_time: endDate.toISOString() }),
+      });
+      let data = null; try { data = await res.json(); } catch {}
+      if (!res.ok) {
+        setHold(null);
+        if (res.status === 409) { setError(data && data.detail ? data.detail : "Noen andre holder på å booke denne tiden"); fetchWeek(); }
+        return;
+      }
+      setHold({ id: data.id, date, hour, expires_at: data.expires_at });
+    } catch (err) { console.error(err); }
+  }
+
+  function releaseHold() {
+    if (!hold) return;
+    const id = hold.id;
+    setHold(null);
+    apiFetch(`${API}/bookings/hold/${id}`, { method: "DELETE" }).catch(() => {});
   }
 
   function generateWeekOptions() {
@@ -200,9 +256,9 @@ export default function Bookings({ isAdmin }) {
     setCreating(true); setError("");
     const start = new Date(`${selected.date}T${pad(selected.hour)}:00:00`).toISOString();
     const endDate = new Date(start); endDate.setHours(endDate.getHours() + 1);
-    const body = { hall: hall || "Hovedsal", start_time: start, end_time: endDate.toISOString() };
+    const body = { hall_id: hallId || undefined, start_time: start, end_time: endDate.toISOString() };
     try {
-      const res = await apiFetch(`${API}/bookings`, {
+      const res = await apiFetchIdempotent(`${API}/bookings`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body),
@@ -211,12 +267,36 @@ export default function Bookings({ isAdmin }) {
         let data = null; try { data = await res.json(); } catch {}
         throw new Error((data && data.detail) ? JSON.stringify(data.detail) : res.statusText);
       }
+      setHold(null); // brukt opp av bookingen
       await fetchWeek(); setSelected(null);
     } catch (err) {
       console.error(err); setError(err.message || "Kunne ikke opprette booking");
     } finally { setCreating(false); }
   }
 
+  // Opptatt tid: stå i kø, og få tiden automatisk hvis den blir ledig (innenfor ukekvoten)
+  async function joinWaitlist() {
+    if (!selected) return;
+    setCreating(true); setError(""); setNotice("");
+    const start = new Date(`${selected.date}T${pad(selected.hour)}:00:00`).toISOString();
+    const endDate = new Date(start); endDate.setHours(endDate.getHours() + 1);
+    const body = { hall_id: hallId || undefined, start_time: start, end_time: endDate.toISOString(), auto_book: true };
+    try {
+      const res = await apiFetch(`${API}/bookings/waitlist`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(body),
+      });
+      let data = null; try { data = await res.json(); } catch {}
+      if (!res.ok) {
+        throw new Error((data && data.detail) ? JSON.stringify(data.detail) : res.statusText);
+      }
+      setNotice(`Du står som nr. ${data.position} på ventelisten. Blir tiden ledig, booker vi den for deg og sender e-post.`);
+    } catch (err) {
+      console.error(err); setError(err.message || "Kunne ikke sette deg på ventelisten");
+    } finally { setCreating(false); }
+  }
+
   async function deleteBooking(bookingId) {
     if (!isAdmin) { setError("Kun admin kan slette bookings"); return; }
     if (!confirm("Slett denne bookingen?")) return;
@@ -359,7 +439,20 @@ export default function Bookings({ isAdmin }) {
         </div>
 
         <div className="week-info">
-          <h2>Treningshall</h2>
+          {halls.length > 1 ? (
+            <select
+              value={hallId}
+              onChange={(e) => { setHallId(e.target.value); setSelected(null); releaseHold(); }}
+              className="form-input"
+              aria-label="Velg hall"
+            >
+              {halls.map(h => (
+                <option key={h.id} value={h.id}>{h.name}</option>
+              ))}
+            </select>
+          ) : (
+            <h2>{halls.length === 1 ? halls[0].name : "Treningshall"}</h2>
+          )}
           <p className="week-range">{isoDate(weekStart)} — {isoDate(weekEnd)}</p>
         </div>
       </div>
@@ -386,6 +479,9 @@ export default function Bookings({ isAdmin }) {
                   <div className="time-info">
                     <div className="time-date">{new Date(selected.date).toLocaleDateString(undefined, { weekday: "long", day: "numeric", month: "long" })}</div>
                     <div className="time-range">{pad(selected.hour)}:00 — {pad((selected.hour+1)%24)}:00</div>
+                  {hold && hold.date === selected.date && hold.hour === selected.hour && (
+                    <div className="time-hold">Holdt for deg til {new Date(hold.expires_at).toLocaleTimeString(undefined, { hour: "2-digit", minute: "2-digit" })}</div>
+                  )}
                   </div>
                 </div>
               ) : (
@@ -395,18 +491,6 @@ export default function Bookings({ isAdmin }) {
               )}
             </div>
 
-            {selected && (
-              <div className="panel-section">
-                <label className="form-label">Treningshall</label>
-                <input 
-                  value={hall} 
-                  onChange={(e)=>setHall(e.target.value)} 
-                  className="form-input"
-                  placeholder="F.eks. Hovedhallen"
-                />
-              </div>
-            )}
-
             {selected && selected.slot && selected.slot.booking_ids && selected.slot.booking_ids.length > 0 ? (
               <div className="panel-section">
                 <h4>Eksisterende bookinger</h4>
@@ -428,6 +512,15 @@ export default function Bookings({ isAdmin }) {
                     </div>
                   ))}
                 </div>
+                {!isSlotInPast(selected.date, selected.hour) && (
+                  <button
+                    className="book-btn"
+                    onClick={joinWaitlist}
+                    disabled={creating}
+                  >
+                    {creating ? "Legger til..." : "Sett meg på venteliste"}
+                  </button>
+                )}
               </div>
             ) : selected ? (
               <div className="panel-section">
@@ -452,6 +545,10 @@ export default function Bookings({ isAdmin }) {
                   <div className="legend-color booked"></div>
                   <span>Opptatt</span>
                 </div>
+                <div className="legend-item">
+                  <div className="legend-color held"></div>
+                  <span>Holdes</span>
+                </div>
                 <div className="legend-item">
                   <div className="legend-color blocked"></div>
                   <span>Blokkert</span>
@@ -464,6 +561,7 @@ export default function Bookings({ isAdmin }) {
         <div className="calendar-section">
           {loading && <div className="loading-state">Henter treningshall...</div>}
           {error && <div className="error-msg">{error}</div>}
+          {notice && <div className="success-msg">{notice}</div>}
 
           <div className="calendar-grid">
             {days.map((day) => (
@@ -490,11 +588,13 @@ export default function Bookings({ isAdmin }) {
                     const blocked = slot.status === "blocked";
                     const isPast = isSlotInPast(day.date, slot.hour);
                     const isSelected = selected && selected.date === day.date && selected.hour === slot.hour;
-                    const isDisabled = isPast && !booked && !blocked;
+                    // Eget hold vises som ledig; andres hold kan ikke velges
+                    const held = slot.status === "held" && !(hold && hold.date === day.date && hold.hour === slot.hour);
+                    const isDisabled = (isPast && !booked && !blocked) || held;
                     return (
                       <button
                         key={slot.hour}
-                        className={`time-slot ${booked ? 'booked' : blocked ? 'blocked' : isPast ? 'past' : 'available'} ${isSelected ? 'selected' : ''}`}
+                        className={`time-slot ${booked ? 'booked' : blocked ? 'blocked' : held ? 'held' : isPast ? 'past' : 'available'} ${isSelected ? 'selected' : ''}`}
                         style={blocked ? { 
                           backgroundColor: '#ff4444'
                         } : {}}
@@ -505,7 +605,7 @@ export default function Bookings({ isAdmin }) {
                         }}
                         disabled={isDisabled}
                         aria-label={`${day.date} ${pad(slot.hour)}:00`}
-                        title={booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : isPast ? "Tidspunkt er i fortid" : "Ledig"}
+                        title={booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : held ? "Noen holder på å booke denne tiden" : isPast ? "Tidspunkt er i fortid" : "Ledig"}
                       >
                         <span className="time-text">{pad(slot.hour)}:00</span>
                         {booked && (
@@ -541,6 +641,9 @@ export default function Bookings({ isAdmin }) {
                   <div className="time-info">
                     <div className="time-date">{new Date(selected.date).toLocaleDateString(undefined, { weekday: "long", day: "numeric", month: "long" })}</div>
                     <div className="time-range">{pad(selected.hour)}:00 — {pad((selected.hour+1)%24)}:00</div>
+                  {hold && hold.date === selected.date && hold.hour === selected.hour && (
+                    <div className="time-hold">Holdt for deg til {new Date(hold.expires_at).toLocaleTimeString(undefined, { hour: "2-digit", minute: "2-digit" })}</div>
+                  )}
                   </div>
                 </div>
               ) : (
@@ -550,18 +653,6 @@ export default function Bookings({ isAdmin }) {
               )}
             </div>
 
-            {selected && (
-              <div className="panel-section">
-                <label className="form-label">Treningshall</label>
-                <input 
-                  value={hall} 
-                  onChange={(e)=>setHall(e.target.value)} 
-                  className="form-input"
-                  placeholder="F.eks. Hovedhallen"
-                />
-              </div>
-            )}
-
             {selected && selected.slot && selected.slot.booking_ids && selected.slot.booking_ids.length > 0 ? (
               <div className="panel-section">
                 <h4>Eksisterende bookinger</h4>
@@ -583,6 +674,15 @@ export default function Bookings({ isAdmin }) {
                     </div>
                   ))}
                 </div>
+                {!isSlotInPast(selected.date, selected.hour) && (
+                  <button
+                    className="book-btn"
+                    onClick={joinWaitlist}
+                    disabled={creating}
+                  >
+                    {creating ? "Legger til..." : "Sett meg på venteliste"}
+                  </button>
+                )}
               </div>
             ) : selected ? (
               <div className="panel-section">
@@ -607,6 +707,10 @@ export default function Bookings({ isAdmin }) {
                   <div className="legend-color booked"></div>
                   <span>Opptatt</span>
                 </div>
+                <div className="legend-item">
+                  <div className="legend-color held"></div>
+                  <span>Holdes</span>
+                </div>
                 <div className="legend-item">
                   <div className="legend-color blocked"></div>
                   <span>Blokkert</span>
@@ -628,7 +732,8 @@ export default function Bookings({ isAdmin }) {
             {(days.find(d => d.date === openDay)?.slots || []).map(slot => {
               const booked = slot.status === "booked" && slot.booking_ids && slot.booking_ids.length > 0;
               const blocked = slot.status === "blocked";
-              const cls = booked ? "booked" : blocked ? "blocked" : "empty";
+              const held = slot.status === "held" && !(hold && hold.date === openDay && hold.hour === slot.hour);
+              const cls = booked ? "booked" : blocked ? "blocked" : held ? "held" : "empty";
               return (
                 <button
                   key={slot.hour}
@@ -636,10 +741,11 @@ export default function Bookings({ isAdmin }) {
                   style={blocked ? { 
                     backgroundColor: '#ff4444'
                   } : {}}
-                  onClick={() => setSelected({ date: openDay, hour: slot.hour, slot })}
+                  disabled={held}
+                  onClick={() => onSlotClick(slot, { date: openDay })}
                 >
                   <div className="slot-hour">{pad(slot.hour)}:00</div>
-                  <div className="slot-meta">{booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : "Ledig"}</div>
+                  <div className="slot-meta">{booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : held ? "Holdes" : "Ledig"}</div>
                 </button>
               );
             })}
@@ -13,6 +13,12 @@ function normalizeImageUrl(url) {
   return `${API}/${trimmed}`;
 }
 
+// Opplastede bilder finnes i flere bredder: /uploads/images/x.jpg?w=640
+function withWidth(url, width) {
+  if (!url || !url.includes("/uploads/images/")) return url;
+  return `${url}${url.includes("?") ? "&" : "?"}w=${width}`;
+}
+
 function logImageError(url, context) {
   if (import.meta.env.DEV) {
     console.error("[image] failed to load", { context, url });
@@ -116,7 +122,9 @@ export default function LandingPage({ isLoggedIn = false }) {
                   {normalizeImageUrl(item.image_url) && (
                     <div style={{ width: "100%", height: "200px", overflow: "hidden", borderRadius: "8px 8px 0 0", marginBottom: "15px" }}>
                       <img
-                        src={normalizeImageUrl(item.image_url)}
+                        src={withWidth(normalizeImageUrl(item.image_url), 640)}
+                        srcSet={`${withWidth(normalizeImageUrl(item.image_url), 320)} 320w, ${withWidth(normalizeImageUrl(item.image_url), 640)} 640w`}
+                        sizes="(max-width: 700px) 100vw, 400px"
                         alt={item.title}
                         style={{ width: "100%", height: "100%", objectFit: "cover" }}
                         onError={(e) => {
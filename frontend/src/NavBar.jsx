@@ -105,6 +105,7 @@ export default function NavBar({ isLoggedIn, userEmail, userFullName, isAdmin, o
             <Link to="/instruktorer" className="nav-link" onClick={() => setMobileMenuOpen(false)}>Instruktører</Link>
             <Link to="/nyheter" className="nav-link" onClick={() => setMobileMenuOpen(false)}>Kurs & Nyheter</Link>
             <Link to="/kontakt" className="nav-link" onClick={() => setMobileMenuOpen(false)}>Kontakt</Link>
+            <Link to="/sok" className="nav-link" onClick={() => setMobileMenuOpen(false)}>Søk</Link>
             {isLoggedIn && (
               <Link to="/oversikt" className="nav-link" onClick={() => setMobileMenuOpen(false)}>Oversikt</Link>
             )}
@@ -20,6 +20,12 @@ function normalizeContentImages(html) {
   });
 }
 
+// Opplastede bilder finnes i flere bredder: /uploads/images/x.jpg?w=640
+function withWidth(url, width) {
+  if (!url || !url.includes("/uploads/images/")) return url;
+  return `${url}${url.includes("?") ? "&" : "?"}w=${width}`;
+}
+
 function logImageError(url, context) {
   if (import.meta.env.DEV) {
     console.error("[image] failed to load", { context, url });
@@ -126,7 +132,7 @@ export default function NyhetDetail() {
         {normalizeImageUrl(item.image_url) && (
           <div style={{ marginBottom: "30px", borderRadius: "12px", overflow: "hidden" }}>
             <img
-              src={normalizeImageUrl(item.image_url)}
+              src={withWidth(normalizeImageUrl(item.image_url), 1600)}
               alt={item.title}
               style={{ width: "100%", maxHeight: "500px", objectFit: "cover" }}
               onError={(e) => {
@@ -145,7 +151,7 @@ export default function NyhetDetail() {
             lineHeight: "1.8",
             fontSize: "18px"
           }}
-          dangerouslySetInnerHTML={{ __html: normalizeContentImages(item.content) }}
+          dangerouslySetInnerHTML={{ __html: normalizeContentImages(item.content_html || item.content) }}
         />
 
         <div style={{ marginTop: "40px", textAlign: "center" }}>
@@ -11,13 +11,21 @@ function normalizeImageUrl(url) {
   return `${API}/${url}`;
 }
 
+// Opplastede bilder finnes i flere bredder: /uploads/images/x.jpg?w=640
+function withWidth(url, width) {
+  if (!url || !url.includes("/uploads/images/")) return url;
+  return `${url}${url.includes("?") ? "&" : "?"}w=${width}`;
+}
+
 function logImageError(url, context) {
   console.error("[image] failed to load", { context, url });
 }
 
 export default function Nyheter() {
   const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filter, setFilter] = useState("alle"); // "alle", "kurs", "seminar", "nyhet"
   const [timeFilter, setTimeFilter] = useState("alle"); // "alle", "kommende", "tidligere"
   const { content } = usePageContent("nyheter");
@@ -26,35 +34,32 @@ export default function Nyheter() {
     loadItems();
   }, [filter, timeFilter]);
 
+  const buildParams = (cursor) => {
+    const params = new URLSearchParams();
+    if (filter !== "alle") {
+      params.append("item_type", filter);
+    }
+    params.append("published", "true");
+    // Tidsfilteret håndteres av API-et, så pagineringen stemmer
+    if (timeFilter === "kommende") {
+      params.append("upcoming", "true");
+    } else if (timeFilter === "tidligere") {
+      params.append("upcoming", "false"); // Items without event_date are considered "tidligere"
+    }
+    params.append("limit", "24");
+    if (cursor) {
+      params.append("cursor", cursor);
+    }
+    return params;
+  };
+
   const loadItems = async () => {
     setLoading(true);
     try {
-      const params = new URLSearchParams();
-      if (filter !== "alle") {
-        params.append("item_type", filter);
-      }
-      params.append("published", "true");
-
-      const response = await fetch(`${API}/api/news?${params.toString()}`);
+      const response = await fetch(`${API}/api/news?${buildParams().toString()}`);
       const data = await response.json();
-      
-      let filteredItems = data.items || [];
-      
-      // Filter by time
-      const now = new Date();
-      if (timeFilter === "kommende") {
-        filteredItems = filteredItems.filter(item => {
-          if (!item.event_date) return false;
-          return new Date(item.event_date) >= now;
-        });
-      } else if (timeFilter === "tidligere") {
-        filteredItems = filteredItems.filter(item => {
-          if (!item.event_date) return true; // Items without event_date are considered "tidligere"
-          return new Date(item.event_date) < now;
-        });
-      }
-      
-      setItems(filteredItems);
+      setItems(data.items || []);
+      setNextCursor(data.next_cursor || null);
     } catch (err) {
       console.error("Failed to load news items:", err);
     } finally {
@@ -62,6 +67,21 @@ export default function Nyheter() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${API}/api/news?${buildParams(nextCursor).toString()}`);
+      const data = await response.json();
+      setItems(prev => [...prev, ...(data.items || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      console.error("Failed to load more news items:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getTypeLabel = (type) => {
     const labels = {
       kurs: "Kurs",
@@ -152,7 +172,9 @@ export default function Nyheter() {
                 {item.image_url && (
                   <div style={{ width: "100%", height: "200px", overflow: "hidden", borderRadius: "8px 8px 0 0", marginBottom: "15px" }}>
                     <img
-                      src={normalizeImageUrl(item.image_url)}
+                      src={withWidth(normalizeImageUrl(item.image_url), 640)}
+                      srcSet={`${withWidth(normalizeImageUrl(item.image_url), 320)} 320w, ${withWidth(normalizeImageUrl(item.image_url), 640)} 640w`}
+                      sizes="(max-width: 700px) 100vw, 400px"
                       alt={item.title}
                       style={{ width: "100%", height: "100%", objectFit: "cover" }}
                       onError={() => logImageError(normalizeImageUrl(item.image_url), "news.list")}
@@ -187,6 +209,14 @@ export default function Nyheter() {
             <p>Ingen kurs, seminarer eller nyheter funnet med de valgte filtrene.</p>
           </div>
         )}
+
+        {!loading && nextCursor && (
+          <div style={{ textAlign: "center", marginTop: "30px" }}>
+            <button className="btn btn-secondary" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? "Laster..." : "Vis flere"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
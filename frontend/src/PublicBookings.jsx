@@ -9,6 +9,26 @@ function pad(num) {
 function isoDate(d) {
   return d.toISOString().slice(0, 10);
 }
+// ?format=compact: én bitmaske per dag (bit i = hours[i]) + sparse booking-id-er og årsaker. held = noen holder på å booke
+function expandCompactCalendar(data) {
+  const bookingIds = {};
+  for (const [d, i, id] of data.booking_ids) {
+    (bookingIds[`${d}:${i}`] = bookingIds[`${d}:${i}`] || []).push(id);
+  }
+  const reasons = {};
+  for (const [d, i, reason] of data.reasons) reasons[`${d}:${i}`] = reason;
+  return data.booked.map((booked, d) => data.hours.map((hour, i) => {
+    const key = `${d}:${i}`;
+    const slot = { hour, booking_ids: bookingIds[key] || [], status: "empty" };
+    if (((data.held || [])[d] >> i) & 1) slot.status = "held";
+    if ((booked >> i) & 1) slot.status = "booked";
+    if ((data.blocked[d] >> i) & 1) {
+      slot.status = "blocked";
+      slot.reason = reasons[key];
+    }
+    return slot;
+  }));
+}
 function startOfWeek(date) {
   const d = new Date(date);
   const day = d.getDay(); // 0=Sunday, 1=Monday, ..., 6=Saturday
@@ -52,12 +72,15 @@ export default function PublicBookings() {
   const [colors, setColors] = useState({});
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const [halls, setHalls] = useState([]);
+  const [hallId, setHallId] = useState(""); // "" = første aktive hall
   const [openDay, setOpenDay] = useState(null); // date string shown in top-left panel
   const [showWeekSelector, setShowWeekSelector] = useState(false);
   const [dropdownPosition, setDropdownPosition] = useState({ top: 0, left: 0 });
   const [dropdownRef, setDropdownRef] = useState(null);
 
-  useEffect(() => { fetchWeek(); /* eslint-disable-next-line */ }, [weekStart]);
+  useEffect(() => { fetchHalls(); }, []);
+  useEffect(() => { fetchWeek(); /* eslint-disable-next-line */ }, [weekStart, hallId]);
 
   // Close dropdown when clicking outside
   useEffect(() => {
@@ -73,31 +96,32 @@ export default function PublicBookings() {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, [showWeekSelector]);
 
-  async function fetchDay(dateStr) {
-    const res = await fetch(`${API}/bookings/${dateStr}`);
-    if (!res.ok) throw new Error(`Kunne ikke hente ${dateStr}`);
-    return res.json();
+  async function fetchHalls() {
+    try {
+      const res = await fetch(`${API}/api/halls`);
+      if (!res.ok) return;
+      const data = await res.json();
+      setHalls(data.halls || []);
+    } catch (err) { console.error(err); }
   }
 
   async function fetchWeek() {
     setLoading(true); setError("");
     try {
-      const promises = []; const daysArr = [];
-      for (let i = 0; i < 7; i++) {
+      // Hele uken i én forespørsel, for valgt hall
+      const base = hallId ? `${API}/halls/${encodeURIComponent(hallId)}/bookings` : `${API}/bookings`;
+      const res = await fetch(`${base}?start=${isoDate(weekStart)}&days=7&format=compact`);
+      if (!res.ok) throw new Error("Kunne ikke hente uken");
+      const data = await res.json();
+      const weekSlots = expandCompactCalendar(data);
+      const combined = weekSlots.map((slots, idx) => {
         const d = new Date(weekStart);
-        d.setDate(d.getDate() + i);
-        const dateStr = isoDate(d);
-        promises.push(fetchDay(dateStr));
-        daysArr.push({ date: dateStr, dateObj: d });
-      }
-      const results = await Promise.all(promises);
-      const combined = daysArr.map((day, idx) => ({
-        date: day.date,
-        dateObj: day.dateObj,
-        slots: results[idx].slots || [],
-      }));
+        d.setDate(d.getDate() + idx);
+        return { date: isoDate(d), dateObj: d, slots };
+      });
       setDays(combined);
-      if (results[0] && results[0].colors) setColors(results[0].colors);
+      if (data.colors) setColors(data.colors);
+      if (!hallId && data.hall_id) setHallId(data.hall_id);
     } catch (err) {
       console.error(err); setError(err.message || "Feil ved henting");
     } finally { setLoading(false); }
@@ -296,7 +320,20 @@ export default function PublicBookings() {
         </div>
 
         <div className="week-info">
-          <h2>Treningshall</h2>
+          {halls.length > 1 ? (
+            <select
+              value={hallId}
+              onChange={(e) => setHallId(e.target.value)}
+              className="form-input"
+              aria-label="Velg hall"
+            >
+              {halls.map(h => (
+                <option key={h.id} value={h.id}>{h.name}</option>
+              ))}
+            </select>
+          ) : (
+            <h2>{halls.length === 1 ? halls[0].name : "Treningshall"}</h2>
+          )}
           <p className="week-range">{isoDate(weekStart)} — {isoDate(weekEnd)}</p>
           <div className="week-details">
             <span className="week-number">Uke {getWeekNumber(weekStart)}</span>
@@ -333,15 +370,16 @@ export default function PublicBookings() {
                   {day.slots.map((slot) => {
                     const booked = slot.status === "booked" && slot.booking_ids && slot.booking_ids.length > 0;
                     const blocked = slot.status === "blocked";
+                    const held = slot.status === "held";
                     return (
                       <div
                         key={slot.hour}
-                        className={`time-slot ${booked ? 'booked' : blocked ? 'blocked' : 'available'}`}
+                        className={`time-slot ${booked ? 'booked' : blocked ? 'blocked' : held ? 'held' : 'available'}`}
                         style={blocked ? { 
                           backgroundColor: '#ff4444'
                         } : {}}
                         aria-label={`${day.date} ${pad(slot.hour)}:00`}
-                        title={booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : "Ledig"}
+                        title={booked ? `${slot.booking_ids.length} opptatt` : blocked ? (slot.reason || "Blokkert") : held ? "Noen holder på å booke" : "Ledig"}
                       >
                         <span className="time-text">{pad(slot.hour)}:00</span>
                         {booked && (
@@ -376,6 +414,10 @@ export default function PublicBookings() {
                 <div className="legend-color booked"></div>
                 <span>Opptatt</span>
               </div>
+              <div className="legend-item">
+                <div className="legend-color held"></div>
+                <span>Holdes</span>
+              </div>
               <div className="legend-item">
                 <div className="legend-color blocked"></div>
                 <span>Blokkert</span>
@@ -407,14 +449,15 @@ export default function PublicBookings() {
             {(days.find(d => d.date === openDay)?.slots || []).map(slot => {
               const booked = slot.status === "booked" && slot.booking_ids && slot.booking_ids.length > 0;
               const blocked = slot.status === "blocked";
-              const cls = booked ? "booked" : blocked ? "blocked" : "empty";
+              const held = slot.status === "held";
+              const cls = booked ? "booked" : blocked ? "blocked" : held ? "held" : "empty";
               return (
                 <div
                   key={slot.hour}
                   className={`slot-button daypanel ${cls}`}
                 >
                   <div className="slot-hour">{pad(slot.hour)}:00</div>
-                  <div className="slot-meta">{booked ? `${slot.booking_ids.length} opptatt` : blocked ? "Blokkert" : "Ledig"}</div>
+                  <div className="slot-meta">{booked ? `${slot.booking_ids.length} opptatt` : blocked ? "Blokkert" : held ? "Holdes" : "Ledig"}</div>
                 </div>
               );
             })}
@@ -0,0 +1,86 @@
+import React, { useState, useEffect } from "react";
+import { Link, useSearchParams } from "react-router-dom";
+
+const API = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
+
+export default function Sok() {
+  const [searchParams, setSearchParams] = useSearchParams();
+  const query = searchParams.get("q") || "";
+  const [input, setInput] = useState(query);
+  const [results, setResults] = useState([]);
+  const [loading, setLoading] = useState(false);
+
+  useEffect(() => {
+    if (!query.trim()) {
+      setResults([]);
+      return;
+    }
+    let cancelled = false;
+    setLoading(true);
+    fetch(`${API}/api/search?q=${encodeURIComponent(query)}`)
+      .then(res => (res.ok ? res.json() : { results: [] }))
+      .then(data => {
+        if (!cancelled) setResults(data.results || []);
+      })
+      .catch(err => console.error("Search failed:", err))
+      .finally(() => {
+        if (!cancelled) setLoading(false);
+      });
+    return () => { cancelled = true; };
+  }, [query]);
+
+  const onSubmit = (e) => {
+    e.preventDefault();
+    setSearchParams(input.trim() ? { q: input.trim() } : {});
+  };
+
+  return (
+    <div className="page-container">
+      <div className="page-header">
+        <h1>Søk</h1>
+        <p className="page-subtitle">Søk i kurs, seminarer, nyheter og informasjonssider</p>
+      </div>
+
+      <div className="page-content">
+        <form onSubmit={onSubmit} style={{ display: "flex", gap: "10px", marginBottom: "30px" }}>
+          <input
+            type="search"
+            className="form-input"
+            value={input}
+            onChange={(e) => setInput(e.target.value)}
+            placeholder="F.eks. agility vår"
+            style={{ flex: 1 }}
+            autoFocus
+          />
+          <button type="submit" className="btn btn-primary">Søk</button>
+        </form>
+
+        {loading ? (
+          <div style={{ textAlign: "center", padding: "40px" }}>Laster...</div>
+        ) : results.length > 0 ? (
+          <div className="search-results">
+            {results.map(result => (
+              <Link
+                key={`${result.kind}:${result.id}`}
+                to={result.url}
+                className="feature-card"
+                style={{ display: "block", textDecoration: "none", color: "inherit", marginBottom: "15px" }}
+              >
+                <div style={{ fontSize: "12px", color: "#666", textTransform: "uppercase", marginBottom: "6px" }}>
+                  {result.kind === "news" ? "Kurs & Nyheter" : "Side"}
+                </div>
+                <h3>{result.title}</h3>
+                {/* snippet er escapet på serveren, bare <mark> er HTML */}
+                <p dangerouslySetInnerHTML={{ __html: result.snippet }}></p>
+              </Link>
+            ))}
+          </div>
+        ) : query ? (
+          <div style={{ textAlign: "center", padding: "40px" }}>
+            <p>Ingen treff på «{query}».</p>
+          </div>
+        ) : null}
+      </div>
+    </div>
+  );
+}
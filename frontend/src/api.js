@@ -23,3 +23,31 @@ export async function apiFetch(url, options = {}) {
     credentials: "include",
   });
 }
+
+function newIdempotencyKey() {
+  if (globalThis.crypto && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
+// POST som kan sendes på nytt ved nettverksfeil: alle forsøk har samme
+// Idempotency-Key, så backend spiller av første svar i stedet for å kjøre to ganger.
+// 409 = første forsøk pågår fortsatt, 503 = midlertidig opptatt.
+export async function apiFetchIdempotent(url, options = {}, { retries = 2, retryDelayMs = 800 } = {}) {
+  const headers = new Headers(options.headers || {});
+  if (!headers.has("Idempotency-Key")) {
+    headers.set("Idempotency-Key", newIdempotencyKey());
+  }
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const res = await apiFetch(url, { ...options, headers });
+      if ((res.status === 409 || res.status === 503) && attempt < retries) {
+        await new Promise((resolve) => setTimeout(resolve, retryDelayMs * (attempt + 1)));
+        continue;
+      }
+      return res;
+    } catch (err) {
+      if (attempt >= retries) throw err;
+      await new Promise((resolve) => setTimeout(resolve, retryDelayMs * (attempt + 1)));
+    }
+  }
+}
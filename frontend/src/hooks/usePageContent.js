@@ -2,52 +2,99 @@ import { useState, useEffect } from 'react';
 
 const API = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
+// Delt mellom komponenter: én forespørsel per side, gjenbrukt i PAGE_CACHE_TTL_MS
+const PAGE_CACHE_TTL_MS = 60 * 1000;
+const pageCache = new Map(); // pageName -> { promise: Promise<{ section: { section_name, content } }>, fetchedAt }
+
+function cachedPage(pageName) {
+  const entry = pageCache.get(pageName);
+  if (!entry) return null;
+  if (Date.now() - entry.fetchedAt > PAGE_CACHE_TTL_MS) {
+    pageCache.delete(pageName);
+    return null;
+  }
+  return entry.promise;
+}
+
+// Glem cachet innhold (f.eks. etter lagring i adminpanelet); uten argument tømmes alt
+export function invalidatePageContent(pageName = null) {
+  if (pageName) {
+    pageCache.delete(pageName);
+  } else {
+    pageCache.clear();
+  }
+}
+
+function toSections(sections) {
+  const grouped = {};
+  Object.entries(sections || {}).forEach(([section_name, content]) => {
+    grouped[section_name] = { section_name, content };
+  });
+  return grouped;
+}
+
+// Hent flere sider i én forespørsel, f.eks. prefetchPageContent(['landing', 'kontakt'])
+export function prefetchPageContent(pageNames) {
+  const missing = pageNames.filter(name => !cachedPage(name));
+  if (missing.length === 0) return Promise.resolve();
+
+  const bundle = fetch(`${API}/api/page-content?pages=${missing.map(encodeURIComponent).join(',')}`)
+    .then(response => {
+      if (!response.ok) {
+        throw new Error('Kunne ikke hente sideinnhold');
+      }
+      return response.json();
+    });
+
+  missing.forEach(name => {
+    const promise = bundle.then(data => toSections(data[name]));
+    const entry = { promise, fetchedAt: Date.now() };
+    // Ikke cache feil, så neste visning prøver igjen
+    promise.catch(() => {
+      if (pageCache.get(name) === entry) pageCache.delete(name);
+    });
+    pageCache.set(name, entry);
+  });
+  return bundle.then(() => undefined);
+}
+
 export function usePageContent(pageName, sectionName = null) {
   const [content, setContent] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
   useEffect(() => {
+    let cancelled = false;
+
     const fetchContent = async () => {
       setLoading(true);
       setError(null);
       
       try {
-        const url = sectionName 
-          ? `${API}/api/page-content/${pageName}?section_name=${sectionName}`
-          : `${API}/api/page-content/${pageName}`;
-        
-        const response = await fetch(url);
-        
-        if (!response.ok) {
-          throw new Error('Kunne ikke hente sideinnhold');
-        }
-        
-        const data = await response.json();
-        
+        let result;
         if (sectionName) {
-          setContent(data);
-        } else {
-          // Group content by section_name for easy access
-          const groupedContent = {};
-          if (data.content) {
-            data.content.forEach(item => {
-              groupedContent[item.section_name] = item;
-            });
+          const response = await fetch(`${API}/api/page-content/${pageName}?section_name=${sectionName}`);
+          if (!response.ok) {
+            throw new Error('Kunne ikke hente sideinnhold');
           }
-          setContent(groupedContent);
+          result = await response.json();
+        } else {
+          prefetchPageContent([pageName]);
+          result = await cachedPage(pageName);
         }
+        if (!cancelled) setContent(result);
       } catch (err) {
-        setError(err.message);
+        if (!cancelled) setError(err.message);
         console.error('Error fetching page content:', err);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
     if (pageName) {
       fetchContent();
     }
+    return () => { cancelled = true; };
   }, [pageName, sectionName]);
 
   return { content, loading, error };
@@ -56,12 +103,13 @@ export function usePageContent(pageName, sectionName = null) {
 export function getContentValue(content, sectionName, fallback = '') {
   if (!content) return fallback;
   
+  // content_html finnes bare for markdown (rendret og sanert på serveren); ellers brukes råteksten
   if (typeof content === 'object' && content.section_name === sectionName) {
-    return content.content || fallback;
+    return content.content_html || content.content || fallback;
   }
   
   if (typeof content === 'object' && content[sectionName]) {
-    return content[sectionName].content || fallback;
+    return content[sectionName].content_html || content[sectionName].content || fallback;
   }
   
   return fallback;
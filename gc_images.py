@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Script to delete uploaded images that nothing references.
+
+An image is kept if it appears in image_references (news items and page content)
+or is newer than --min-age-hours, since admins upload the image before saving the
+news item that uses it. Variants of deleted images are removed as well.
+
+Usage:
+    python gc_images.py --dry-run
+    python gc_images.py --min-age-hours 48
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from sqlalchemy import delete, select
+
+from app.database import AsyncSessionLocal
+from app.images import VARIANT_DIR
+from app.models import ImageReference, ImageVariant
+
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_ROOT", "uploads"))
+
+
+async def gc_images(min_age_hours: float, dry_run: bool):
+    """Delete unreferenced files under UPLOAD_ROOT/images"""
+    image_dir = UPLOAD_ROOT / "images"
+    if not image_dir.is_dir():
+        print(f"No upload directory at {image_dir}")
+        return
+
+    async with AsyncSessionLocal() as db:
+        referenced = set((await db.execute(select(ImageReference.filename).distinct())).scalars().all())
+        cutoff = time.time() - min_age_hours * 3600
+
+        candidates = [
+            path for path in image_dir.iterdir()
+            if path.is_file()
+            and not path.name.startswith(".")  # midlertidige filer fra pågående opplastinger
+            and path.name not in referenced
+            and path.stat().st_mtime < cutoff
+        ]
+        if not candidates:
+            print(f"✅ Nothing to delete ({len(referenced)} referenced images)")
+            return
+
+        freed = 0
+        for path in sorted(candidates):
+            variants = (await db.execute(
+                select(ImageVariant.path).where(ImageVariant.source == path.name)
+            )).scalars().all()
+            files = [path] + [UPLOAD_ROOT / v for v in variants]
+            size = sum(f.stat().st_size for f in files if f.exists())
+            freed += size
+            print(f"{'Would delete' if dry_run else 'Deleting'} {path.name} ({len(variants)} variants, {size} bytes)")
+            if dry_run:
+                continue
+            for f in files:
+                f.unlink(missing_ok=True)
+            # Varianter som ikke ble registrert (f.eks. avbrutt generering)
+            for stray in (UPLOAD_ROOT / VARIANT_DIR).glob(f"{path.name}.*"):
+                stray.unlink(missing_ok=True)
+            await db.execute(delete(ImageVariant).where(ImageVariant.source == path.name))
+        if not dry_run:
+            await db.commit()
+
+    action = "Would free" if dry_run else "Freed"
+    print(f"✅ {action} {freed} bytes from {len(candidates)} unreferenced images")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-age-hours", type=float, default=24.0,
+                        help="only delete files older than this (default 24)")
+    parser.add_argument("--dry-run", action="store_true", help="list files without deleting")
+    args = parser.parse_args()
+    asyncio.run(gc_images(args.min_age_hours, args.dry_run))
@@ -13,8 +13,8 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.database import AsyncSessionLocal
-from app.models import PageContent
-from app.crud import create_page_content
+from app.schemas import PageContentCreate
+from app.crud import upsert_page_content
 
 # Default content for different pages
 DEFAULT_CONTENT = [
@@ -287,43 +287,18 @@ async def init_content():
     """Initialize default content in the database."""
     print("Initializing default page content...")
     
-    # Create tables first
-    from app.database import Base, engine
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Create/migrate tables first
+    from app.database import engine
+    from app.migrations import run_migrations
+    await run_migrations(engine)
     print("✅ Database tables created")
     
     async with AsyncSessionLocal() as db:
         try:
-            for content_data in DEFAULT_CONTENT:
-                # Check if content already exists
-                from sqlalchemy import select
-                result = await db.execute(
-                    select(PageContent).filter(
-                        PageContent.page_name == content_data["page_name"],
-                        PageContent.section_name == content_data["section_name"]
-                    )
-                )
-                existing = result.scalar_one_or_none()
-                
-                if existing:
-                    print(f"Content already exists for {content_data['page_name']}.{content_data['section_name']}")
-                    continue
-                
-                # Create new content
-                page_content = PageContent(
-                    page_name=content_data["page_name"],
-                    section_name=content_data["section_name"],
-                    content=content_data["content"],
-                    content_type=content_data["content_type"],
-                    created_by="system"
-                )
-                
-                db.add(page_content)
-                print(f"Created content for {content_data['page_name']}.{content_data['section_name']}")
-            
-            await db.commit()
-            print("✅ Default content initialized successfully!")
+            # Én INSERT ... ON CONFLICT DO NOTHING; eksisterende tekst blir stående
+            items = [PageContentCreate(**content_data) for content_data in DEFAULT_CONTENT]
+            rows = await upsert_page_content(db, items, "system", overwrite=False)
+            print(f"✅ Default content initialized successfully! ({len(rows)} sections present)")
             
         except Exception as e:
             print(f"❌ Error initializing content: {e}")
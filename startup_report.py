@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Startup-time report for the API.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and prints
+the slowest imports. Exits with status 1 if the total import time exceeds the
+budget, or if a module that should be loaded lazily is imported at startup.
+
+Usage:
+    python startup_report.py                  # report + gate with default budget
+    python startup_report.py --budget-ms 1500 --top 25
+    python startup_report.py --no-gate        # report only
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must only be imported on first use (email transport, password hashing, images)
+LAZY_MODULES = [
+    "smtplib",
+    "email.mime.text",
+    "email.mime.multipart",
+    "httpx",
+    "passlib.handlers.bcrypt",
+    "markdown",
+    "nh3",
+    "PIL",
+    "brotli",
+]
+
+DEFAULT_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "2000"))
+
+
+def run_importtime(module: str):
+    """Import `module` in a subprocess and return [(name, self_us, cumulative_us, depth)]."""
+    env = dict(os.environ)
+    env.setdefault("PYTHONDONTWRITEBYTECODE", "1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        raise SystemExit(f"❌ Import of {module} failed")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        # Navnet er innrykket to mellomrom per nivå, etter ett skilletegn-mellomrom
+        raw_name = parts[2][1:]
+        depth = (len(raw_name) - len(raw_name.lstrip(" "))) // 2
+        rows.append((raw_name.strip(), int(parts[0]), int(parts[1]), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report and gate API import/startup time")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--no-gate", action="store_true", help="Only print the report")
+    args = parser.parse_args()
+
+    rows = run_importtime(args.module)
+    target = next((r for r in rows if r[0] == args.module), None)
+    total_ms = (target[2] if target else sum(r[1] for r in rows)) / 1000
+
+    print(f"Startup import report for {args.module}")
+    print(f"Total: {total_ms:.1f} ms ({len(rows)} modules)\n")
+
+    print(f"Top {args.top} by cumulative time (top-level packages):")
+    top_level = [r for r in rows if r[3] <= 1 and r[0] != args.module]
+    for name, _self, cumulative, _depth in sorted(top_level, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print(f"\nTop {args.top} by self time:")
+    for name, self_us, _cum, _depth in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    loaded = {r[0] for r in rows}
+    eager = [m for m in LAZY_MODULES if m in loaded]
+
+    if args.no_gate:
+        return 0
+
+    failed = False
+    if eager:
+        print(f"\n❌ Modules that should be lazy were imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\n❌ Startup import time {total_ms:.1f} ms exceeds budget {args.budget_ms} ms")
+        failed = True
+    if not failed:
+        print(f"\n✅ Within budget ({total_ms:.1f} ms <= {args.budget_ms} ms), no eager lazy-modules")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
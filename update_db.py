@@ -10,16 +10,16 @@ import os
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-from app.database import Base, engine
+from app.database import engine
+from app.migrations import run_migrations
 
 async def update_database():
-    """Update database with new tables"""
+    """Update database by applying pending migrations"""
     print("Updating database...")
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    version = await run_migrations(engine)
     
-    print("✅ Database updated successfully!")
+    print(f"✅ Database updated successfully! (schema version {version})")
 
 if __name__ == "__main__":
     asyncio.run(update_database())